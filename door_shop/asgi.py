@@ -2,15 +2,24 @@
 ASGI config for door_shop project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with an ASGI server (e.g. ``uvicorn door_shop.asgi:application``) to
+serve the live-update stream at ``/events/``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
+import time
+
+_started = time.perf_counter()
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "door_shop.settings")
 
 application = get_asgi_application()
+
+from door_shop.warmup import warmup  # noqa: E402
+
+warmup(load_time=time.perf_counter() - _started)
@@ -0,0 +1,46 @@
+"""SQLite backend tuned for several tills writing to one database file.
+
+Extra OPTIONS understood on top of Django's sqlite3 backend:
+
+``pragmas``
+    Mapping of PRAGMA name to value, applied to every new connection (e.g.
+    ``journal_mode=WAL``, ``synchronous=NORMAL``, ``busy_timeout``).
+``transaction_mode``
+    ``DEFERRED`` (SQLite's default), ``IMMEDIATE`` or ``EXCLUSIVE``. With
+    ``IMMEDIATE`` an atomic block takes the write lock when it starts, so a
+    checkout waits on ``busy_timeout`` instead of failing with "database is
+    locked" when its read lock can't be upgraded.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Our own options must not reach sqlite3.connect()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        if self.is_in_memory_db():
+            # WAL and mmap don't apply to the in-memory test database
+            pragmas = {k: v for k, v in pragmas.items() if k not in ('journal_mode', 'mmap_size')}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}")
+        return mode
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,130 @@
+"""Small helpers shared by the benchmark management commands."""
+import math
+from contextlib import contextmanager
+
+from django.test.utils import setup_test_environment
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def latency_summary(latencies, elapsed=None):
+    """p50/p95/p99/max (milliseconds) and throughput for a list of seconds."""
+    ordered = sorted(latencies)
+    summary = {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+    if elapsed:
+        summary['per_second'] = round(len(ordered) / elapsed, 1)
+    return summary
+
+
+def _percent_change(new, old):
+    return round((new - old) * 100 / old, 1) if old else 0.0
+
+
+def compare_to_baseline(results, baseline, threshold=10.0):
+    """Per-view change against an earlier run; slower p95 or more queries is a regression."""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        row = {
+            'name': name,
+            'p50_change': _percent_change(current['p50_ms'], previous['p50_ms']),
+            'p95_change': _percent_change(current['p95_ms'], previous['p95_ms']),
+            'queries_change': current['queries'] - previous['queries'],
+        }
+        row['regression'] = row['p95_change'] > threshold or row['queries_change'] > 0
+        rows.append(row)
+    return rows
+
+
+@contextmanager
+def bench_login(client, username='bench', keep_user=False):
+    """Log ``client`` in as a staff user for the length of a benchmark run.
+
+    The user gets an unusable password, so nobody can sign in with it. The
+    session is flushed afterwards and a user created here is deleted again,
+    unless ``keep_user`` is set because rows written during the run (sales)
+    point at it.
+    """
+    from django.contrib.auth.models import User
+    user, created = User.objects.get_or_create(username=username, defaults={'is_staff': True})
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=['password'])
+    client.force_login(user)
+    try:
+        yield user
+    finally:
+        client.logout()
+        if created and not keep_user:
+            user.delete()
+
+
+def prepare_test_client():
+    """Let django.test.Client talk to the configured database ('testserver' host allowed)."""
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # Already set up, e.g. when called from a test or another command
+        pass
+
+
+def set_sqlite_locking(transaction_mode=None, busy_timeout=None):
+    """Override the SQLite locking options for connections opened from now on."""
+    from django.db import connections
+    options = connections.settings['default'].setdefault('OPTIONS', {})
+    if transaction_mode:
+        options['transaction_mode'] = transaction_mode
+    if busy_timeout is not None:
+        options['timeout'] = busy_timeout / 1000
+        options.setdefault('pragmas', {})['busy_timeout'] = busy_timeout
+
+
+def init_checkout_worker(transaction_mode=None, busy_timeout=None):
+    """Initializer for spawned checkout benchmark processes."""
+    import django
+    django.setup()
+    set_sqlite_locking(transaction_mode, busy_timeout)
+    prepare_test_client()
+
+
+def run_checkout_till(session_key, url, carts):
+    """POST each cart to the checkout as one till.
+
+    Returns (latencies, outcomes, started, finished); the wall-clock bounds let
+    the caller leave worker start-up out of the throughput figure.
+    """
+    import json
+    import time
+
+    from django.conf import settings
+    from django.db import connections
+    from django.test import Client
+
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    latencies, outcomes = [], []
+    started = time.time()
+    try:
+        for cart in carts:
+            start = time.perf_counter()
+            response = client.post(url, json.dumps(cart), content_type='application/json')
+            latencies.append(time.perf_counter() - start)
+            result = response.json()
+            outcomes.append('ok' if result.get('success') else result.get('error', 'unknown error'))
+    finally:
+        connections.close_all()
+    return latencies, outcomes, started, time.time()
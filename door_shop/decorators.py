@@ -0,0 +1,15 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+
+def async_login_required(view_func):
+    """``login_required`` for ``async def`` views (Django 4.2's only wraps sync views)."""
+    @wraps(view_func)
+    async def _wrapper_view(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapper_view
@@ -0,0 +1,82 @@
+"""In-process broadcast hub for live dashboard and till updates.
+
+Writers call ``publish()`` (normally from a ``transaction.on_commit`` hook) and
+every open Server-Sent Events stream served by ``door_shop.views.event_stream``
+receives the event. The hub lives in one process, so live updates reach the
+screens connected to the same ASGI worker that committed the change; screens on
+other workers catch up on their next reconnect or page load.
+"""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self):
+        """Register a queue on the running event loop for the duration of a stream."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber; safe to call from any thread."""
+        event = (event_type, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has already shut down
+                pass
+
+    @staticmethod
+    def _deliver(queue, event):
+        if queue.full():
+            # A slow screen drops its oldest event rather than blocking writers
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+hub = EventHub()
+
+
+def publish(event_type, data):
+    hub.publish(event_type, data)
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def publish_stock_change(product_id, name, current_stock, min_stock_level, track_stock, store_levels=None):
+    """``store_levels`` is {store pk: quantity held there}; tills show their own store's level."""
+    publish('stock-changed', {
+        'product_id': product_id,
+        'current_stock': str(current_stock),
+        'stores': {str(pk): str(quantity) for pk, quantity in (store_levels or {}).items()},
+    })
+    if track_stock and current_stock <= min_stock_level:
+        publish('low-stock', {
+            'product_id': product_id,
+            'name': name,
+            'current_stock': str(current_stock),
+            'min_stock_level': str(min_stock_level),
+        })
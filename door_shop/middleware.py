@@ -0,0 +1,250 @@
+import mimetypes
+import random
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import querylog, snapshot
+from .querylog import install_query_logs, query_log
+from .storage import ENCODINGS
+from .profiling import (
+    Profiler, RequestStats, current_request, install_sql_timers, record_request, server_timing,
+)
+
+PROFILE_PARAM = '_profile'
+
+
+class ProfilingMiddleware:
+    """Time SQL, templates and the whole request, and report it in a Server-Timing header.
+
+    Slow requests land in the slow request log shown on the perf panel. Staff
+    can add ``?_profile=1`` to a (sync) request to capture a cProfile report
+    with it, and ``PROFILE_SAMPLE_RATE`` profiles that share of all (sync)
+    requests at random. Goes after AuthenticationMiddleware so ``request.user`` is set.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_sql_timers()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            if self.wants_profile(request):
+                with Profiler() as profiler:
+                    response = self.get_response(request)
+                profile_report = profiler.report()
+            else:
+                response = self.get_response(request)
+                profile_report = None
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start, profile_report)
+
+    async def __acall__(self, request):
+        # cProfile only sees the calling thread, which here is the event loop,
+        # so async requests are timed but never profiled
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def wants_profile(self, request):
+        if request.GET.get(PROFILE_PARAM) == '1':
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def finish(self, request, response, stats, total, profile_report=None):
+        # Streaming responses are timed up to their first byte
+        response['Server-Timing'] = server_timing(stats, total)
+        entry_id = record_request(request, response, stats, total, profile_report)
+        if profile_report is not None:
+            response['X-Profile-Id'] = str(entry_id)
+        return response
+
+
+class QueryLogMiddleware:
+    """Feed every query of the request into the slow query log (door_shop.querylog)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERYLOG_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install_query_logs()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = querylog.current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            querylog.current_request.reset(token)
+        query_log.dump_if_due()
+        return response
+
+    async def __acall__(self, request):
+        token = querylog.current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            querylog.current_request.reset(token)
+        query_log.dump_if_due()
+        return response
+
+
+class ReportingSnapshotMiddleware:
+    """Run the views of ``REPORTING_VIEW_MODULES`` against the reporting snapshot.
+
+    Sets ``request.reporting_snapshot`` (shown on the page) and starts a
+    background refresh once the snapshot is older than ``REPORTING_MAX_LAG``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REPORTING_DATABASE', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.view_modules = set(settings.REPORTING_VIEW_MODULES)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            snapshot.reading_snapshot.set(None)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            snapshot.reading_snapshot.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if view_func.__module__ not in self.view_modules:
+            return None
+        info = snapshot.snapshot_info()
+        if info is None or info.is_stale:
+            snapshot.refresh_in_background()
+        if info is not None:
+            request.reporting_snapshot = info
+            snapshot.reading_snapshot.set(info)
+        return None
+
+
+class StaticFilesMiddleware:
+    """Serve ``STATIC_ROOT`` (as built by collectstatic) without a separate web server.
+
+    Picks the precompressed ``.br`` / ``.gz`` variant the client accepts and
+    marks fingerprinted names from the manifest as immutable for a year. Goes
+    right after SecurityMiddleware so asset requests skip sessions and auth.
+    """
+    sync_capable = True
+    async_capable = True
+    IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', True) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = Path(settings.STATIC_ROOT).resolve()
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.files = {}
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def find(self, name):
+        """(path, mtime, size, {encoding: path}) of a static file, or None; files only change on deploy."""
+        if name not in self.files:
+            path = (self.root / name).resolve()
+            if self.root not in path.parents or not path.is_file() or path.suffix in ('.gz', '.br'):
+                self.files[name] = None
+            else:
+                variants = {}
+                for encoding, suffix in ENCODINGS.items():
+                    variant = path.with_name(path.name + suffix)
+                    if variant.is_file():
+                        variants[encoding] = variant
+                stat = path.stat()
+                self.files[name] = (path, stat.st_mtime, stat.st_size, variants)
+        return self.files[name]
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        name = request.path_info[len(self.prefix):]
+        found = self.find(name)
+        if found is None:
+            return None
+        path, mtime, size, variants = found
+        etag = f'"{int(mtime)}-{size}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+        if response is None:
+            encoding = next((e for e in variants if e in accepted_encodings(request)), None)
+            content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+            response = FileResponse(open(variants.get(encoding, path), 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(mtime)
+        if variants:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if name in self.immutable:
+            response['Cache-Control'] = f'public, max-age={self.IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 3600)}'
+        return response
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(encoding.strip().lower())
+    return encodings
@@ -0,0 +1,173 @@
+"""Per-request timings: SQL, template rendering and the slowest recent requests.
+
+The timers are installed once per process and report into the stats of the
+request being served, found through a context variable so they follow the
+request across ``sync_to_async`` threads.
+"""
+import contextvars
+import cProfile
+import io
+import itertools
+import pstats
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+current_request = contextvars.ContextVar('profiled_request', default=None)
+
+# cProfile can only run one profile at a time in a process
+_profiler_lock = threading.Lock()
+
+
+class RequestStats:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def time_sql(execute, sql, params, many, context):
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def install_sql_timer(connection, **kwargs):
+    # execute_wrappers outlives reconnects, so only add the timer once
+    if time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_sql)
+
+
+def install_sql_timers():
+    connection_created.connect(install_sql_timer, dispatch_uid='door_shop.profiling.install_sql_timer')
+    for connection in connections.all(initialized_only=True):
+        install_sql_timer(connection)
+
+
+class ProfilingTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_request.get()
+        if stats is None:
+            return super().render(context, request)
+        # Views rendering a template from inside another render count once
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - start
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render for the profiling middleware."""
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return ProfilingTemplate(template.template, self)
+
+
+class Profiler:
+    """A cProfile run, skipped when another request is already being profiled."""
+
+    def __init__(self):
+        self.profile = None
+
+    def __enter__(self):
+        if _profiler_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+            _profiler_lock.release()
+
+    def report(self, limit=40):
+        if self.profile is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+class SlowRequestLog:
+    """Ring buffer of the slowest recent requests (and every profiled one)."""
+
+    def __init__(self, size):
+        self.entries = deque(maxlen=size)
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def add(self, entry):
+        with self.lock:
+            entry['id'] = next(self.ids)
+            self.entries.append(entry)
+        return entry['id']
+
+    def slowest(self):
+        with self.lock:
+            entries = list(self.entries)
+        return sorted(entries, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def get(self, entry_id):
+        with self.lock:
+            return next((entry for entry in self.entries if entry['id'] == entry_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+slow_requests = SlowRequestLog(getattr(settings, 'PROFILING_BUFFER_SIZE', 50))
+
+
+def server_timing(stats, total):
+    sql_ms = stats.sql_time * 1000
+    template_ms = stats.template_time * 1000
+    total_ms = total * 1000
+    return ', '.join([
+        f'sql;dur={sql_ms:.1f};desc="{stats.sql_count} queries"',
+        f'tpl;dur={template_ms:.1f};desc="templates"',
+        f'app;dur={max(total_ms - sql_ms - template_ms, 0):.1f};desc="python"',
+        f'total;dur={total_ms:.1f}',
+    ])
+
+
+def record_request(request, response, stats, total, profile_report=None):
+    """Keep the request in the slow log if it was slow or profiled; returns its log id."""
+    total_ms = total * 1000
+    if profile_report is None and total_ms < getattr(settings, 'PROFILING_SLOW_MS', 500):
+        return None
+    user = getattr(request, '_cached_user', None)
+    return slow_requests.add({
+        'at': timezone.now(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': getattr(request.resolver_match, 'view_name', ''),
+        'status': response.status_code,
+        'user': user.get_username() if user is not None and user.is_authenticated else '',
+        'total_ms': round(total_ms, 1),
+        'sql_ms': round(stats.sql_time * 1000, 1),
+        'sql_count': stats.sql_count,
+        'template_ms': round(stats.template_time * 1000, 1),
+        'profile': profile_report,
+    })
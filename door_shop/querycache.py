@@ -0,0 +1,125 @@
+"""Opt-in caching of queryset results, invalidated through table versions.
+
+``Model.objects.filter(...).cached()`` keeps the results in the default cache
+under a key made of the compiled SQL and parameters plus the current versions
+of every table the query reads (``door_shop.versioning``). A committed write to
+any of those tables bumps its version, so the old entry is never read again.
+
+Only models whose tables are tracked (``track_table_versions``) can be cached;
+their managers should be ``CachingQuerySet.as_manager()`` so that
+``update()`` and the bulk methods bump the version too (and drop the cached
+row versions of models with ``track_row_versions``). Tables that a query
+only references from a subquery are not seen: don't cache such queries.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .versioning import bump_table_version, forget_row_versions, is_row_tracked, is_tracked, table_version
+
+logger = logging.getLogger(__name__)
+
+
+def _in_transaction(connection):
+    # Versions are bumped on commit, so a transaction could read entries older
+    # than its own writes. The atomic blocks TestCase wraps each test in don't count.
+    return any(not getattr(block, '_from_testcase', False) for block in connection.atomic_blocks)
+
+
+class CachingQuerySet(QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._use_cache = False
+        self._cache_timeout = None
+
+    def cached(self, timeout=None):
+        """This queryset, with its results served from the cache when the tables are unchanged."""
+        clone = self._chain()
+        clone._use_cache = True
+        clone._cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._use_cache = self._use_cache
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def results_cache_key(self):
+        """Cache key of this query's results, or None when it must not be cached."""
+        if (
+            self.query.select_for_update
+            or self._prefetch_related_lookups
+            or _in_transaction(connections[self.db])
+        ):
+            return None
+        query = self.query.chain()
+        try:
+            sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        # Compiling added the select_related joins, so the alias map lists every table read
+        tables = sorted({alias.table_name for alias in query.alias_map.values()})
+        untracked = [table for table in tables if not is_tracked(table)]
+        if untracked:
+            logger.warning('Not caching a %s query: no version counter for %s', self.model.__name__, untracked)
+            return None
+        shape = f'{self._iterable_class.__name__}:{self._fields}'
+        digest = hashlib.md5(f'{self.db}\n{shape}\n{sql}\n{params!r}'.encode()).hexdigest()
+        return f'query:{digest}:{table_version(*tables)}'
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._use_cache:
+            key = self.results_cache_key()
+            if key is not None:
+                results = cache.get(key)
+                if results is None:
+                    super()._fetch_all()
+                    timeout = self._cache_timeout or getattr(settings, 'QUERY_CACHE_TTL', 300)
+                    cache.set(key, self._result_cache, timeout)
+                else:
+                    self._result_cache = results
+                return
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=None):
+        # ModelChoiceField iterates with iterator(), which would skip the cache
+        if self._use_cache:
+            self._fetch_all()
+            return iter(self._result_cache)
+        return super().iterator(chunk_size)
+
+    # Writes that don't send model signals bump the version themselves
+
+    def _bump_on_commit(self):
+        transaction.on_commit(lambda: bump_table_version(self.model), using=self.db)
+
+    def update(self, **kwargs):
+        pks = None
+        if is_row_tracked(self.model):
+            # Row versions (ETags) are updated_at stamps, which update() leaves alone
+            kwargs.setdefault('updated_at', timezone.now())
+            pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        self._bump_on_commit()
+        if pks:
+            forget_row_versions(self.model, pks, using=self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._bump_on_commit()
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        rows = super().bulk_update(objs, fields, batch_size)
+        self._bump_on_commit()
+        if is_row_tracked(self.model):
+            forget_row_versions(self.model, [obj.pk for obj in objs], using=self.db)
+        return rows
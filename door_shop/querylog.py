@@ -0,0 +1,172 @@
+"""Slow query log: SQL grouped by fingerprint across all the traffic a process serves.
+
+``QueryLogMiddleware`` adds ``log_query`` to every database connection. Each
+statement is reduced to a fingerprint (placeholders and literals replaced, IN
+lists collapsed) and counted with its total and worst time and the views that
+ran it. Statements slower than ``QUERYLOG_SLOW_MS`` are logged with the line of
+shop code that issued them. Every web process rewrites its dump in
+``QUERYLOG_DIR`` at most every ``QUERYLOG_DUMP_INTERVAL`` seconds (so short-lived
+processes such as test runs leave nothing behind); the ``slow_queries``
+management command merges the dumps and shows the top offenders. Dumps not
+rewritten for ``QUERYLOG_MAX_AGE`` seconds belong to workers that have exited
+(or served nothing since) and are deleted when the dumps are read.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+current_request = contextvars.ContextVar('querylog_request', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \(\?(?:, \?)*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+')
+_SPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """``sql`` with literals and placeholders as ``?`` and IN / VALUES lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def query_origin():
+    """The innermost frame of shop code (not Django, not this module) on the stack."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename \
+                and not frame.filename.endswith(('querylog.py', 'profiling.py')):
+            return f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} in {frame.name}'
+    return ''
+
+
+class QueryLog:
+    """Per-fingerprint counters for this process."""
+
+    def __init__(self, max_fingerprints=1000):
+        self.max_fingerprints = max_fingerprints
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.last_dump = time.monotonic()
+
+    def record(self, sql, duration, view):
+        key = fingerprint(sql)
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                if len(self.stats) >= self.max_fingerprints:
+                    return
+                entry = self.stats[key] = {'count': 0, 'total': 0.0, 'max': 0.0, 'views': Counter()}
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            entry['views'][view] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                key: dict(entry, views=dict(entry['views']))
+                for key, entry in self.stats.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+    def dump(self, directory=None):
+        directory = Path(directory or settings.QUERYLOG_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'querylog-{os.getpid()}.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+        self.last_dump = time.monotonic()
+        return path
+
+    def dump_if_due(self):
+        if time.monotonic() - self.last_dump >= getattr(settings, 'QUERYLOG_DUMP_INTERVAL', 60):
+            try:
+                self.dump()
+            except OSError:
+                logger.exception('Could not write the query log')
+
+
+query_log = QueryLog(getattr(settings, 'QUERYLOG_MAX_FINGERPRINTS', 1000))
+
+
+def log_query(execute, sql, params, many, context):
+    request = current_request.get()
+    if request is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else ''
+        query_log.record(sql, duration, view)
+        if duration * 1000 >= getattr(settings, 'QUERYLOG_SLOW_MS', 100):
+            logger.warning(
+                'Slow query (%.1fms) in %s from %s: %s',
+                duration * 1000, view or '-', query_origin() or '-', fingerprint(sql),
+            )
+
+
+def install_query_log(connection, **kwargs):
+    if log_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_query)
+
+
+def install_query_logs():
+    connection_created.connect(install_query_log, dispatch_uid='door_shop.querylog.install_query_log')
+    for connection in connections.all(initialized_only=True):
+        install_query_log(connection)
+
+
+def load_dumps(directory=None, max_age=None):
+    """Merge the process dumps in ``directory`` into one fingerprint -> totals dict.
+
+    Dumps older than ``max_age`` seconds (default ``QUERYLOG_MAX_AGE``) are
+    removed instead of merged. A live worker that was idle that long writes
+    its full totals again on its next dump, so nothing of it is lost.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'QUERYLOG_MAX_AGE', 24 * 60 * 60)
+    cutoff = time.time() - max_age
+    merged = {}
+    for path in sorted(Path(directory or settings.QUERYLOG_DIR).glob('querylog-*.json')):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                continue
+            stats = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for key, entry in stats.items():
+            total = merged.setdefault(key, {'count': 0, 'total': 0.0, 'max': 0.0, 'views': Counter()})
+            total['count'] += entry['count']
+            total['total'] += entry['total']
+            total['max'] = max(total['max'], entry['max'])
+            total['views'].update(entry['views'])
+    return merged
@@ -0,0 +1,98 @@
+"""Database routers: optional per-store databases, and the reporting snapshot.
+
+Per-store databases
+-------------------
+
+``STORE_DATABASES`` maps a store code to a database alias. A store listed there
+gets its sales, sale items and payments written to (and read back from) that
+alias, so each branch's checkouts take their own SQLite write lock. Shared
+tables (products, stock levels, customers, users, summaries) stay on
+``default``.
+
+Saved rows follow the database they were loaded from and new rows follow
+their store (or their sale's). Queries that aren't tied to an instance read
+``default`` unless given ``.using(store.database)``, so whatever lists or adds
+up sales across the shop (day totals, reports, segments, the dashboard and the
+customer pages) loops over ``pos.models.in_sale_databases``.
+
+A store database has no shared tables to reference, so its connections run
+without SQLite foreign key enforcement. Create its tables with
+``manage.py migrate --database store_<code>``.
+
+Reporting snapshot
+------------------
+
+While a reporting view runs (see ``door_shop.snapshot``), reads of the shop's
+data go to the snapshot. Sessions, users and the reports app's own tables
+(jobs, segments) are still read live, since a request may have just written them.
+"""
+from django.conf import settings
+
+from .snapshot import reading_snapshot
+
+ROUTED_MODELS = {'pos.sale', 'pos.saleitem', 'pos.payment'}
+
+
+def _store_aliases():
+    return set(settings.STORE_DATABASES.values())
+
+
+def _instance_db(instance):
+    # The hint is the row being saved or read from, or the value assigned to one of its foreign keys
+    label = instance._meta.label_lower
+    if label == 'inventory.store':
+        return instance.database
+    if instance._state.db and not instance._state.adding:
+        return instance._state.db
+    if label == 'pos.sale':
+        return instance.store.database if instance.store_id else None
+    if label in ROUTED_MODELS and instance.sale_id:
+        return _instance_db(instance.sale)
+    return instance._state.db
+
+
+class StoreRouter:
+    def _db_for(self, model, instance=None, **hints):
+        if instance is None:
+            return None
+        if model._meta.label_lower in ROUTED_MODELS:
+            return _instance_db(instance)
+        # e.g. item.product on an item from a store database: shared tables are on default
+        if instance._state.db in _store_aliases():
+            return 'default'
+        return None
+
+    db_for_read = _db_for
+    db_for_write = _db_for
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default'} | _store_aliases()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _store_aliases():
+            return f'{app_label}.{model_name}' in ROUTED_MODELS
+        return None
+
+
+SNAPSHOT_APPS = {'inventory', 'pos'}
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        if reading_snapshot.get() is not None and model._meta.app_label in SNAPSHOT_APPS:
+            return settings.REPORTING_DATABASE
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if settings.REPORTING_DATABASE in (obj1._state.db, obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The snapshot is a copy of default, tables and all
+        if db == settings.REPORTING_DATABASE:
+            return False
+        return None
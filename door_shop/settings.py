@@ -51,10 +51,14 @@ LOGIN_URL = '/admin/login/'
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "door_shop.middleware.StaticFilesMiddleware",
+    "door_shop.middleware.QueryLogMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "door_shop.middleware.ProfilingMiddleware",
+    "door_shop.middleware.ReportingSnapshotMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -63,7 +67,8 @@ ROOT_URLCONF = "door_shop.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that also times renders for the profiling middleware
+        "BACKEND": "door_shop.profiling.ProfilingDjangoTemplates",
         'DIRS': [BASE_DIR / 'templates'],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -72,6 +77,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "door_shop.snapshot.snapshot_context",
             ],
         },
     },
@@ -83,17 +89,191 @@ WSGI_APPLICATION = "door_shop.wsgi.application"
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 import os
+import tempfile
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic writes content-hashed names plus .gz (and .br, with the brotli
+# package installed) copies; StaticFilesMiddleware serves them, hashed names
+# with a one-year immutable Cache-Control and the rest for STATIC_MAX_AGE seconds.
+# STATIC_ROOT is build output and not kept in git: run
+# `python manage.py collectstatic --noinput` on every deploy.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "door_shop.storage.CompressedManifestStaticFilesStorage"},
+}
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '1') == '1'
+STATIC_MAX_AGE = 3600
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# DOOR_SHOP_DB selects the profile: "sqlite" (default) or "postgres".
+DB_PROFILE = os.environ.get("DOOR_SHOP_DB", "sqlite")
+
+if DB_PROFILE == "postgres":
+    # Needs psycopg (pip install "psycopg[binary]"). For pooling run PgBouncer in
+    # transaction mode in front of the server and set PGBOUNCER=1.
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "door_shop"),
+            "USER": os.environ.get("POSTGRES_USER", "door_shop"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "127.0.0.1"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "CONN_HEALTH_CHECKS": True,
+            # Server-side cursors don't survive PgBouncer transaction pooling
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("PGBOUNCER") == "1",
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "door_shop.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            # Keep connections open between requests instead of reconnecting
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 600)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Seconds sqlite3 waits for a lock before "database is locked"
+                "timeout": 20,
+                "transaction_mode": "IMMEDIATE",
+                "pragmas": {
+                    "journal_mode": "WAL",  # readers no longer block the writer
+                    "synchronous": "NORMAL",  # safe with WAL, far fewer fsyncs
+                    "busy_timeout": 20000,
+                    "cache_size": -32000,  # KiB, i.e. 32 MB page cache
+                    "mmap_size": 268435456,  # 256 MB
+                    "temp_store": "MEMORY",
+                    "foreign_keys": "ON",
+                },
+            },
+        }
+    }
+
+# Reports read a copy of the database refreshed with SQLite's online backup API
+# (door_shop.snapshot), so they never hold locks the tills are waiting on
+if DB_PROFILE == "postgres":
+    REPORTING_DATABASE = None
+else:
+    REPORTING_DATABASE = "reporting"
+    DATABASES["reporting"] = {
+        "ENGINE": "door_shop.backends.sqlite3",
+        "NAME": BASE_DIR / "db-reporting.sqlite3",
+        # Reopened per request, so a refreshed copy is picked up right away
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {
+            "timeout": 20,
+            "pragmas": {
+                "query_only": "ON",
+                "cache_size": -32000,
+                "mmap_size": 268435456,
+                "temp_store": "MEMORY",
+            },
+        },
+        # Tests read the live test database
+        "TEST": {"MIRROR": "default"},
+    }
+REPORTING_VIEW_MODULES = ["reports.views"]
+# Seconds a snapshot may lag the live data before it is refreshed
+REPORTING_MAX_LAG = int(os.environ.get("REPORTING_MAX_LAG", 300))
+# Backup step size in pages, and the pause between steps for writers to get in
+REPORTING_BACKUP_PAGES = 1024
+REPORTING_BACKUP_SLEEP = 0.01
+
+# Optional per-store databases, e.g. STORE_DATABASES=north,south: each listed
+# store's sales go to their own database (door_shop.routers.StoreRouter)
+STORE_DATABASES = {}
+for _code in filter(None, (code.strip() for code in os.environ.get("STORE_DATABASES", "").split(","))):
+    _store_db = {**DATABASES["default"], "OPTIONS": dict(DATABASES["default"].get("OPTIONS", {}))}
+    if DB_PROFILE == "postgres":
+        _store_db["NAME"] = f"{_store_db['NAME']}_store_{_code}"
+    else:
+        _store_db["NAME"] = BASE_DIR / f"db-store-{_code}.sqlite3"
+        # The tables its sales reference live in db.sqlite3
+        _store_db["OPTIONS"]["pragmas"] = {**_store_db["OPTIONS"]["pragmas"], "foreign_keys": "OFF"}
+    DATABASES[f"store_{_code}"] = _store_db
+    STORE_DATABASES[_code] = f"store_{_code}"
+
+DATABASE_ROUTERS = ["door_shop.routers.StoreRouter", "door_shop.routers.ReportingRouter"]
+
+# Cache
+# LocMemCache is per process; point this at a shared backend (file-based,
+# memcached or redis) when running several workers.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "door-shop",
     }
 }
 
+# Dashboard counters are cached for this many seconds (and dropped on changes)
+DASHBOARD_SNAPSHOT_TTL = 30
+
+# Cached template fragments (product grids, report bodies) are keyed on table
+# versions (door_shop.versioning), so the TTL only bounds memory and the lag
+# between workers that don't share a cache
+FRAGMENT_CACHE_TTL = 600
+
+# Results of .cached() querysets (door_shop.querycache); same versioned keys
+QUERY_CACHE_TTL = 300
+
+# Warm start of each worker (door_shop.warmup, run by wsgi.py and asgi.py)
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+
+# door_shop's own messages (warm-up timings, slow queries) go to the console
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "door_shop": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# Live updates (Server-Sent Events, served by door_shop.asgi)
+EVENT_STREAM_KEEPALIVE = 15
+EVENT_STREAM_MAX_AGE = 300
+
+# Background report jobs
+# Reports spanning more days than the threshold are generated by a report job.
+# REPORT_JOB_EXECUTOR is 'thread' or 'process' (in-process pool), or 'external'
+# to leave jobs for the `run_report_jobs` management command.
+REPORT_BACKGROUND_THRESHOLD_DAYS = 62
+REPORT_JOB_EXECUTOR = os.environ.get('REPORT_JOB_EXECUTOR', 'thread')
+REPORT_JOB_WORKERS = 2
+# A job still running after this many seconds is taken to have lost its worker
+# and is claimed again
+REPORT_JOB_TIMEOUT = 30 * 60
+
+# Sales archive (pos.archive, run `manage.py archive_sales` nightly)
+# Closed days older than this many days move to the archive tables, this many
+# sales per transaction.
+SALES_ARCHIVE_AFTER_DAYS = int(os.environ.get('SALES_ARCHIVE_AFTER_DAYS', 365))
+SALES_ARCHIVE_BATCH_SIZE = 500
+
+# Request profiling (door_shop.middleware.ProfilingMiddleware)
+# Requests slower than PROFILING_SLOW_MS are kept, up to PROFILING_BUFFER_SIZE
+# of the latest, for the staff perf panel at /perf/.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1') == '1'
+PROFILING_SLOW_MS = 500
+PROFILING_BUFFER_SIZE = 50
+# Share of requests (0.0 to 1.0) profiled at random, whoever makes them, so
+# the perf panel has cProfile reports from real traffic as well
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+
+# Slow query log (door_shop.querylog, read with `manage.py slow_queries`)
+# Every web process dumps its per-fingerprint totals to QUERYLOG_DIR.
+QUERYLOG_ENABLED = os.environ.get('QUERYLOG_ENABLED', '1') == '1'
+QUERYLOG_SLOW_MS = 100
+QUERYLOG_DIR = os.environ.get('QUERYLOG_DIR', os.path.join(tempfile.gettempdir(), 'door_shop_querylog'))
+QUERYLOG_DUMP_INTERVAL = 60
+# Seconds after which a dump that hasn't been rewritten (its worker exited) is
+# dropped from the report and deleted
+QUERYLOG_MAX_AGE = int(os.environ.get('QUERYLOG_MAX_AGE', 24 * 60 * 60))
+QUERYLOG_MAX_FINGERPRINTS = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,11 +306,6 @@ USE_I18N = True
 USE_TZ = True
 
 
-# Static files (CSS, JavaScript, Images)
-# https://docs.djangoproject.com/en/4.2/howto/static-files/
-
-STATIC_URL = "static/"
-
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,151 @@
+"""Read-only reporting snapshot of the SQLite database.
+
+Reports read a copy of ``db.sqlite3`` (the ``REPORTING_DATABASE`` alias)
+instead of the live file, so a long report never holds a read transaction the
+tills' checkpoints and writes have to wait on. The copy is made with SQLite's
+online backup API, ``REPORTING_BACKUP_PAGES`` pages per step with a short sleep
+between steps so writers get in, into a temporary file that then replaces the
+snapshot. The snapshot's mtime is when the copy started, i.e. how current its
+data is.
+
+``ReportingSnapshotMiddleware`` flags requests for the views in
+``REPORTING_VIEW_MODULES``; while one runs, ``door_shop.routers.ReportingRouter``
+sends their inventory and sales reads to the snapshot. A snapshot older than
+``REPORTING_MAX_LAG`` seconds is refreshed in a background thread (or by
+``manage.py refresh_reporting_snapshot``); until the first one exists reports
+read the live database.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# The SnapshotInfo of the snapshot a reporting view is reading, while it runs
+reading_snapshot = ContextVar('reading_snapshot', default=None)
+
+REFRESH_LOCK_KEY = 'reporting-snapshot-refresh'
+_refresh_lock = threading.Lock()
+
+
+@dataclass
+class SnapshotInfo:
+    taken_at: datetime
+    max_lag: int
+
+    @property
+    def lag(self):
+        return (datetime.now(dt_timezone.utc) - self.taken_at).total_seconds()
+
+    @property
+    def is_stale(self):
+        return self.lag > self.max_lag
+
+
+def _file_path(alias):
+    connection = connections[alias]
+    # Under the test runner the snapshot mirrors the in-memory test database
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    return Path(connection.settings_dict['NAME'])
+
+
+def snapshot_path():
+    alias = getattr(settings, 'REPORTING_DATABASE', None)
+    if not alias or alias not in settings.DATABASES:
+        return None
+    return _file_path(alias)
+
+
+def snapshot_info():
+    """When the current snapshot was taken, or None without one."""
+    path = snapshot_path()
+    try:
+        stat = path.stat() if path else None
+    except OSError:
+        return None
+    # An empty file is what connecting to a missing snapshot leaves behind
+    if stat is None or not stat.st_size:
+        return None
+    return SnapshotInfo(datetime.fromtimestamp(stat.st_mtime, dt_timezone.utc), settings.REPORTING_MAX_LAG)
+
+
+def copy_database(source, target, pages=None, sleep=None, progress=None):
+    """Copy the SQLite file ``source`` over ``target`` with the online backup API.
+
+    Returns the time the copy started, which becomes ``target``'s mtime.
+    """
+    pages = pages or getattr(settings, 'REPORTING_BACKUP_PAGES', 1024)
+    sleep = getattr(settings, 'REPORTING_BACKUP_SLEEP', 0.01) if sleep is None else sleep
+    target = Path(target)
+    temporary = target.with_name(f'{target.name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    started = time.time()
+    src = sqlite3.connect(source, timeout=20)
+    dst = sqlite3.connect(temporary)
+    try:
+        src.backup(dst, pages=pages, sleep=sleep, progress=progress)
+        # Readers only ever open the copy: no -wal/-shm files next to it
+        dst.execute('PRAGMA journal_mode = DELETE')
+    except BaseException:
+        dst.close()
+        temporary.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+    dst.close()
+    os.utime(temporary, (started, started))
+    # Atomic swap: open connections keep reading the old copy until they reconnect
+    os.replace(temporary, target)
+    return started
+
+
+def refresh_snapshot(pages=None, sleep=None, progress=None):
+    path, source = snapshot_path(), _file_path('default')
+    if path is None or source is None:
+        return None
+    started = time.perf_counter()
+    taken_at = copy_database(source, path, pages, sleep, progress)
+    logger.info('Reporting snapshot refreshed in %.0fms', (time.perf_counter() - started) * 1000)
+    return taken_at
+
+
+def refresh_in_background():
+    """Start a refresh unless one is already running (in this process or, with a shared cache, any)."""
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    if not cache.add(REFRESH_LOCK_KEY, os.getpid(), timeout=300):
+        _refresh_lock.release()
+        return False
+
+    def run():
+        try:
+            refresh_snapshot()
+        except Exception:
+            logger.exception('Reporting snapshot refresh failed')
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='reporting-snapshot', daemon=True).start()
+    return True
+
+
+def data_source():
+    """Key-safe name of what this request reads: ``live`` or the snapshot's timestamp."""
+    info = reading_snapshot.get()
+    return f'snapshot-{info.taken_at.timestamp()}' if info else 'live'
+
+
+def snapshot_context(request):
+    """Template context processor: the snapshot a reporting page was built from."""
+    return {'reporting_snapshot': getattr(request, 'reporting_snapshot', None)}
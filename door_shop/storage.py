@@ -0,0 +1,67 @@
+"""Static files storage that fingerprints and precompresses during collectstatic."""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+# Below this, headers cost more than compression saves
+MIN_COMPRESS_SIZE = 256
+
+ENCODINGS = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+
+def compress(data):
+    """Precompressed variants of ``data`` as {suffix: bytes}, skipping ones that don't pay off."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed file names from the manifest storage, plus ``.gz`` (and ``.br``) next to each text asset.
+
+    The variants are served by ``door_shop.middleware.StaticFilesMiddleware``.
+    """
+    # A file missing from the manifest (collectstatic not rerun after a deploy)
+    # is linked by its plain name instead of failing the page
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        final_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                final_names.add(name)
+                if hashed_name:
+                    final_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(final_names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                for compressed_name in self.write_compressed(name):
+                    yield name, compressed_name, True
+
+    def write_compressed(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return []
+        written = []
+        for suffix, body in compress(data).items():
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self.save(compressed_name, ContentFile(body))
+            written.append(compressed_name)
+        return written
+
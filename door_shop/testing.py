@@ -0,0 +1,266 @@
+"""Assertions shared by the app test suites."""
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class QueryPlanMixin:
+    """Run a view, EXPLAIN the queries it issued and check which indexes they used.
+
+    The plans come from SQLite's ``EXPLAIN QUERY PLAN``; test cases using this
+    mixin should be skipped on other database backends.
+    """
+
+    def capture_statements(self, url, method='get', data=None):
+        """SQL of the reads, updates and deletes a request issued."""
+        # A cached page or fragment would skip the queries being checked
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, url)
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def query_plans(self, url, table, method='get', data=None):
+        """Plans of the view's queries that touch ``table``."""
+        quoted = f'"{table}"'
+        return [
+            (sql, self.explain(sql))
+            for sql in self.capture_statements(url, method, data)
+            if quoted in sql
+        ]
+
+    def assertUsesIndex(self, url, table, index_name, method='get', data=None):
+        plans = self.query_plans(url, table, method, data)
+        self.assertTrue(plans, f'{url} issued no query against {table}')
+        if not any(index_name in step for _, plan in plans for step in plan):
+            self.fail(self._plan_report(f'{url}: no query on {table} used {index_name}', plans))
+
+    def assertNoFullScan(self, url, table):
+        plans = self.query_plans(url, table)
+        for sql, plan in plans:
+            if any(step == f'SCAN {table}' for step in plan):
+                self.fail(self._plan_report(f'{url}: full scan of {table}', [(sql, plan)]))
+
+    @staticmethod
+    def _plan_report(message, plans):
+        lines = [message]
+        for sql, plan in plans:
+            lines.append(f'  {sql}')
+            lines.extend(f'    {step}' for step in plan)
+        return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """Every URL of an app answers a GET within a fixed number of queries.
+
+    Subclasses set ``urlpatterns`` (the app's URL list), ``query_budgets``
+    (URL name -> maximum queries) and ``data`` (from ``create_shop_data``), and
+    may set ``url_kwargs`` and ``url_query`` (URL name -> reverse() kwargs and
+    query string). Each URL is measured, the
+    dataset is grown and the URL measured again: the count must not move.
+
+    Endpoints that do their work on a POST also list it in ``url_requests``
+    (URL name -> test client call, e.g. ``{'method': 'post', 'data': {...},
+    'content_type': 'application/json'}``); it is measured as well and
+    budgeted as ``'<name> POST'``. Such requests are rolled back afterwards,
+    so a POST sees the same rows every time it is measured.
+    """
+    urlpatterns = []
+    query_budgets = {}
+    url_kwargs = {}
+    url_query = {}
+    url_requests = {}
+    grow_by = 20
+
+    def budget_names(self):
+        names = []
+        for pattern in self.urlpatterns:
+            names.append(pattern.name)
+            if pattern.name in self.url_requests:
+                method = self.url_requests[pattern.name].get('method', 'get')
+                names.append(f'{pattern.name} {method.upper()}')
+        return names
+
+    def measure_queries(self):
+        counts = {}
+        for pattern in self.urlpatterns:
+            url = reverse(pattern.name, kwargs=self.url_kwargs.get(pattern.name)) + self.url_query.get(pattern.name, '')
+            counts[pattern.name] = self.count_queries(url)
+            if pattern.name in self.url_requests:
+                request = dict(self.url_requests[pattern.name])
+                method = request.pop('method', 'get')
+                counts[f'{pattern.name} {method.upper()}'] = self.count_queries(url, method, **request)
+        return counts
+
+    def count_queries(self, url, method='get', **request):
+        # Cached pages would hide the queries they make on a miss
+        cache.clear()
+        if method == 'get':
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, **request)
+        else:
+            # Not around GETs: .cached() reads skip the cache inside a transaction
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    response = getattr(self.client, method)(url, **request)
+                transaction.set_rollback(True)
+        self.assertLess(response.status_code, 500, url)
+        return len(ctx.captured_queries)
+
+    def test_every_url_has_a_query_budget(self):
+        missing = set(self.budget_names()) - set(self.query_budgets)
+        self.assertFalse(missing, f'URLs without a query budget: {sorted(missing)}')
+
+    def test_query_counts_stay_within_budget_as_data_grows(self):
+        before = self.measure_queries()
+        grow_shop_data(self.data, self.grow_by)
+        after = self.measure_queries()
+        for name, count in after.items():
+            with self.subTest(url=name):
+                self.assertEqual(count, before[name], f'{name} runs more queries with more rows')
+                self.assertLessEqual(count, self.query_budgets.get(name, 0), f'{name} is over its query budget')
+
+
+class StoreDatabaseMixin:
+    """Give the ``branch`` store (from ``create_shop_data``) its own sale database.
+
+    Like a real store database (door_shop.routers) ``store_branch`` holds only
+    the sales tables, without foreign key enforcement; here it lives in memory
+    for the length of the test case.
+    """
+    store_alias = 'store_branch'
+
+    @classmethod
+    def setUpClass(cls):
+        import copy
+
+        from django.core.management import call_command
+        from django.db import connections
+        from django.test.utils import override_settings
+
+        store_db = copy.deepcopy(connections.settings['default'])
+        store_db['NAME'] = f'file:memorydb_{cls.store_alias}?mode=memory&cache=shared'
+        store_db['OPTIONS']['pragmas'] = {**store_db['OPTIONS'].get('pragmas', {}), 'foreign_keys': 'OFF'}
+        connections.settings[cls.store_alias] = store_db
+        cls._store_databases = override_settings(STORE_DATABASES={'branch': cls.store_alias})
+        cls._store_databases.enable()
+        call_command('migrate', database=cls.store_alias, verbosity=0)
+        # The schema editor turns enforcement back on as it finishes, on the one
+        # connection the in-memory database lives in
+        connections[cls.store_alias].disable_constraint_checking()
+        # Added here rather than as a class attribute: the test runner would
+        # try to create a test database for an alias that doesn't exist yet
+        cls.databases = {*cls.databases, cls.store_alias}
+        super().setUpClass()
+
+    def _should_check_constraints(self, connection):
+        # None of the rows a store database's sales point to are in it
+        return connection.alias != self.store_alias and super()._should_check_constraints(connection)
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+
+        super().tearDownClass()
+        cls._store_databases.disable()
+        del connections[cls.store_alias]
+        del connections.settings[cls.store_alias]
+
+
+def create_shop_data(sales=3):
+    """A small but complete shop: stock, a customer with sales, purchases and adjustments."""
+    from decimal import Decimal
+
+    from django.contrib.auth.models import User
+
+    from inventory.models import (
+        Category, Customer, Product, PurchaseItem, PurchaseOrder, StockAdjustment, StockTransfer, Store, Supplier,
+    )
+    from pos.models import Sale, SaleItem
+
+    user = User.objects.create_superuser('tester', 'tester@example.com', 'pass')
+    supplier = Supplier.objects.create(name='Acme Doors', phone='01700000000')
+    category = Category.objects.create(name='Doors')
+    product = Product.objects.create(
+        name='Oak Door', category=category, product_type='main_door', supplier_name=supplier,
+        cost_price=Decimal('100.00'), selling_price=Decimal('150.00'),
+        current_stock=Decimal('500'), min_stock_level=Decimal('5'),
+    )
+    customer = Customer.objects.create(name='Rahim', phone='01800000000')
+    for i in range(sales):
+        sale = Sale.objects.create(customer=customer if i % 2 == 0 else None, sale_person=user)
+        SaleItem.objects.create(sale=sale, product=product, quantity=Decimal('1'), unit_price=product.selling_price)
+    orders = {}
+    for status in ('pending', 'received'):
+        order = PurchaseOrder.objects.create(supplier=supplier, status=status)
+        item = PurchaseItem.objects.create(purchase_order=order, product=product, quantity=Decimal('10'), unit_cost=Decimal('95.00'))
+        order.update_total()
+        orders[status] = order
+    for adjustment_type in ('in', 'out', 'adjust'):
+        StockAdjustment.objects.create(
+            product=product, adjustment_type=adjustment_type, quantity=Decimal('1'),
+            reason='Count', created_by=user,
+        )
+    branch = Store.objects.create(name='Branch', code='branch')
+    StockTransfer.objects.create(
+        product=product, from_store=Store.default(), to_store=branch, quantity=Decimal('20'), created_by=user,
+    )
+    return {
+        'user': user, 'supplier': supplier, 'product': product, 'customer': customer, 'sale': sale, 'branch': branch,
+        'purchase': orders['pending'], 'purchase_item': orders['pending'].items.first(),
+    }
+
+
+def grow_shop_data(data, count):
+    """Add ``count`` more of everything, including to the objects detail pages show."""
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from inventory.models import (
+        Category, Customer, Product, PurchaseItem, PurchaseOrder, StockAdjustment, StockTransfer, Store, Supplier,
+    )
+    from pos.models import Sale, SaleItem
+    from reports.segments import refresh_customer_segments
+
+    user = data['user']
+    offset = Product.objects.count()
+    for n in range(offset, offset + count):
+        supplier = Supplier.objects.create(name=f'Supplier {n}', phone=f'0170{n:07d}')
+        product = Product.objects.create(
+            name=f'Door {n}', category=Category.objects.create(name=f'Category {n}'),
+            product_type='main_door', supplier_name=supplier,
+            cost_price=Decimal('80.00'), selling_price=Decimal('120.00'),
+            # Every third product is low on stock
+            current_stock=Decimal('2' if n % 3 == 0 else '200'), min_stock_level=Decimal('5'),
+        )
+        customer = Customer.objects.create(name=f'Customer {n}', phone=f'0180{n:07d}')
+        sales = [
+            Sale.objects.create(customer=customer, sale_person=user),
+            Sale.objects.create(customer=data['customer'], sale_person=user, payment_method='due'),
+            data['sale'],
+        ]
+        for sale in sales:
+            SaleItem.objects.create(sale=sale, product=product, quantity=Decimal('1'), unit_price=product.selling_price)
+        order = PurchaseOrder.objects.create(
+            supplier=supplier, status='received', received_at=timezone.now(), expected_date=timezone.now().date(),
+        )
+        for purchase in (order, data['purchase']):
+            PurchaseItem.objects.create(purchase_order=purchase, product=product, quantity=Decimal('5'), unit_cost=Decimal('80.00'))
+            purchase.update_total()
+        StockAdjustment.objects.create(
+            product=product, adjustment_type='in', quantity=Decimal('1'), reason='Count', created_by=user,
+        )
+        StockTransfer.objects.create(
+            product=product, from_store=Store.default(), to_store=data['branch'], quantity=Decimal('1'), created_by=user,
+        )
+    refresh_customer_segments()
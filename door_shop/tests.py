@@ -0,0 +1,383 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from door_shop import warmup
+from door_shop.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from door_shop.events import SUBSCRIBER_QUEUE_SIZE, hub, publish
+from door_shop.profiling import slow_requests
+from door_shop.querylog import fingerprint, load_dumps, query_log
+from door_shop.routers import ReportingRouter, StoreRouter
+from door_shop.snapshot import SnapshotInfo, copy_database, reading_snapshot
+from door_shop.testing import create_shop_data
+from inventory.models import Category, Product, Store
+from pos.models import Sale, SaleItem
+from reports.models import ReportJob
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        slow_requests.clear()
+        self.client.force_login(self.data['user'])
+
+    def test_server_timing_reports_queries_and_templates(self):
+        response = self.client.get(reverse('product_list'))
+        timing = dict(
+            part.split(';', 1) for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'sql', 'tpl', 'app', 'total'})
+        self.assertNotIn('desc="0 queries"', timing['sql'])
+
+    @override_settings(PROFILING_SLOW_MS=0)
+    def test_slow_requests_are_logged(self):
+        self.client.get(reverse('product_list'))
+        entry = slow_requests.slowest()[0]
+        self.assertEqual(entry['view'], 'product_list')
+        self.assertGreater(entry['sql_count'], 0)
+        self.assertIsNone(entry['profile'])
+
+    def test_staff_can_profile_a_request(self):
+        response = self.client.get(reverse('product_list'), {'_profile': '1'})
+        entry = slow_requests.get(int(response['X-Profile-Id']))
+        self.assertIn('function calls', entry['profile'])
+
+        response = self.client.get(reverse('perf_panel'), {'id': entry['id']})
+        self.assertContains(response, 'function calls')
+
+    def test_profiling_and_perf_panel_are_staff_only(self):
+        user = User.objects.create_user('cashier', password='pass')
+        self.client.force_login(user)
+        response = self.client.get(reverse('product_list'), {'_profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get(reverse('perf_panel')).status_code, 302)
+
+    def test_a_sample_of_requests_is_profiled(self):
+        self.client.force_login(User.objects.create_user('cashier', password='pass'))
+        with override_settings(PROFILE_SAMPLE_RATE=1.0):
+            response = self.client.get(reverse('product_list'))
+        self.assertIn('function calls', slow_requests.get(int(response['X-Profile-Id']))['profile'])
+
+        with override_settings(PROFILE_SAMPLE_RATE=0.5), mock.patch('door_shop.middleware.random.random', return_value=0.7):
+            response = self.client.get(reverse('product_list'))
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cashier', password='pass')
+
+    def test_wsgi_requests_get_no_content(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('event_stream')).status_code, 204)
+
+    async def test_stream_needs_a_login(self):
+        response = await self.async_client.get(reverse('event_stream'))
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(EVENT_STREAM_KEEPALIVE=1)
+    async def test_published_events_reach_the_stream(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('event_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), b'retry: 3000\n\n')
+
+        publish('sale-committed', {'sale_id': 7})
+        self.assertEqual(
+            await asyncio.wait_for(anext(stream), 5),
+            b'event: sale-committed\ndata: {"sale_id": 7}\n\n',
+        )
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), b': keepalive\n\n')
+
+    async def test_a_slow_screen_drops_its_oldest_events(self):
+        with hub.subscribe() as queue:
+            for n in range(SUBSCRIBER_QUEUE_SIZE + 1):
+                hub.publish('stock-changed', {'n': n})
+            await asyncio.sleep(0)
+            self.assertEqual(queue.qsize(), SUBSCRIBER_QUEUE_SIZE)
+            self.assertEqual(queue.get_nowait(), ('stock-changed', {'n': 1}))
+        self.assertEqual(hub.subscriber_count, 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Tests the SQLite backend options')
+class SQLiteBackendTests(TestCase):
+    def wrapper(self, name, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': name, 'OPTIONS': options}
+        wrapper = SQLiteDatabaseWrapper(settings_dict, alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = self.wrapper(Path(directory) / 'tuned.sqlite3', timeout=5, pragmas={
+                'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234,
+            })
+            self.assertNotIn('pragmas', wrapper.get_connection_params())
+            self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+            self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+            wrapper.close()
+
+    def test_in_memory_databases_skip_wal(self):
+        wrapper = self.wrapper(':memory:', pragmas={'journal_mode': 'WAL', 'busy_timeout': 1234})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'memory')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+
+    def test_immediate_transactions_take_the_write_lock_up_front(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'tuned.sqlite3'
+            wrapper = self.wrapper(path, transaction_mode='immediate')
+            self.assertNotIn('transaction_mode', wrapper.get_connection_params())
+            wrapper.ensure_connection()
+            wrapper._start_transaction_under_autocommit()
+            other = sqlite3.connect(path, timeout=0)
+            try:
+                with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                    other.execute('BEGIN IMMEDIATE')
+            finally:
+                other.close()
+                wrapper.connection.rollback()
+                wrapper.close()
+
+    def test_unknown_transaction_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(':memory:', transaction_mode='LAZY').transaction_mode
+
+
+class QueryLogTests(TestCase):
+    def test_fingerprints_drop_literals_and_collapse_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "pos_sale" WHERE "id" IN (%s, %s, %s) AND "note" = \'x\' LIMIT 21'),
+            'SELECT * FROM "pos_sale" WHERE "id" IN (...) AND "note" = ? LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT 1 WHERE a IN (%s)'), fingerprint('SELECT 2  WHERE a IN (%s, %s)'))
+
+    def test_queries_are_counted_per_view_and_dumped(self):
+        data = create_shop_data()
+        self.client.force_login(data['user'])
+        query_log.reset()
+        for _ in range(2):
+            cache.clear()
+            self.client.get(reverse('product_list'))
+        views = Counter()
+        for entry in query_log.snapshot().values():
+            views.update(entry['views'])
+        self.assertGreater(views['product_list'], 0)
+        self.assertEqual(views['product_list'] % 2, 0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            query_log.dump(directory)
+            self.assertEqual(load_dumps(directory).keys(), query_log.snapshot().keys())
+
+    def test_dumps_of_exited_workers_are_pruned(self):
+        entry = {'count': 2, 'total': 0.5, 'max': 0.3, 'views': {'product_list': 2}}
+        with tempfile.TemporaryDirectory() as directory:
+            live = Path(directory, 'querylog-100.json')
+            live.write_text(json.dumps({'SELECT ?': entry}))
+            exited = Path(directory, 'querylog-101.json')
+            exited.write_text(json.dumps({'SELECT ?': entry, 'DELETE FROM "x"': entry}))
+            two_days_ago = time.time() - 2 * 24 * 60 * 60
+            os.utime(exited, (two_days_ago, two_days_ago))
+
+            with override_settings(QUERYLOG_MAX_AGE=24 * 60 * 60):
+                merged = load_dumps(directory)
+            self.assertEqual(list(merged), ['SELECT ?'])
+            self.assertEqual(merged['SELECT ?']['count'], 2)
+            self.assertTrue(live.exists())
+            self.assertFalse(exited.exists())
+            # An explicit window overrides the setting
+            self.assertEqual(load_dumps(directory, max_age=0), {})
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        Path(source.name, 'shop.css').write_text('.till { color: #e67e22; }\n' * 100)
+        self.root = Path(root.name)
+        settings = self.settings(
+            STATIC_ROOT=root.name,
+            STATICFILES_DIRS=[source.name],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = json.loads((self.root / 'staticfiles.json').read_text())['paths']['shop.css']
+
+    def test_collectstatic_precompresses_hashed_files(self):
+        self.assertTrue((self.root / f'{self.hashed}.gz').is_file())
+        self.assertTrue((self.root / 'shop.css.gz').is_file())
+
+    def test_serves_compressed_variant_with_immutable_caching(self):
+        response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            b''.join(response.streaming_content), (self.root / f'{self.hashed}.gz').read_bytes()
+        )
+
+        response = self.client.get('/static/shop.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/static/shop.css', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class QueryCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, queryset):
+        with CaptureQueriesContext(connection) as ctx:
+            results = list(queryset)
+        return results, len(ctx.captured_queries)
+
+    def test_results_are_cached_until_a_table_changes(self):
+        self.assertEqual(self.count_queries(Category.objects.cached())[1], 1)
+        self.assertEqual(self.count_queries(Category.objects.cached())[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Windows')
+        categories, queries = self.count_queries(Category.objects.cached())
+        self.assertEqual(queries, 1)
+        self.assertIn('Windows', [c.name for c in categories])
+
+    def test_joined_tables_and_queryset_updates_invalidate(self):
+        products = Product.objects.select_related('category').cached()
+        self.count_queries(products)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.filter(pk=self.data['product'].category_id).update(name='Interior')
+        results, queries = self.count_queries(products.all())
+        self.assertEqual(queries, 1)
+        self.assertEqual(results[0].category.name, 'Interior')
+
+    def test_result_shapes_are_cached_separately(self):
+        names = list(Category.objects.values_list('name', flat=True).cached())
+        rows = list(Category.objects.values_list('name').cached())
+        self.assertEqual(rows, [(name,) for name in names])
+
+    def test_not_cached_inside_a_transaction(self):
+        with transaction.atomic():
+            self.count_queries(Category.objects.cached())
+            self.assertEqual(self.count_queries(Category.objects.cached())[1], 1)
+
+
+class WarmupTests(TestCase):
+    def test_warmup_times_each_step_and_shows_on_perf_panel(self):
+        create_shop_data()
+        report = warmup.warmup(load_time=0.5)
+        steps = {step['name']: step for step in report['steps']}
+        self.assertEqual(list(steps), ['load', 'urls', 'templates', 'caches', 'database'])
+        self.assertTrue(all(step['count'] for name, step in steps.items() if name != 'load'))
+
+        self.client.force_login(User.objects.get(username='tester'))
+        self.assertContains(self.client.get(reverse('perf_panel')), f"templates {steps['templates']['ms']}ms")
+
+
+@override_settings(STORE_DATABASES={'branch': 'store_branch'})
+class StoreRouterTests(TestCase):
+    def test_branch_sales_are_routed_to_the_store_database(self):
+        data = create_shop_data()
+        router = StoreRouter()
+        sale = Sale(store=data['branch'], sale_person=data['user'])
+        self.assertEqual(router.db_for_write(Sale, instance=sale), 'store_branch')
+        self.assertEqual(router.db_for_write(Sale, instance=Sale(store=Store.default(), sale_person=data['user'])), 'default')
+
+        # Items follow their sale; the shared rows they point to stay on default
+        item = SaleItem(sale=sale, product=data['product'])
+        self.assertEqual(item._state.db, 'store_branch')
+        self.assertEqual(router.db_for_read(Product, instance=item), 'default')
+
+        self.assertTrue(router.allow_migrate('store_branch', 'pos', 'saleitem'))
+        self.assertFalse(router.allow_migrate('store_branch', 'inventory', 'product'))
+        self.assertIsNone(router.allow_migrate('default', 'inventory', 'product'))
+
+
+class ReportingSnapshotTests(TestCase):
+    def test_copy_is_made_in_steps_and_swapped_in(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = Path(directory) / 'live.sqlite3', Path(directory) / 'snapshot.sqlite3'
+            live = sqlite3.connect(source)
+            live.execute('PRAGMA journal_mode = WAL')
+            live.execute('CREATE TABLE t (x TEXT)')
+            live.executemany('INSERT INTO t VALUES (?)', [('x' * 500,)] * 200)
+            live.commit()
+            target.write_bytes(b'old copy')
+
+            steps = []
+            started = copy_database(source, target, pages=4, sleep=0, progress=lambda *args: steps.append(args))
+            live.close()
+
+            self.assertGreater(len(steps), 1)
+            self.assertEqual(list(Path(directory).glob('*.tmp')), [])
+            self.assertAlmostEqual(os.stat(target).st_mtime, started, places=3)
+            copy = sqlite3.connect(target)
+            self.assertEqual(copy.execute('SELECT count(*) FROM t').fetchone(), (200,))
+            self.assertEqual(copy.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+            copy.close()
+
+    def test_only_shop_data_is_read_from_the_snapshot(self):
+        router = ReportingRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        token = reading_snapshot.set(SnapshotInfo(timezone.now(), 300))
+        try:
+            self.assertEqual(router.db_for_read(Product), 'reporting')
+            self.assertEqual(router.db_for_read(Sale), 'reporting')
+            self.assertIsNone(router.db_for_read(ReportJob))
+            self.assertIsNone(router.db_for_read(User))
+        finally:
+            reading_snapshot.reset(token)
+        self.assertFalse(router.allow_migrate('reporting', 'pos', 'sale'))
+        self.assertIsNone(router.allow_migrate('default', 'pos', 'sale'))
+
+    def test_reports_read_live_data_without_a_snapshot(self):
+        create_shop_data()
+        self.client.force_login(User.objects.create_superuser('boss', password='pw'))
+        response = self.client.get(reverse('sales_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['reporting_snapshot'])
+
+    def test_asgi_middleware_chain_is_not_adapted(self):
+        from asgiref.sync import AsyncToSync, SyncToAsync
+        from django.core.handlers.asgi import ASGIHandler
+
+        handler, seen = ASGIHandler()._middleware_chain, []
+        while handler is not None:
+            self.assertNotIsInstance(handler, (AsyncToSync, SyncToAsync), seen)
+            seen.append(type(handler).__name__)
+            handler = getattr(handler, '__wrapped__', None) or getattr(handler, 'get_response', None)
+        self.assertIn('ReportingSnapshotMiddleware', seen)
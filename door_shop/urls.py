@@ -10,4 +10,6 @@ urlpatterns = [
     path('reports/', include('reports.urls')),
     path('', views.dashboard, name='dashboard'),  # Main index page
     path('dashboard/', views.dashboard, name='dashboard'),  # Main dashboard
+    path('events/', views.event_stream, name='event_stream'),  # Live updates (ASGI only)
+    path('perf/', views.perf_panel, name='perf_panel'),  # Slow requests and profiles (staff only)
 ]
\ No newline at end of file
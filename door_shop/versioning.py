@@ -0,0 +1,127 @@
+"""Per-table version counters for keying cached fragments, and per-row versions for ETags.
+
+Every tracked table has a counter in the cache that is bumped once a save or
+delete on it commits. Cache keys built from ``table_version()`` therefore
+change as soon as the rows behind them do, and stale entries are simply never
+read again. Writes that bypass model signals (``QuerySet.update()``,
+``bulk_create()``) must call ``bump_table_version()`` themselves, which
+``door_shop.querycache.CachingQuerySet`` does.
+
+The counters live in the default cache, so several workers only see each
+other's bumps with a shared cache backend (see ``CACHES``).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+VERSION_KEY = 'table-version:{}'
+
+# Tables whose saves and deletes bump their version
+_tracked_tables = set()
+
+
+def _table(model_or_table):
+    return model_or_table if isinstance(model_or_table, str) else model_or_table._meta.db_table
+
+
+def table_version(*models):
+    """Current versions of the given models (or table names), as one key-safe string."""
+    keys = [VERSION_KEY.format(_table(model)) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # Start from the clock so an evicted counter can't come back as an old value
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_table_version(*models):
+    for model in models:
+        key = VERSION_KEY.format(_table(model))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def _table_changed(sender, **kwargs):
+    # Bump after commit so a concurrent render can't cache the old rows under the new version
+    transaction.on_commit(lambda: bump_table_version(sender))
+
+
+def track_table_versions(*models):
+    """Bump the model's table version whenever one of its rows is saved or deleted."""
+    for model in models:
+        _tracked_tables.add(model._meta.db_table)
+        label = model._meta.label_lower
+        post_save.connect(_table_changed, sender=model, dispatch_uid=f'table-version-save-{label}')
+        post_delete.connect(_table_changed, sender=model, dispatch_uid=f'table-version-delete-{label}')
+
+
+def is_tracked(model_or_table):
+    return _table(model_or_table) in _tracked_tables
+
+
+ROW_VERSION_KEY = 'row-version:{}:{}'
+
+# Models whose rows have an arow_version()
+_tracked_rows = set()
+
+
+def _row_version_key(model, pk):
+    return ROW_VERSION_KEY.format(model._meta.label_lower, pk)
+
+
+async def arow_version(queryset, pk):
+    """``(version, row)`` for one row of a model with ``updated_at``.
+
+    The version (its ``updated_at`` timestamp) normally comes from the cache and
+    ``row`` is then None; on a miss the row is fetched, returned and its version
+    cached. Raises ``DoesNotExist`` for a missing row.
+    """
+    key = _row_version_key(queryset.model, pk)
+    version = await cache.aget(key)
+    if version is not None:
+        return version, None
+    row = await queryset.aget(pk=pk)
+    version = row.updated_at.timestamp()
+    # add(), not set(): a concurrent save may already have stored a newer stamp
+    await cache.aadd(key, version, None)
+    return version, row
+
+
+def _row_saved(sender, instance, **kwargs):
+    key = _row_version_key(sender, instance.pk)
+    version = instance.updated_at.timestamp()
+    transaction.on_commit(lambda: cache.set(key, version, None))
+
+
+def _row_deleted(sender, instance, **kwargs):
+    key = _row_version_key(sender, instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def forget_row_versions(model, pks, using=None):
+    """Drop the cached versions of rows changed without a save, once the change commits."""
+    keys = [_row_version_key(model, pk) for pk in pks]
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
+
+
+def is_row_tracked(model):
+    return model._meta.label_lower in _tracked_rows
+
+
+def track_row_versions(*models):
+    """Keep the cached ``arow_version()`` of each saved or deleted row current.
+
+    Writes that bypass model signals must call ``forget_row_versions()``, which
+    ``door_shop.querycache.CachingQuerySet`` does.
+    """
+    for model in models:
+        label = model._meta.label_lower
+        _tracked_rows.add(label)
+        post_save.connect(_row_saved, sender=model, dispatch_uid=f'row-version-save-{label}')
+        post_delete.connect(_row_deleted, sender=model, dispatch_uid=f'row-version-delete-{label}')
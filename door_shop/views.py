@@ -1,6 +1,16 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.db import models 
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from .events import format_sse, hub
+from . import warmup
+from .profiling import slow_requests
+import asyncio
+import time
 def index(request):
     """Main landing page"""
     return render(request, 'index.html')
@@ -8,40 +18,72 @@ def index(request):
 @login_required
 def dashboard(request):
     """Main dashboard after login"""
-    from inventory.models import Product, Supplier, Customer
-    from pos.models import Sale
-    from django.db.models import Sum, Count
-    from django.utils import timezone
-    from datetime import datetime, timedelta
+    from reports.dashboard import get_dashboard_snapshot
     
-    # Calculate statistics
-    total_products = Product.objects.count()
-    total_suppliers = Supplier.objects.count()
-    total_customers = Customer.objects.count()
+    # Counters come from a short-lived cached snapshot
+    snapshot = get_dashboard_snapshot()
     
-    # Today's sales
-    today = timezone.now().date()
-    today_sales = Sale.objects.filter(sale_date__date=today)
-    today_total = today_sales.aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-    today_count = today_sales.count()
+    context = {
+        'total_products': snapshot['total_products'],
+        'total_suppliers': snapshot['total_suppliers'],
+        'total_customers': snapshot['total_customers'],
+        'today_total': snapshot['today_total'],
+        'today_count': snapshot['today_count'],
+        'low_stock_products': snapshot['low_stock_products'][:5],
+        'recent_sales': snapshot['recent_sales'],
+    }
+    
+    return render(request, 'dashboard.html', context)
+
+async def event_stream(request):
+    """Server-Sent Events: sale-committed, stock-changed and low-stock updates.
+
+    Only served by the ASGI application; under WSGI a stream would pin a worker,
+    so it answers 204 and EventSource clients stop retrying.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return HttpResponse(status=401)
     
-    # Low stock alerts
-    low_stock_products = Product.objects.filter(
-        track_stock=True,
-        current_stock__lte=models.F('min_stock_level')
-    )[:5]
+    keepalive = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 15)
+    # Streams are recycled periodically; EventSource reconnects on its own
+    max_age = getattr(settings, 'EVENT_STREAM_MAX_AGE', 300)
     
-    # Recent sales
-    recent_sales = Sale.objects.select_related('customer').order_by('-sale_date')[:5]
+    async def events():
+        deadline = time.monotonic() + max_age
+        with hub.subscribe() as queue:
+            yield "retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event_type, data = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_type, data)
     
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+def perf_panel(request):
+    """Slowest recent requests of this process, with any captured profiles"""
+    if request.method == 'POST':
+        slow_requests.clear()
+    selected = None
+    if request.GET.get('id'):
+        selected = slow_requests.get(int(request.GET['id'])) if request.GET['id'].isdigit() else None
+        if selected is None:
+            raise Http404('That request is no longer in the log')
     context = {
-        'total_products': total_products,
-        'total_suppliers': total_suppliers,
-        'total_customers': total_customers,
-        'today_total': today_total,
-        'today_count': today_count,
-        'low_stock_products': low_stock_products,
-        'recent_sales': recent_sales,
+        'entries': slow_requests.slowest(),
+        'selected': selected,
+        'slow_ms': getattr(settings, 'PROFILING_SLOW_MS', 500),
+        'buffer_size': slow_requests.entries.maxlen,
+        'warmup': warmup.last_report,
     }
-    
-    return render(request, 'dashboard.html', context)
\ No newline at end of file
+    return render(request, 'perf_panel.html', context)
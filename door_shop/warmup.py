@@ -0,0 +1,135 @@
+"""Warm start for a freshly started worker, run from ``door_shop.wsgi`` and ``door_shop.asgi``.
+
+Builds the URL resolver, compiles every template under the project
+``templates/`` directory into the cached loader, fills the dashboard snapshot
+and the cached catalog querysets, and opens the database connections, so the
+first requests don't pay for it. Each step is timed and the report is logged
+and kept in ``last_report`` (shown on the perf panel).
+
+With ``gunicorn --preload`` the application module is imported before the
+workers fork: set ``WARMUP_ENABLED=0`` and call ``warmup()`` from a
+``post_fork`` hook instead, so no connection is shared across processes.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+last_report = {}
+
+
+def _warm_urls():
+    from django.urls import get_resolver
+
+    # reverse_dict is built lazily on first use
+    resolver = get_resolver()
+    return len(resolver.reverse_dict)
+
+
+def _warm_templates():
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+    count = 0
+    for engine in engines.all():
+        for directory in engine.dirs:
+            directory = Path(directory)
+            for path in sorted(directory.rglob('*.html')):
+                name = path.relative_to(directory).as_posix()
+                try:
+                    engine.get_template(name)
+                    count += 1
+                except (TemplateDoesNotExist, TemplateSyntaxError):
+                    logger.exception('Template %s does not compile', name)
+    return count
+
+
+def _warm_caches():
+    from door_shop.versioning import table_version
+    from inventory.models import Category, Product, Supplier
+    from reports.dashboard import get_dashboard_snapshot
+
+    get_dashboard_snapshot()
+    table_version(Product, Category)
+    # The same querysets the catalog pages and choice fields read
+    return sum(len(list(qs)) for qs in (Category.objects.cached(), Supplier.objects.cached()))
+
+
+def _warm_database():
+    from django.db import connections
+
+    # The reporting snapshot is reopened per request anyway, and may not exist yet
+    opened = [c for c in connections.all() if c.alias != getattr(settings, 'REPORTING_DATABASE', None)]
+    for connection in opened:
+        connection.ensure_connection()
+    return len(opened)
+
+
+STEPS = [
+    ('urls', _warm_urls),
+    ('templates', _warm_templates),
+    ('caches', _warm_caches),
+    ('database', _warm_database),
+]
+
+
+def _run(load_time):
+    report = {'pid': os.getpid(), 'steps': []}
+    if load_time is not None:
+        report['steps'].append({'name': 'load', 'ms': round(load_time * 1000, 1), 'count': None})
+    start = time.perf_counter()
+    for name, step in STEPS:
+        step_start = time.perf_counter()
+        try:
+            count = step()
+        except Exception:
+            # A cold cache is slower, not fatal: the worker still starts
+            logger.exception('Warm-up step %s failed', name)
+            count = None
+        report['steps'].append({'name': name, 'ms': round((time.perf_counter() - step_start) * 1000, 1), 'count': count})
+    report['warmup_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    report['process_cpu_ms'] = round(time.process_time() * 1000, 1)
+    return report
+
+
+def warmup(load_time=None):
+    """Warm this process up; ``load_time`` is how long building the application took, in seconds."""
+    global last_report
+    if not getattr(settings, 'WARMUP_ENABLED', True):
+        return None
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        report = _run(load_time)
+    else:
+        # ASGI servers import the application inside their event loop, where
+        # the ORM refuses to run; do the work in a plain thread and wait for it
+        result = {}
+
+        def run():
+            from django.db import connections
+            try:
+                result.update(_run(load_time))
+            finally:
+                # The thread's own connections would otherwise leak; the first
+                # connect (pragmas, page cache) is what the step warms here
+                connections.close_all()
+
+        thread = threading.Thread(target=run, name='warmup')
+        thread.start()
+        thread.join()
+        report = result
+    last_report = report
+    logger.info(
+        'Warm start (pid %s): %s; warm-up %sms, process CPU %sms',
+        report['pid'],
+        ', '.join(f"{step['name']} {step['ms']}ms" for step in report['steps']),
+        report['warmup_ms'],
+        report['process_cpu_ms'],
+    )
+    return report
@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 """
 
 import os
+import time
+
+_started = time.perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "door_shop.settings")
 
 application = get_wsgi_application()
+
+from door_shop.warmup import warmup  # noqa: E402
+
+warmup(load_time=time.perf_counter() - _started)
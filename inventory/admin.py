@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Category
+from .models import Category, Store
 
 admin.site.register(Category)
+admin.site.register(Store)
@@ -1,6 +1,20 @@
 # inventory/forms.py
+import csv
+import io
+from decimal import Decimal
+
 from django import forms
-from .models import Product, PurchaseOrder, PurchaseItem, Supplier, Customer, StockAdjustment
+from django.db.models import Q
+from .models import Category, Product, PurchaseOrder, PurchaseItem, Supplier, Customer, StockAdjustment, StockTransfer, Store
+
+def product_choices():
+    """Products for a choice list, reading only what their labels show.
+
+    Not ``.cached()``: every sale saves a product, which bumps the table version
+    the cache is keyed on, so the entry would rarely be read again.
+    """
+    return Product.objects.only('name', 'product_type', 'width', 'height', 'thickness')
+
 
 class ProductForm(forms.ModelForm):
     class Meta:
@@ -10,6 +24,12 @@ class ProductForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 3}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Choice lists come from the query cache until a category/supplier changes
+        self.fields['category'].queryset = Category.objects.cached()
+        self.fields['supplier_name'].queryset = Supplier.objects.cached()
+
 # In inventory/forms.py, update or add these forms:
 class PurchaseOrderForm(forms.ModelForm):
     class Meta:
@@ -21,6 +41,10 @@ class PurchaseOrderForm(forms.ModelForm):
             'supplier': forms.Select(attrs={'class': 'form-select'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['supplier'].queryset = Supplier.objects.cached()
+
 class PurchaseItemForm(forms.ModelForm):
     class Meta:
         model = PurchaseItem
@@ -31,6 +55,67 @@ class PurchaseItemForm(forms.ModelForm):
             'unit_cost': forms.NumberInput(attrs={'step': '0.01', 'min': '0.01'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['product'].queryset = product_choices()
+
+class PurchaseLinesForm(forms.Form):
+    """Many order lines at once, pasted as CSV: ``code, quantity, unit cost`` per line.
+
+    ``code`` is the product's supplier item code (products of the order's
+    supplier win when several share it) or its ID. All lines are checked before
+    any is added; cleaned ``lines`` is a list of unsaved PurchaseItems.
+    """
+    lines = forms.CharField(widget=forms.Textarea(attrs={
+        'rows': 6, 'class': 'form-control font-monospace', 'placeholder': 'ND-101, 10, 2450.00',
+    }))
+
+    def __init__(self, *args, purchase=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.purchase = purchase
+
+    def clean_lines(self):
+        quantity_field = PurchaseItem._meta.get_field('quantity').formfield(min_value=Decimal('0.01'))
+        unit_cost_field = PurchaseItem._meta.get_field('unit_cost').formfield(min_value=Decimal('0'))
+        errors, rows = [], []
+        for number, cells in enumerate(csv.reader(io.StringIO(self.cleaned_data['lines'])), 1):
+            cells = [cell.strip() for cell in cells]
+            if not any(cells):
+                continue
+            if len(cells) != 3:
+                errors.append(f'Line {number}: expected code, quantity, unit cost.')
+                continue
+            try:
+                rows.append((number, cells[0], quantity_field.clean(cells[1]), unit_cost_field.clean(cells[2])))
+            except forms.ValidationError as e:
+                errors.append(f"Line {number}: {' '.join(e.messages)}")
+
+        # Every code is looked up in one query
+        codes = {code for _, code, _, _ in rows}
+        ids = [int(code) for code in codes if code.isdigit()]
+        matches, by_id = {}, {}
+        for product in Product.objects.filter(
+            Q(supplier_item_code__in=codes) | Q(pk__in=ids)
+        ).only('pk', 'name', 'supplier_item_code', 'supplier_name_id'):
+            if product.supplier_item_code in codes:
+                matches.setdefault(product.supplier_item_code, []).append(product)
+            by_id[product.pk] = product
+
+        items = []
+        for number, code, quantity, unit_cost in rows:
+            found = matches.get(code) or ([by_id[int(code)]] if code.isdigit() and int(code) in by_id else [])
+            if len(found) > 1 and self.purchase is not None:
+                found = [p for p in found if p.supplier_name_id == self.purchase.supplier_id] or found
+            if len(found) != 1:
+                errors.append(f"Line {number}: {'no product' if not found else 'more than one product'} has code {code}.")
+                continue
+            items.append(PurchaseItem(product=found[0], quantity=quantity, unit_cost=unit_cost))
+        if errors:
+            raise forms.ValidationError(errors)
+        if not items:
+            raise forms.ValidationError('Paste at least one line.')
+        return items
+
 class SupplierForm(forms.ModelForm):
     class Meta:
         model = Supplier
@@ -43,7 +128,8 @@ class SupplierForm(forms.ModelForm):
 class CustomerForm(forms.ModelForm):
     class Meta:
         model = Customer
-        fields = '__all__'
+        # The balance only moves through the due ledger
+        exclude = ['due_balance']
         widgets = {
             'address': forms.Textarea(attrs={'rows': 3}),
             'name': forms.TextInput(attrs={'placeholder': 'Enter customer name'}),
@@ -106,6 +192,7 @@ class StockAdjustmentForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.fields['product'].queryset = product_choices()
         # Add custom_reason field to the form
         self.fields['custom_reason'] = forms.CharField(
             required=False,
@@ -126,4 +213,30 @@ class StockAdjustmentForm(forms.ModelForm):
         if custom_reason:
             cleaned_data['reason'] = custom_reason
         
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+class StockTransferForm(forms.ModelForm):
+    class Meta:
+        model = StockTransfer
+        fields = ['product', 'from_store', 'to_store', 'quantity', 'notes']
+        widgets = {
+            'product': forms.Select(attrs={'class': 'form-select'}),
+            'from_store': forms.Select(attrs={'class': 'form-select'}),
+            'to_store': forms.Select(attrs={'class': 'form-select'}),
+            'quantity': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
+            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['product'].queryset = product_choices()
+        stores = Store.objects.filter(is_active=True).cached()
+        self.fields['from_store'].queryset = stores
+        self.fields['to_store'].queryset = stores
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('from_store') and cleaned_data.get('from_store') == cleaned_data.get('to_store'):
+            raise forms.ValidationError('Pick two different stores.')
+        return cleaned_data
@@ -0,0 +1,436 @@
+import random
+import time as clock
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from inventory.models import (
+    Category, Customer, Product, PurchaseItem, PurchaseOrder, StockAdjustment, StockTransfer, Store, StoreStock, Supplier,
+)
+from pos.models import (
+    ArchivedPayment, ArchivedSale, ArchivedSaleItem, CustomerLedgerEntry, DailySummary, Payment, Sale, SaleItem,
+    sale_databases,
+)
+from reports.models import CustomerSegment, ReportJob
+from reports.segments import refresh_customer_segments
+
+# In foreign key order: every model comes before the ones it points at
+SHOP_MODELS = [
+    Payment, SaleItem, Sale, ArchivedPayment, ArchivedSaleItem, ArchivedSale, CustomerLedgerEntry, DailySummary,
+    PurchaseItem, PurchaseOrder, StockAdjustment, StockTransfer, StoreStock, CustomerSegment, ReportJob,
+    Product, Category, Customer, Supplier,
+]
+# The tables a store's own database holds (door_shop.routers.StoreRouter)
+SALE_MODELS = [Payment, SaleItem, Sale]
+
+# Share of the catalogue per product type, and the typical selling price range
+PRODUCT_MIX = {
+    'main_door': (25, 18000, 65000),
+    'secondary_door': (25, 6000, 22000),
+    'accessory': (25, 150, 3500),
+    'material': (10, 300, 5000),
+    'service': (5, 500, 4000),
+    'others': (10, 200, 6000),
+}
+GRADES = ['Economy', 'Standard', 'Premium']
+MATERIALS = ['Teak', 'Mahogany', 'Gamari', 'Steel', 'PVC', 'Plywood', 'Laminated']
+FIRST_NAMES = [
+    'Rahim', 'Karim', 'Abdul', 'Hasan', 'Jamal', 'Nasrin', 'Fatema', 'Ayesha', 'Sumon', 'Rafiq',
+    'Shirin', 'Tanvir', 'Mitu', 'Sakib', 'Nadia', 'Habib', 'Rupa', 'Imran', 'Shanta', 'Kamal',
+]
+LAST_NAMES = [
+    'Ahmed', 'Hossain', 'Islam', 'Rahman', 'Uddin', 'Akter', 'Khan', 'Chowdhury', 'Sarkar', 'Miah',
+    'Begum', 'Das', 'Roy', 'Sheikh', 'Talukder',
+]
+ADJUSTMENT_REASONS = {
+    'in': ['Opening stock', 'Returned by customer', 'Found in store room'],
+    'out': ['Damaged', 'Used for display', 'Lost'],
+    'adjust': ['Stock count correction', 'Data entry fix'],
+}
+PAYMENT_WEIGHTS = {'cash': 55, 'card': 15, 'mobile': 20, 'due': 10}
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """bulk_create still runs auto_now/auto_now_add, which would stamp every row with now()."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def zipf_cum_weights(count, exponent=1.1):
+    """Cumulative weights where the item at rank n is chosen ~1/n**exponent as often."""
+    total, cumulative = 0.0, []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a large synthetic shop for load tests and benchmarks. '
+        'The same --seed and --end-date always produce the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--end-date', help='Last day with sales, YYYY-MM-DD (default: today)')
+        parser.add_argument('--years', type=float, default=2, help='Years of sales history')
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--suppliers', type=int, default=60)
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--sales', type=int, default=200000)
+        parser.add_argument('--purchases', type=int, default=5000)
+        parser.add_argument('--adjustments', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help='Delete existing shop data first')
+
+    def handle(self, *args, **options):
+        if options['end_date']:
+            try:
+                self.end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('End date must be in YYYY-MM-DD format')
+        else:
+            self.end_date = timezone.now().date()
+        self.start_date = self.end_date - timedelta(days=max(int(options['years'] * 365), 1) - 1)
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # Everything is rung up at the main showroom, so its daily rows and store filters have data
+        self.store = Store.default()
+        if self.store is None:
+            raise CommandError('There is no default store; run migrate first.')
+
+        if options['flush']:
+            self.flush()
+        elif Sale.objects.exists() or Product.objects.exists():
+            raise CommandError('The database already has shop data; use --flush to replace it.')
+
+        started = clock.perf_counter()
+        self.cashiers = [
+            User.objects.get_or_create(username=f'cashier{n}', defaults={'is_staff': True})[0]
+            for n in range(1, 6)
+        ]
+        with explicit_timestamps(
+            Supplier._meta.get_field('created_at'),
+            Customer._meta.get_field('created_at'),
+            Product._meta.get_field('created_at'),
+            Product._meta.get_field('updated_at'),
+            Sale._meta.get_field('sale_date'),
+            PurchaseOrder._meta.get_field('order_date'),
+            StockAdjustment._meta.get_field('created_at'),
+            DailySummary._meta.get_field('created_at'),
+            CustomerLedgerEntry._meta.get_field('created_at'),
+        ):
+            self.step('suppliers', self.create_suppliers, options['suppliers'])
+            self.step('products', self.create_products, options['products'])
+            self.step('customers', self.create_customers, options['customers'])
+            self.step('sales', self.create_sales, options['sales'])
+            self.step('purchase orders', self.create_purchases, options['purchases'])
+            self.step('stock adjustments', self.create_adjustments, options['adjustments'])
+            self.step('daily summaries', self.create_daily_summaries)
+        self.step('customer segments', refresh_customer_segments)
+        self.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(f'Seeded shop in {clock.perf_counter() - started:.1f}s'))
+
+    def step(self, label, func, *args):
+        started = clock.perf_counter()
+        count = func(*args)
+        self.stdout.write(f'{label:18} {count:>10}  {clock.perf_counter() - started:7.1f}s')
+
+    def flush(self):
+        self.execute_flush(connection, SHOP_MODELS)
+        for database in sale_databases()[1:]:
+            self.execute_flush(connections[database], SALE_MODELS)
+
+    def execute_flush(self, conn, models):
+        tables = [model._meta.db_table for model in models]
+        with transaction.atomic(using=conn.alias):
+            with conn.cursor() as cursor:
+                for sql in conn.ops.sql_flush(no_style(), tables, reset_sequences=True):
+                    cursor.execute(sql)
+
+    def reset_sequences(self):
+        # Rows were inserted with explicit ids; move sequences past them (no-op on SQLite)
+        resets = [(connection, SHOP_MODELS)]
+        if self.store.database != 'default':
+            resets.append((connections[self.store.database], SALE_MODELS))
+        for conn, models in resets:
+            with conn.cursor() as cursor:
+                for sql in conn.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+    def random_moment(self, day, opening=9, closing=21):
+        seconds = self.rng.randrange((closing - opening) * 3600)
+        return timezone.make_aware(datetime.combine(day, time(opening)) + timedelta(seconds=seconds))
+
+    def random_day(self):
+        return self.start_date + timedelta(days=self.rng.randrange((self.end_date - self.start_date).days + 1))
+
+    def create_suppliers(self, count):
+        self.supplier_ids = list(range(1, count + 1))
+        Supplier.objects.bulk_create([
+            Supplier(
+                id=n,
+                name=f'{self.rng.choice(LAST_NAMES)} Door House {n}',
+                contact_person=f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                phone=f'0171{n:07d}',
+                created_at=self.random_moment(self.start_date),
+            )
+            for n in self.supplier_ids
+        ], batch_size=self.batch_size)
+        return count
+
+    def create_products(self, count):
+        categories = {}
+        for product_type, label in Product.PRODUCT_TYPES:
+            for grade in GRADES:
+                categories[product_type, grade] = Category(id=len(categories) + 1, name=f'{grade} {label}')
+        Category.objects.bulk_create(categories.values())
+
+        types = list(PRODUCT_MIX)
+        type_weights = [PRODUCT_MIX[t][0] for t in types]
+        products = []
+        for n in range(1, count + 1):
+            product_type = self.rng.choices(types, type_weights)[0]
+            grade = self.rng.choice(GRADES)
+            low, high = PRODUCT_MIX[product_type][1:]
+            selling_price = money(self.rng.uniform(low, high))
+            tracked = product_type != 'service'
+            min_stock = self.rng.choice([2, 5, 10]) if tracked else 0
+            # Most items are in stock, some are running low and a few are sold out
+            stock_band = self.rng.random()
+            if not tracked or stock_band < 0.05:
+                current_stock = 0
+            elif stock_band < 0.15:
+                current_stock = self.rng.randint(1, min_stock)
+            else:
+                current_stock = self.rng.randint(min_stock + 1, 200)
+            is_door = product_type in ('main_door', 'secondary_door')
+            products.append(Product(
+                id=n,
+                name=f'{grade} {self.rng.choice(MATERIALS)} {product_type.replace("_", " ").title()} {n}',
+                category=categories[product_type, grade],
+                product_type=product_type,
+                supplier_name_id=self.rng.choice(self.supplier_ids),
+                supplier_item_code=f'SKU-{n:06d}',
+                width=money(self.rng.choice([30, 32, 36, 42])) if is_door else None,
+                height=money(self.rng.choice([78, 80, 84])) if is_door else None,
+                thickness=money(self.rng.choice([1.5, 1.75, 2])) if is_door else None,
+                material=self.rng.choice(MATERIALS) if is_door else '',
+                cost_price=money(selling_price * Decimal(self.rng.uniform(0.6, 0.85))),
+                selling_price=selling_price,
+                current_stock=current_stock,
+                min_stock_level=min_stock,
+                track_stock=tracked,
+                created_at=self.random_moment(self.start_date),
+                updated_at=self.random_moment(self.end_date),
+            ))
+        Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+        # A few products sell far more often than the long tail
+        self.rng.shuffle(products)
+        self.products = products
+        self.product_cum_weights = zipf_cum_weights(len(products))
+        return count
+
+    def create_customers(self, count):
+        self.customer_ids = list(range(1, count + 1))
+        days = (self.end_date - self.start_date).days + 1
+        batch = []
+        for n in self.customer_ids:
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            batch.append(Customer(
+                id=n,
+                name=f'{first} {last}',
+                phone=f'01{self.rng.choice("3456789")}{n:08d}',
+                email=f'{first.lower()}.{n}@example.com' if self.rng.random() < 0.3 else '',
+                created_at=self.random_moment(self.start_date + timedelta(days=n * days // (count + 1))),
+            ))
+            if len(batch) >= self.batch_size:
+                Customer.objects.bulk_create(batch)
+                batch = []
+        Customer.objects.bulk_create(batch)
+        self.customer_cum_weights = zipf_cum_weights(count, exponent=0.8)
+        return count
+
+    def sales_per_day(self, total):
+        """Spread ``total`` sales over the date range: growing trade, quieter Fridays, daily noise."""
+        days = [self.start_date + timedelta(days=n) for n in range((self.end_date - self.start_date).days + 1)]
+        weights = []
+        for index, day in enumerate(days):
+            growth = 0.6 + 0.8 * index / max(len(days) - 1, 1)
+            weekday = 0.5 if day.weekday() == 4 else 1.0
+            weights.append(growth * weekday * self.rng.uniform(0.7, 1.3))
+        scale = total / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        for index in range(total - sum(counts)):
+            counts[-1 - index % len(counts)] += 1
+        return zip(days, counts)
+
+    def create_sales(self, total):
+        methods, method_weights = list(PAYMENT_WEIGHTS), list(PAYMENT_WEIGHTS.values())
+        # Only a known customer can leave a sale on due
+        tenders = [method for method in methods if method != 'due']
+        tender_weights = [PAYMENT_WEIGHTS[method] for method in tenders]
+        sale_id = item_id = 0
+        sales, items, entries = [], [], []
+        # Running due balance per customer, for the ledger entries of sales left on due
+        self.balances = {}
+        for day, count in self.sales_per_day(total):
+            for moment in sorted(self.random_moment(day) for _ in range(count)):
+                sale_id += 1
+                picked = self.rng.choices(
+                    self.products, cum_weights=self.product_cum_weights,
+                    k=self.rng.choices([1, 2, 3, 4, 5], [45, 25, 15, 10, 5])[0],
+                )
+                total_amount = Decimal('0')
+                for product in {product.id: product for product in picked}.values():
+                    item_id += 1
+                    if product.product_type in ('accessory', 'material'):
+                        quantity = Decimal(self.rng.randint(1, 10))
+                    else:
+                        quantity = Decimal(self.rng.choice([1, 1, 1, 2]))
+                    line_total = quantity * product.selling_price
+                    total_amount += line_total
+                    items.append(SaleItem(
+                        id=item_id, sale_id=sale_id, product_id=product.id,
+                        quantity=quantity, unit_price=product.selling_price, total_price=line_total,
+                    ))
+                discount = money(total_amount * Decimal(self.rng.choice([0.02, 0.05, 0.1]))) if self.rng.random() < 0.2 else Decimal('0')
+                grand_total = total_amount - discount
+                walk_in = self.rng.random() < 0.4
+                customer_id = None if walk_in else self.rng.choices(self.customer_ids, cum_weights=self.customer_cum_weights)[0]
+                if walk_in:
+                    method = self.rng.choices(tenders, tender_weights)[0]
+                else:
+                    method = self.rng.choices(methods, method_weights)[0]
+                if method == 'cash':
+                    received = (grand_total / 100).to_integral_value(rounding=ROUND_CEILING) * 100
+                elif method == 'due':
+                    received = Decimal('0')
+                else:
+                    received = grand_total
+                sales.append(Sale(
+                    id=sale_id,
+                    customer_id=customer_id,
+                    sale_date=moment,
+                    total_amount=total_amount,
+                    discount_amount=discount,
+                    grand_total=grand_total,
+                    payment_method=method,
+                    payment_received=received,
+                    change_given=max(Decimal('0'), received - grand_total) if method != 'due' else Decimal('0'),
+                    sale_person=self.rng.choice(self.cashiers),
+                    store_id=self.store.pk,
+                    receipt_printed=True,
+                ))
+                if method == 'due':
+                    balance = self.balances[customer_id] = self.balances.get(customer_id, Decimal('0')) + grand_total
+                    entries.append(CustomerLedgerEntry(
+                        customer_id=customer_id, kind='sale', amount=grand_total, balance=balance,
+                        sale_id=sale_id, store_id=self.store.pk, created_at=moment,
+                    ))
+                if len(sales) >= self.batch_size:
+                    self.save_sales(sales, items, entries)
+                    sales, items, entries = [], [], []
+        self.save_sales(sales, items, entries)
+        Customer.objects.bulk_update(
+            [Customer(id=customer_id, due_balance=balance) for customer_id, balance in self.balances.items()],
+            ['due_balance'], batch_size=self.batch_size,
+        )
+        return sale_id
+
+    def save_sales(self, sales, items, entries):
+        database = self.store.database
+        with transaction.atomic(using=database):
+            Sale.objects.using(database).bulk_create(sales, batch_size=self.batch_size)
+            SaleItem.objects.using(database).bulk_create(items, batch_size=self.batch_size)
+        CustomerLedgerEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+
+    def create_purchases(self, count):
+        recent = self.end_date - timedelta(days=14)
+        orders, items, item_id = [], [], 0
+        for n in range(1, count + 1):
+            order_day = self.random_day()
+            order_date = self.random_moment(order_day)
+            expected = order_day + timedelta(days=self.rng.randint(3, 21))
+            status = 'pending' if order_day >= recent and self.rng.random() < 0.6 else self.rng.choices(
+                ['received', 'cancelled'], [95, 5]
+            )[0]
+            received_at = None
+            if status == 'received':
+                # Most deliveries land around the promised date, some are late
+                received_at = order_date + timedelta(days=(expected - order_day).days + self.rng.randint(-3, 7))
+            total_amount = Decimal('0')
+            for product in self.rng.sample(self.products, self.rng.randint(1, 6)):
+                item_id += 1
+                quantity = Decimal(self.rng.randint(2, 40))
+                unit_cost = money(product.cost_price * Decimal(self.rng.uniform(0.9, 1.1)))
+                total_amount += quantity * unit_cost
+                items.append(PurchaseItem(
+                    id=item_id, purchase_order_id=n, product_id=product.id,
+                    quantity=quantity, unit_cost=unit_cost, total_price=quantity * unit_cost,
+                ))
+            orders.append(PurchaseOrder(
+                id=n, supplier_id=self.rng.choice(self.supplier_ids), order_date=order_date,
+                expected_date=expected, status=status, total_amount=total_amount, received_at=received_at,
+            ))
+        with transaction.atomic():
+            PurchaseOrder.objects.bulk_create(orders, batch_size=self.batch_size)
+            PurchaseItem.objects.bulk_create(items, batch_size=self.batch_size)
+        return count
+
+    def create_adjustments(self, count):
+        types = list(ADJUSTMENT_REASONS)
+        adjustments = []
+        for n in range(1, count + 1):
+            adjustment_type = self.rng.choices(types, [40, 45, 15])[0]
+            adjustments.append(StockAdjustment(
+                id=n,
+                product_id=self.rng.choice(self.products).id,
+                adjustment_type=adjustment_type,
+                quantity=Decimal(self.rng.randint(1, 10)),
+                reason=self.rng.choice(ADJUSTMENT_REASONS[adjustment_type]),
+                created_by=self.rng.choice(self.cashiers),
+                created_at=self.random_moment(self.random_day()),
+            ))
+        StockAdjustment.objects.bulk_create(adjustments, batch_size=self.batch_size)
+        return count
+
+    def create_daily_summaries(self):
+        """Every past day is closed, shop-wide and for the store, as after the nightly close_day run."""
+        today = timezone.now().date()
+        summaries = []
+        day = self.start_date
+        while day <= self.end_date:
+            closed = day < today
+            end_of_day = timezone.make_aware(datetime.combine(day, time(22)))
+            for store in (None, self.store):
+                summaries.append(DailySummary(
+                    store=store,
+                    date=day,
+                    created_at=end_of_day,
+                    is_closed=closed,
+                    closed_at=end_of_day if closed else None,
+                    **DailySummary.compute_totals(day, store),
+                ))
+            day += timedelta(days=1)
+        DailySummary.objects.bulk_create(summaries, batch_size=self.batch_size)
+        return len(summaries)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_alter_product_product_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseorder",
+            name="received_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_purchaseorder_received_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="purchaseorder",
+            name="supplier",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventory.supplier",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["status", "order_date"], name="inv_po_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["supplier", "order_date"], name="inv_po_supplier_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockadjustment",
+            index=models.Index(fields=["created_at"], name="inv_adjust_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stockadjustment",
+            index=models.Index(
+                fields=["adjustment_type", "created_at"],
+                name="inv_adjust_type_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,162 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:34
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_main_store(apps, schema_editor):
+    # Existing stock and sales belong to the one showroom there was so far
+    Store = apps.get_model("inventory", "Store")
+    Store.objects.using(schema_editor.connection.alias).get_or_create(
+        code="main", defaults={"name": "Main showroom", "is_default": True}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("inventory", "0008_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockTransfer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("0.01"))
+                        ],
+                    ),
+                ),
+                ("notes", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Store",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("code", models.SlugField(max_length=20, unique=True)),
+                ("address", models.TextField(blank=True)),
+                ("is_default", models.BooleanField(default=False)),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-is_default", "name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="StoreStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="store_levels",
+                        to="inventory.product",
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="branch_stock",
+                        to="inventory.store",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="store",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_default", True)),
+                fields=("is_default",),
+                name="one_default_store",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocktransfer",
+            name="created_by",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocktransfer",
+            name="from_store",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="transfers_out",
+                to="inventory.store",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocktransfer",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="inventory.product"
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocktransfer",
+            name="to_store",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="transfers_in",
+                to="inventory.store",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="storestock",
+            constraint=models.UniqueConstraint(
+                fields=("product", "store"), name="unique_store_stock"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocktransfer",
+            index=models.Index(fields=["created_at"], name="inv_transfer_created_idx"),
+        ),
+        migrations.RunPython(
+            create_main_store, migrations.RunPython.noop, hints={"model_name": "store"}
+        ),
+    ]
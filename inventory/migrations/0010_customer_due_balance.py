@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_stores"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="due_balance",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from door_shop.querycache import CachingQuerySet
+
 class Supplier(models.Model):
     name = models.CharField(max_length=200)
     contact_person = models.CharField(max_length=100, blank=True)
@@ -11,15 +14,74 @@ class Supplier(models.Model):
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+class Store(models.Model):
+    """A showroom or branch that holds stock and rings up sales.
+
+    ``Product.current_stock`` stays the shop-wide total. Branches keep their
+    share in ``StoreStock`` rows; the default store holds the rest, so
+    purchases, adjustments and product edits need not know about stores.
+    """
+    name = models.CharField(max_length=100)
+    code = models.SlugField(max_length=20, unique=True)
+    address = models.TextField(blank=True)
+    is_default = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CachingQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-is_default', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['is_default'], condition=models.Q(is_default=True), name='one_default_store'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def default(cls):
+        return next((store for store in cls.objects.cached() if store.is_default), None)
+
+    @property
+    def database(self):
+        """Alias holding this store's sales (see ``door_shop.routers.StoreRouter``)."""
+        return settings.STORE_DATABASES.get(self.code, 'default')
+
+    def stock_levels(self, products):
+        """{product pk: quantity held here} for the given products, in one query."""
+        pks = [product.pk for product in products]
+        branches = StoreStock.objects.filter(product__in=pks)
+        if self.is_default:
+            held = dict(branches.values('product').annotate(total=models.Sum('quantity')).values_list('product', 'total'))
+            return {product.pk: product.current_stock - held.get(product.pk, 0) for product in products}
+        held = dict(branches.filter(store=self).values_list('product', 'quantity'))
+        return {pk: held.get(pk, Decimal('0')) for pk in pks}
+
+    def with_stock(self, products):
+        """``products`` annotated with ``store_stock``, this store's level of each."""
+        from django.db.models.functions import Coalesce
+        branches = StoreStock.objects.filter(product=models.OuterRef('pk')).values('product')
+        output = models.DecimalField(max_digits=10, decimal_places=2)
+        if self.is_default:
+            held = branches.annotate(total=models.Sum('quantity')).values('total')
+            return products.annotate(store_stock=models.F('current_stock') - Coalesce(models.Subquery(held), Decimal('0'), output_field=output))
+        held = branches.filter(store=self).values('quantity')
+        return products.annotate(store_stock=Coalesce(models.Subquery(held), Decimal('0'), output_field=output))
+
 class Customer(models.Model):
     name = models.CharField(max_length=200)
     phone = models.CharField(max_length=20, unique=True, blank=True, null=True)  # Make unique and allow null
     email = models.EmailField(blank=True)
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # What the customer owes; kept in step with pos.CustomerLedgerEntry
+    due_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def __str__(self):
         return self.name
@@ -37,6 +99,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
 
+    objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -85,6 +149,9 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Catalog reads can opt into .cached(); update() keeps the table and row versions current
+    objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         if self.product_type in ['ready_made', 'custom', 'frame']:
             size = f"{self.width}x{self.height}x{self.thickness}"
@@ -103,7 +170,7 @@ class Product(models.Model):
 
 
 class PurchaseOrder(models.Model):
-    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, db_index=False)
     order_date = models.DateTimeField(auto_now_add=True)
     expected_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=[
@@ -113,10 +180,35 @@ class PurchaseOrder(models.Model):
     ], default='pending')
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     notes = models.TextField(blank=True)
+    received_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'order_date'], name='inv_po_status_date_idx'),
+            # Also serves plain supplier lookups, so the FK index is dropped
+            models.Index(fields=['supplier', 'order_date'], name='inv_po_supplier_date_idx'),
+        ]
 
     def update_total(self):
-        self.total_amount = sum(item.total_price for item in self.items.all())
-        self.save()
+        # Summed by the database rather than loading every line
+        self.total_amount = self.items.aggregate(total=models.Sum('total_price'))['total'] or 0
+        self.save(update_fields=['total_amount'])
+
+    def add_items(self, items):
+        """Add many unsaved PurchaseItems in one INSERT and update the total once.
+
+        PurchaseItem.save() is skipped, so this is for orders that aren't
+        received yet (receiving is what moves stock and cost prices).
+        """
+        if self.status == 'received':
+            raise ValueError(f'Purchase order #{self.pk} is already received.')
+        for item in items:
+            item.purchase_order = self
+            item.total_price = item.quantity * item.unit_cost
+        with transaction.atomic():
+            PurchaseItem.objects.bulk_create(items)
+            self.update_total()
+        return items
 
 class PurchaseItem(models.Model):
     purchase_order = models.ForeignKey(PurchaseOrder, related_name='items', on_delete=models.CASCADE)
@@ -151,6 +243,12 @@ class StockAdjustment(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='inv_adjust_created_idx'),
+            models.Index(fields=['adjustment_type', 'created_at'], name='inv_adjust_type_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_adjustment_type_display()} - {self.product.name} - {self.quantity}"
 
@@ -167,4 +265,67 @@ class StockAdjustment(models.Model):
                 if self.quantity <= self.product.current_stock:
                     self.product.current_stock -= self.quantity
             # For 'adjust' type, you might want different logic
-            self.product.save()
\ No newline at end of file
+            self.product.save()
+
+
+class StoreStock(models.Model):
+    """A branch's share of a product's ``current_stock``."""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='branch_stock')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='store_levels')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # update() in move() must bump the table version the product grids are keyed on
+    objects = CachingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'store'], name='unique_store_stock'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} @ {self.store}: {self.quantity}"
+
+    @classmethod
+    def move(cls, product, store, quantity):
+        """Add ``quantity`` (negative to take away) to a branch's level; no-op for the default store."""
+        if store is None or store.is_default or not quantity:
+            return
+        updated = cls.objects.filter(store=store, product=product).update(quantity=models.F('quantity') + quantity)
+        if not updated:
+            cls.objects.create(store=store, product=product, quantity=quantity)
+
+
+class StockTransfer(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    from_store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='transfers_out')
+    to_store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='transfers_in')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='inv_transfer_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.from_store} -> {self.to_store} ({self.quantity})"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            # Stock moved when the transfer was recorded; only the notes may change
+            return super().save(*args, **kwargs)
+        if self.from_store_id == self.to_store_id:
+            raise ValueError('A transfer needs two different stores.')
+        with transaction.atomic():
+            # The product row lock serializes transfers and sales of this product
+            product = Product.objects.select_for_update().get(pk=self.product_id)
+            available = self.from_store.stock_levels([product])[product.pk]
+            if product.track_stock and self.quantity > available:
+                raise ValueError(f'Only {available} of {product.name} at {self.from_store}.')
+            super().save(*args, **kwargs)
+            StoreStock.move(product, self.from_store, -self.quantity)
+            StoreStock.move(product, self.to_store, self.quantity)
+            # The total is unchanged, but tills polling the product must see the new split
+            product.save(update_fields=['updated_at'])
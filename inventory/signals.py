@@ -0,0 +1,49 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from door_shop.events import hub, publish_stock_change
+from door_shop.versioning import track_row_versions, track_table_versions
+from .models import Category, Product, Store, StoreStock, Supplier
+
+
+def store_levels(product_id, current_stock):
+    """{store pk: quantity} of one product; the default store holds what no branch does."""
+    held = dict(StoreStock.objects.filter(product_id=product_id).values_list('store', 'quantity'))
+    levels = {}
+    for store in Store.objects.cached():
+        levels[store.pk] = current_stock - sum(held.values()) if store.is_default else held.get(store.pk, 0)
+    return levels
+
+
+def publish_stock_levels(product_id, name, current_stock, min_stock_level, track_stock):
+    if not hub.subscriber_count:
+        # Nobody is listening; skip reading the branch levels
+        return
+    publish_stock_change(
+        product_id, name, current_stock, min_stock_level, track_stock,
+        store_levels(product_id, current_stock),
+    )
+
+
+def product_saved(sender, instance, **kwargs):
+    # Values are captured now; the event only goes out once the write commits.
+    # Transfers and branch sales save the product too, so the per-store
+    # levels read after the commit include their StoreStock moves.
+    transaction.on_commit(partial(
+        publish_stock_levels,
+        instance.pk,
+        instance.name,
+        instance.current_stock,
+        instance.min_stock_level,
+        instance.track_stock,
+    ))
+
+
+post_save.connect(product_saved, sender=Product, dispatch_uid='inventory-product-stock-event')
+
+# Cached product grids and .cached() catalog queries are keyed on these tables' versions
+track_table_versions(Product, Category, Supplier, Store, StoreStock)
+# ETags of the product JSON APIs
+track_row_versions(Product)
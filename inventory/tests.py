@@ -1,3 +1,191 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.urls import reverse
+
+from door_shop.testing import QueryBudgetMixin, QueryPlanMixin, create_shop_data
+from inventory import urls as inventory_urls
+from inventory.models import Customer, Product, StockTransfer, Store, StoreStock
+from pos.models import CustomerLedgerEntry, DailySummary, Sale
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+class InventoryQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def test_customer_sales_uses_customer_date_index(self):
+        url = reverse('customer_sales', args=[self.data['customer'].pk])
+        self.assertUsesIndex(url, 'pos_sale', 'pos_sale_customer_date_idx')
+        self.assertNoFullScan(url, 'pos_sale')
+
+    def test_purchase_list_status_filter_uses_status_date_index(self):
+        url = reverse('purchase_list') + '?status=pending'
+        self.assertUsesIndex(url, 'inventory_purchaseorder', 'inv_po_status_date_idx')
+        self.assertNoFullScan(url, 'inventory_purchaseorder')
+
+    def test_stock_adjustment_list_uses_type_created_index(self):
+        url = reverse('stock_adjustment_list')
+        self.assertUsesIndex(url, 'inventory_stockadjustment', 'inv_adjust_type_created_idx')
+        self.assertNoFullScan(url, 'inventory_stockadjustment')
+
+    def test_product_delete_finds_sale_items_by_index(self):
+        url = reverse('product_delete', args=[self.data['product'].pk])
+        self.assertUsesIndex(url, 'pos_saleitem', 'pos_saleitem_product_sale_idx', method='post')
+
+
+class InventoryQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlpatterns = inventory_urls.urlpatterns
+    query_budgets = {
+        'inventory_dashboard': 9,
+        'product_list': 4,
+        'product_add': 4,
+        'product_detail': 7,
+        'product_edit': 5,
+        'product_delete': 3,
+        'supplier_list': 3,
+        'supplier_add': 2,
+        'supplier_edit': 3,
+        'customer_list': 5,
+        'customer_add': 2,
+        'customer_edit': 3,
+        'customer_sales': 10,
+        'purchase_list': 7,
+        'purchase_create': 3,
+        'purchase_detail': 7,
+        'purchase_receive': 5,
+        'purchase_item_delete': 4,
+        'stock_adjustment_list': 10,
+        'stock_adjustment_create': 3,
+        'stock_transfer_list': 3,
+        'stock_transfer_create': 4,
+        'api_product_stock_info': 3,
+        'api_product_search': 3,
+    }
+    url_query = {
+        'api_product_search': '?q=Door',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+        product, customer, purchase = self.data['product'].pk, self.data['customer'].pk, self.data['purchase'].pk
+        self.url_kwargs = {
+            'product_detail': {'pk': product},
+            'product_edit': {'pk': product},
+            'product_delete': {'pk': product},
+            'api_product_stock_info': {'product_id': product},
+            'supplier_edit': {'pk': self.data['supplier'].pk},
+            'customer_edit': {'pk': customer},
+            'customer_sales': {'pk': customer},
+            'purchase_detail': {'pk': purchase},
+            'purchase_receive': {'pk': purchase},
+            'purchase_item_delete': {'pk': self.data['purchase_item'].pk},
+        }
+
+
+class SeedShopCommandTests(TestCase):
+    def seed(self):
+        call_command(
+            'seed_shop', '--flush', '--seed=7', '--end-date=2025-06-30', '--years=0.25',
+            '--products=40', '--suppliers=5', '--customers=50', '--sales=400',
+            '--purchases=20', '--adjustments=30', '--batch-size=64', stdout=StringIO(),
+        )
+        return list(Sale.objects.order_by('id').values_list('id', 'customer_id', 'sale_date', 'grand_total'))
+
+    def test_seed_is_repeatable_and_consistent(self):
+        first = self.seed()
+        self.assertEqual(len(first), 400)
+        self.assertEqual(Product.objects.count(), 40)
+        for summaries in (DailySummary.objects.filter(store=None), DailySummary.objects.filter(store=Store.default())):
+            self.assertEqual(summaries.aggregate(count=Sum('sale_count'))['count'], 400)
+        self.assertFalse(Sale.objects.exclude(store=Store.default()).exists())
+        # Sales left on due are on their customers' ledgers
+        due = Sale.objects.filter(payment_method='due')
+        self.assertFalse(due.filter(customer=None).exists())
+        self.assertEqual(
+            Customer.objects.aggregate(total=Sum('due_balance'))['total'],
+            due.aggregate(total=Sum('grand_total'))['total'],
+        )
+        self.assertEqual(CustomerLedgerEntry.objects.filter(kind='sale').count(), due.count())
+        self.assertEqual(first, self.seed())
+
+    def test_flush_clears_tables_pointing_at_shop_data(self):
+        data = create_shop_data()
+        CustomerLedgerEntry.record(data['customer'], Decimal('100.00'), kind='opening')
+        self.assertTrue(StockTransfer.objects.exists())
+        self.seed()
+        self.assertFalse(CustomerLedgerEntry.objects.filter(kind='opening').exists())
+        self.assertFalse(StockTransfer.objects.exists())
+
+
+class StockTransferTests(TestCase):
+    def test_transfers_move_stock_between_stores(self):
+        data = create_shop_data()
+        product, branch, main = data['product'], data['branch'], Store.default()
+        self.client.force_login(data['user'])
+        url = reverse('stock_transfer_create')
+
+        # The branch holds the 20 moved in by create_shop_data, the rest stays at the default store
+        self.assertEqual(main.stock_levels([product])[product.pk], product.current_stock - 20)
+        response = self.client.post(url, {'product': product.pk, 'from_store': branch.pk, 'to_store': main.pk, 'quantity': '25'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['quantity'])
+
+        self.client.post(url, {'product': product.pk, 'from_store': branch.pk, 'to_store': main.pk, 'quantity': '5'})
+        self.assertEqual(StockTransfer.objects.count(), 2)
+        self.assertEqual(StoreStock.objects.get(store=branch, product=product).quantity, 15)
+        self.assertEqual(Product.objects.get(pk=product.pk).current_stock, product.current_stock)
+
+    def test_transfers_publish_per_store_levels(self):
+        data = create_shop_data()
+        product, branch, main = data['product'], data['branch'], Store.default()
+        with mock.patch('inventory.signals.hub') as hub, \
+                mock.patch('inventory.signals.publish_stock_change') as published, \
+                self.captureOnCommitCallbacks(execute=True):
+            hub.subscriber_count = 1
+            StockTransfer.objects.create(
+                product=product, from_store=branch, to_store=main, quantity=Decimal('5'), created_by=data['user'],
+            )
+        levels = published.call_args.args[5]
+        self.assertEqual(levels, {main.pk: product.current_stock - 15, branch.pk: 15})
+
+        # Without a screen listening nothing is read or sent
+        with mock.patch('inventory.signals.publish_stock_change') as published, \
+                self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=product.pk).save()
+        published.assert_not_called()
+
+
+class PurchaseLinesTests(TestCase):
+    def test_pasted_lines_are_checked_together_and_added_at_once(self):
+        data = create_shop_data()
+        purchase, product = data['purchase'], data['product']
+        Product.objects.filter(pk=product.pk).update(supplier_item_code='ND-101')
+        self.client.force_login(data['user'])
+        url = reverse('purchase_detail', args=[purchase.pk])
+
+        response = self.client.post(url, {'lines': 'ND-101, 2, 90\nND-999, 1, 90\nND-101, 0, 90'})
+        errors = response.context['lines_form'].errors['lines']
+        self.assertEqual(len(errors), 2)
+        self.assertIn('Line 2', errors[1])
+        self.assertEqual(purchase.items.count(), 1)
 
-# Create your tests here.
+        lines = '\n'.join(['ND-101, 2, 90.50'] * 30 + [f'{product.pk}, 1, 100'])
+        with self.assertNumQueries(9):
+            self.client.post(url, {'lines': lines})
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.items.count(), 32)
+        self.assertEqual(purchase.total_amount, Decimal('950.00') + 30 * Decimal('181.00') + Decimal('100.00'))
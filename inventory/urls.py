@@ -34,6 +34,10 @@ urlpatterns = [
     path('stock-adjustments/', views.stock_adjustment_list, name='stock_adjustment_list'),
     path('stock-adjustments/create/', views.stock_adjustment_create, name='stock_adjustment_create'),
     
+    # Transfers between stores
+    path('stock-transfers/', views.stock_transfer_list, name='stock_transfer_list'),
+    path('stock-transfers/create/', views.stock_transfer_create, name='stock_transfer_create'),
+    
     # API endpoints
     path('api/product/<int:product_id>/stock-info/', views.api_product_stock_info, name='api_product_stock_info'),
     
@@ -2,10 +2,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Sum
-from django.http import JsonResponse
-from .models import Product, Category, Supplier, Customer, PurchaseOrder, PurchaseItem, StockAdjustment
-from .forms import ProductForm, SupplierForm, CustomerForm, PurchaseOrderForm, PurchaseItemForm, StockAdjustmentForm
+from django.http import Http404, JsonResponse
+from .models import Product, Category, Supplier, Customer, PurchaseOrder, PurchaseItem, StockAdjustment, StockTransfer, Store
+from .forms import ProductForm, SupplierForm, CustomerForm, PurchaseOrderForm, PurchaseItemForm, PurchaseLinesForm, StockAdjustmentForm, StockTransferForm
 from django.db import models
+from door_shop.decorators import async_login_required
+from door_shop.versioning import arow_version, table_version
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.conf import settings
+from django.utils import timezone
 
 @login_required
 def product_list(request):
@@ -30,19 +37,31 @@ def product_list(request):
     if product_type:
         products = products.filter(product_type=product_type)
     
-    categories = Category.objects.all()
+    categories = Category.objects.cached()
     
+    # The grid is a cached fragment; the queries above only run on a miss
     context = {
         'products': products,
         'categories': categories,
         'product_types': Product.PRODUCT_TYPES,
+        'grid_version': table_version(Product, Category),
+        'fragment_ttl': settings.FRAGMENT_CACHE_TTL,
     }
     return render(request, 'inventory/product_list.html', context)
 
 @login_required
 def product_detail(request, pk):
     product = get_object_or_404(Product, pk=pk)
-    return render(request, 'inventory/product_detail.html', {'product': product})
+    stores = list(Store.objects.cached())
+    store_levels = []
+    if len(stores) > 1:
+        branch_levels = dict(product.store_levels.values_list('store', 'quantity'))
+        held = sum(branch_levels.values())
+        store_levels = [
+            (store, product.current_stock - held if store.is_default else branch_levels.get(store.pk, 0))
+            for store in stores
+        ]
+    return render(request, 'inventory/product_detail.html', {'product': product, 'store_levels': store_levels})
 
 @login_required
 def product_add(request):
@@ -90,7 +109,7 @@ def product_delete(request, pk):
 
 @login_required
 def supplier_list(request):
-    suppliers = Supplier.objects.all()
+    suppliers = Supplier.objects.cached()
     
     query = request.GET.get('q')
     if query:
@@ -137,12 +156,12 @@ def supplier_edit(request, pk):
 
 # Add these imports at the top if not already present
 from django.db.models import Count, Sum, Q
-from pos.models import Sale
+from pos.models import Sale, customer_sale_totals, in_sale_databases, with_shared
 
 # Add these customer views to your existing views
 @login_required
 def customer_list(request):
-    customers = Customer.objects.all().order_by('-created_at')
+    customers = Customer.objects.order_by('-created_at')
     
     # Search functionality
     query = request.GET.get('q')
@@ -154,15 +173,17 @@ def customer_list(request):
             Q(address__icontains=query)
         )
     
-    # Calculate customer statistics
+    # Sales totals from every sale database and the archive
+    totals = customer_sale_totals()
+    customers = list(customers)
     for customer in customers:
-        customer_sales = Sale.objects.filter(customer=customer)
-        customer.sales_count = customer_sales.count()
-        customer.total_spent = customer_sales.aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        customer.last_purchase = customer_sales.order_by('-sale_date').first()
-    
+        total = totals.get(customer.pk, {'count': 0, 'spent': 0, 'last': None})
+        customer.sales_count = total['count']
+        customer.total_spent = total['spent']
+        customer.last_purchase_date = total['last']
+
     # Summary statistics
-    total_customers = customers.count()
+    total_customers = len(customers)
     active_customers = len([c for c in customers if c.sales_count > 0])
     total_revenue = sum(customer.total_spent for customer in customers)
     avg_spent = total_revenue / active_customers if active_customers > 0 else 0
@@ -216,18 +237,26 @@ def customer_edit(request, pk):
 @login_required
 def customer_sales(request, pk):
     customer = get_object_or_404(Customer, pk=pk)
-    sales = Sale.objects.filter(customer=customer).select_related('sale_person').order_by('-sale_date')
+    # The customer's sales from every sale database, newest first
+    sales = []
+    for database, queryset in in_sale_databases(Sale):
+        sales += with_shared(queryset.filter(customer=customer), database, 'sale_person').prefetch_related(
+            'items__product'
+        ).order_by('-sale_date')
+    sales.sort(key=lambda sale: sale.sale_date, reverse=True)
     
     # Sales statistics
-    total_sales = sales.count()
-    total_amount = sales.aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-    total_discount = sales.aggregate(Sum('discount_amount'))['discount_amount__sum'] or 0
+    total_sales = len(sales)
+    total_amount = sum(sale.grand_total for sale in sales)
+    total_discount = sum(sale.discount_amount for sale in sales)
     
     # Payment method breakdown
-    payment_methods = sales.values('payment_method').annotate(
-        count=Count('id'),
-        total=Sum('grand_total')
-    )
+    by_method = {}
+    for sale in sales:
+        method = by_method.setdefault(sale.payment_method, {'payment_method': sale.payment_method, 'count': 0, 'total': 0})
+        method['count'] += 1
+        method['total'] += sale.grand_total
+    payment_methods = sorted(by_method.values(), key=lambda method: method['payment_method'])
     
     context = {
         'customer': customer,
@@ -246,7 +275,9 @@ from django.http import HttpResponseRedirect
 # Add these purchase views to your existing views
 @login_required
 def purchase_list(request):
-    purchases = PurchaseOrder.objects.all().select_related('supplier').order_by('-order_date')
+    purchases = PurchaseOrder.objects.all().select_related('supplier').annotate(
+        item_count=Count('items')
+    ).order_by('-order_date')
     
     # Filter by status
     status_filter = request.GET.get('status')
@@ -292,7 +323,17 @@ def purchase_detail(request, pk):
     purchase = get_object_or_404(PurchaseOrder, pk=pk)
     items = purchase.items.all().select_related('product')
     
-    if request.method == 'POST' and purchase.status == 'pending':
+    item_form = PurchaseItemForm()
+    lines_form = PurchaseLinesForm(purchase=purchase)
+    if request.method == 'POST' and purchase.status == 'pending' and 'lines' in request.POST:
+        # A pasted invoice: all lines are checked, then added in one go
+        lines_form = PurchaseLinesForm(request.POST, purchase=purchase)
+        if lines_form.is_valid():
+            items = purchase.add_items(lines_form.cleaned_data['lines'])
+            messages.success(request, f'{len(items)} items added to purchase order!')
+            return redirect('purchase_detail', pk=pk)
+        messages.error(request, 'No lines were added; correct the errors below.')
+    elif request.method == 'POST' and purchase.status == 'pending':
         item_form = PurchaseItemForm(request.POST)
         if item_form.is_valid():
             item = item_form.save(commit=False)
@@ -303,13 +344,12 @@ def purchase_detail(request, pk):
             return redirect('purchase_detail', pk=pk)
         else:
             messages.error(request, 'Please correct the errors below.')
-    else:
-        item_form = PurchaseItemForm()
     
     context = {
         'purchase': purchase,
         'items': items,
         'item_form': item_form,
+        'lines_form': lines_form,
     }
     return render(request, 'inventory/purchase_detail.html', context)
 
@@ -317,12 +357,13 @@ def purchase_detail(request, pk):
 def purchase_receive(request, pk):
     purchase = get_object_or_404(PurchaseOrder, pk=pk)
     
-    if request.method == 'POST':
+    if request.method == 'POST' and purchase.status == 'pending':
         purchase.status = 'received'
+        purchase.received_at = timezone.now()
         purchase.save()
         
         # Update product stocks and costs
-        for item in purchase.items.all():
+        for item in purchase.items.select_related('product'):
             if item.product.track_stock:
                 item.product.current_stock += item.quantity
                 item.product.cost_price = item.unit_cost
@@ -331,7 +372,10 @@ def purchase_receive(request, pk):
         messages.success(request, f'Purchase order #{purchase.id} marked as received! Stock levels updated.')
         return redirect('purchase_detail', pk=pk)
     
-    return render(request, 'inventory/purchase_receive_confirm.html', {'purchase': purchase})
+    return render(request, 'inventory/purchase_receive_confirm.html', {
+        'purchase': purchase,
+        'items': purchase.items.select_related('product'),
+    })
 
 @login_required
 def purchase_item_delete(request, pk):
@@ -350,7 +394,7 @@ def purchase_item_delete(request, pk):
 # Add these stock adjustment views to your existing views
 @login_required
 def stock_adjustment_list(request):
-    adjustments = StockAdjustment.objects.all().select_related('product', 'created_by').order_by('-created_at')
+    adjustments = StockAdjustment.objects.all().select_related('product__category', 'created_by').order_by('-created_at')
     
     # Calculate statistics
     total_adjustments = adjustments.count()
@@ -419,60 +463,95 @@ def stock_adjustment_create(request):
         'title': 'Stock Adjustment'
     })
 
-# API view for product stock information
 @login_required
-def api_product_stock_info(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    
-    return JsonResponse({
-        'id': product.id,
-        'name': product.name,
-        'current_stock': float(product.current_stock),
-        'min_stock_level': float(product.min_stock_level),
-        'track_stock': product.track_stock,
-        'category': product.category.name,
+def stock_transfer_list(request):
+    transfers = StockTransfer.objects.select_related(
+        'product', 'from_store', 'to_store', 'created_by'
+    ).order_by('-created_at')[:200]
+    return render(request, 'inventory/stock_transfer_list.html', {'transfers': transfers})
+
+@login_required
+def stock_transfer_create(request):
+    if request.method == 'POST':
+        form = StockTransferForm(request.POST)
+        if form.is_valid():
+            transfer = form.save(commit=False)
+            transfer.created_by = request.user
+            try:
+                transfer.save()
+            except ValueError as e:
+                form.add_error('quantity', str(e))
+            else:
+                messages.success(request, f'Moved {transfer.quantity} of {transfer.product.name} to {transfer.to_store}.')
+                return redirect('stock_transfer_list')
+    else:
+        form = StockTransferForm()
+    
+    return render(request, 'inventory/stock_transfer_form.html', {
+        'form': form,
+        'title': 'Stock Transfer'
     })
 
+# API view for product stock information
+@async_login_required
+async def api_product_stock_info(request, product_id):
+    products = Product.objects.select_related('category')
+    try:
+        version, product = await arow_version(products, product_id)
+    except Product.DoesNotExist:
+        raise Http404('Product not found')
+    
+    # Unchanged product (and categories) -> 304 without touching the database
+    category_version = await sync_to_async(table_version)(Category)
+    etag = f'"stock-{product_id}-{version}-{category_version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if product is None:
+            try:
+                product = await products.aget(id=product_id)
+            except Product.DoesNotExist:
+                raise Http404('Product not found')
+        response = JsonResponse({
+            'id': product.id,
+            'name': product.name,
+            'current_stock': float(product.current_stock),
+            'min_stock_level': float(product.min_stock_level),
+            'track_stock': product.track_stock,
+            'category': product.category.name,
+        })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(version)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 @login_required
 def dashboard(request):
-    # Basic dashboard statistics
-    total_products = Product.objects.count()
-    low_stock_products = Product.objects.filter(
-        track_stock=True,
-        current_stock__lte=models.F('min_stock_level')
-    ).count()
-    
-    total_suppliers = Supplier.objects.count()
-    total_customers = Customer.objects.count()
-    
-    # Recent purchases
-    recent_purchases = PurchaseOrder.objects.select_related('supplier').order_by('-order_date')[:5]
-    
-    # Low stock alerts
-    low_stock_alerts = Product.objects.filter(
-        track_stock=True,
-        current_stock__lte=models.F('min_stock_level')
-    )[:10]
+    from reports.dashboard import get_dashboard_snapshot
+    
+    # Basic dashboard statistics from the cached snapshot
+    snapshot = get_dashboard_snapshot()
     
     context = {
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'total_suppliers': total_suppliers,
-        'total_customers': total_customers,
-        'recent_purchases': recent_purchases,
-        'low_stock_alerts': low_stock_alerts,
+        'total_products': snapshot['total_products'],
+        'low_stock_products': snapshot['low_stock_count'],
+        'total_suppliers': snapshot['total_suppliers'],
+        'total_customers': snapshot['total_customers'],
+        'recent_purchases': snapshot['recent_purchases'],
+        'low_stock_alerts': snapshot['low_stock_products'],
     }
     
     return render(request, 'inventory/dashboard.html', context)
 
 # API views for AJAX calls
-@login_required
-def api_product_search(request):
+@async_login_required
+async def api_product_search(request):
     query = request.GET.get('q', '')
-    products = Product.objects.filter(name__icontains=query)[:10]
+    products = Product.objects.filter(name__icontains=query).only(
+        'id', 'name', 'selling_price', 'current_stock', 'track_stock'
+    )[:10]
     
     results = []
-    for product in products:
+    async for product in products:
         results.append({
             'id': product.id,
             'name': product.name,
@@ -481,4 +560,4 @@ def api_product_search(request):
             'track_stock': product.track_stock
         })
     
-    return JsonResponse(results, safe=False)
\ No newline at end of file
+    return JsonResponse(results, safe=False)
@@ -0,0 +1,73 @@
+"""Moving sales of old, closed days out of the hot tables.
+
+``manage.py archive_sales`` moves every sale (with its items and payments) of a
+closed day older than ``SALES_ARCHIVE_AFTER_DAYS`` into ``ArchivedSale``,
+``ArchivedSaleItem`` and ``ArchivedPayment``, keeping their ids. Each batch of
+``SALES_ARCHIVE_BATCH_SIZE`` sales is copied and deleted in one transaction, so
+a till is never locked out for long and an interrupted run leaves no sale in
+both places. The day's ``DailySummary`` rows are left alone, so the daily pages
+and closed-period reports keep their totals.
+
+The sales and profit reports read the archive for any period that has archived
+sales in it (``has_archived_sales``). An archived day can't be reopened.
+
+Only sales on ``default`` are archived; per-store databases keep theirs.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivedPayment, ArchivedSale, ArchivedSaleItem, DailySummary, Payment, Sale, SaleItem, day_range,
+)
+
+
+def has_archived_sales(start_date, end_date=None):
+    start, end = day_range(start_date, end_date)
+    return ArchivedSale.objects.filter(sale_date__gte=start, sale_date__lt=end).exists()
+
+
+def archivable_days(older_than=None):
+    """Closed days before the cutoff that still have sales in the hot tables."""
+    older_than = settings.SALES_ARCHIVE_AFTER_DAYS if older_than is None else older_than
+    cutoff = timezone.now().date() - timedelta(days=older_than)
+    days = DailySummary.objects.filter(
+        store__isnull=True, is_closed=True, date__lt=cutoff, sale_count__gt=0,
+    ).order_by('date').values_list('date', flat=True)
+    return [day for day in days if _hot_sales(day).exists()]
+
+
+def _hot_sales(date):
+    start, end = day_range(date)
+    return Sale.objects.filter(sale_date__gte=start, sale_date__lt=end)
+
+
+def _copy(rows, archive_model):
+    fields = [field.attname for field in archive_model._meta.concrete_fields if field.name != 'archived_at']
+    archive_model.objects.bulk_create([archive_model(**row) for row in rows.values(*fields)])
+
+
+def archive_day(date, batch_size=None, sleep=0):
+    """Move one closed day's sales to the archive in batches; returns how many were moved."""
+    batch_size = batch_size or settings.SALES_ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Stop if the day was reopened for an adjustment since we started
+            if not DailySummary.is_date_closed(date):
+                break
+            ids = list(_hot_sales(date).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            _copy(Sale.objects.filter(pk__in=ids), ArchivedSale)
+            _copy(SaleItem.objects.filter(sale_id__in=ids), ArchivedSaleItem)
+            _copy(Payment.objects.filter(sale_id__in=ids), ArchivedPayment)
+            # Items and payments go with their sales
+            Sale.objects.filter(pk__in=ids).delete()
+        moved += len(ids)
+        if sleep:
+            time.sleep(sleep)
+    return moved
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pos.archive import archivable_days, archive_day
+
+
+class Command(BaseCommand):
+    help = 'Move the sales of closed days older than SALES_ARCHIVE_AFTER_DAYS into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, help=f'Age in days (default {settings.SALES_ARCHIVE_AFTER_DAYS})')
+        parser.add_argument('--batch-size', type=int, help=f'Sales per transaction (default {settings.SALES_ARCHIVE_BATCH_SIZE})')
+        parser.add_argument('--sleep', type=float, default=0.05, help='Seconds between batches, to let the tills in')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the days that would be archived')
+
+    def handle(self, *args, **options):
+        days = archivable_days(options['older_than'])
+        if options['dry_run']:
+            for day in days:
+                self.stdout.write(f'Would archive {day}')
+            self.stdout.write(f'{len(days)} days to archive')
+            return
+
+        started = time.perf_counter()
+        total = 0
+        for day in days:
+            moved = archive_day(day, options['batch_size'], options['sleep'])
+            total += moved
+            self.stdout.write(f'{day}: archived {moved} sales')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} sales from {len(days)} days in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,187 @@
+import json
+import multiprocessing
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from door_shop.benchmarking import (
+    bench_login, init_checkout_worker, latency_summary, prepare_test_client, run_checkout_till, set_sqlite_locking,
+)
+from inventory.models import Product
+from pos.models import DailySummary, Sale, SaleItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent checkouts at create_sale from many simulated tills and check stock stays consistent. '
+        'Writes real sales: run it against a seeded copy of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tills', type=int, default=8, help='Concurrent tills (threads or processes)')
+        parser.add_argument('--sales', type=int, default=50, help='Checkouts per till')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--products', type=int, default=20, help='Size of the product pool the carts draw from')
+        parser.add_argument('--max-items', type=int, default=4, help='Largest number of lines in a cart')
+        parser.add_argument('--stock', type=int, help='Reset the pool products to this stock before the run')
+        parser.add_argument('--transaction-mode', choices=['DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'],
+                            help='SQLite transaction mode for this run')
+        parser.add_argument('--busy-timeout', type=int, help='SQLite busy timeout for this run, in milliseconds')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        prepare_test_client()
+        if DailySummary.is_date_closed(timezone.now().date()):
+            raise CommandError('Today is closed; reopen it before running the checkout benchmark.')
+
+        pool = list(Product.objects.filter(track_stock=True).order_by('pk')[:options['products']])
+        if not pool:
+            raise CommandError('No stocked products found; seed the database first (manage.py seed_shop).')
+        if options['stock'] is not None:
+            Product.objects.filter(pk__in=[p.pk for p in pool]).update(current_stock=options['stock'])
+        start_stock = dict(Product.objects.filter(pk__in=[p.pk for p in pool]).values_list('pk', 'current_stock'))
+        last_sale_id = Sale.objects.aggregate(last=Max('id'))['last'] or 0
+
+        carts = self.build_carts(pool, options)
+        login = Client()
+        # The run's sales belong to the bench user, so it stays once the run is over
+        with bench_login(login, keep_user=True):
+            outcomes = self.run(login.cookies[settings.SESSION_COOKIE_NAME].value, carts, options)
+        # From the first checkout to the last, leaving out worker start-up
+        elapsed = max(o[3] for o in outcomes) - min(o[2] for o in outcomes)
+
+        results = self.summarize(outcomes, elapsed)
+        results['consistency'] = self.check_consistency(start_stock, last_sale_id, results['outcomes']['ok'])
+        results['config'] = {
+            key: options[key] for key in
+            ('tills', 'sales', 'mode', 'products', 'max_items', 'stock', 'transaction_mode', 'busy_timeout', 'seed')
+        }
+        results['config']['database'] = connection.vendor
+        self.report(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run(self, session_key, carts, options):
+        """Every till's carts through create_sale; one (latencies, outcomes, started, finished) per till."""
+        url = reverse('create_sale')
+
+        # Workers open their own connections with the chosen locking options
+        connection.close()
+        if connection.vendor == 'sqlite':
+            set_sqlite_locking(options['transaction_mode'], options['busy_timeout'])
+        elif options['transaction_mode'] or options['busy_timeout']:
+            raise CommandError('--transaction-mode and --busy-timeout only apply to SQLite.')
+
+        if options['mode'] == 'process':
+            executor = ProcessPoolExecutor(
+                max_workers=options['tills'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_checkout_worker,
+                initargs=(options['transaction_mode'], options['busy_timeout']),
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=options['tills'])
+        with executor:
+            futures = [executor.submit(run_checkout_till, session_key, url, till_carts) for till_carts in carts]
+            return [future.result() for future in futures]
+
+    def build_carts(self, pool, options):
+        """Till-like carts: a few lines, mostly single units, biased towards the first products."""
+        rng = random.Random(options['seed'])
+        weights = [1 / rank for rank in range(1, len(pool) + 1)]
+        carts = []
+        for _ in range(options['tills']):
+            till_carts = []
+            for _ in range(options['sales']):
+                lines = rng.randint(1, min(options['max_items'], len(pool)))
+                products = set(rng.choices(pool, weights, k=lines))
+                items = [{
+                    'product_id': product.pk,
+                    'quantity': str(rng.choice([1, 1, 1, 2, 3])),
+                    'unit_price': str(product.selling_price),
+                } for product in products]
+                total = sum(Decimal(item['quantity']) * Decimal(item['unit_price']) for item in items)
+                till_carts.append({
+                    'items': items,
+                    'payment_method': rng.choices(['cash', 'card', 'mobile'], [60, 20, 20])[0],
+                    'payment_received': str(total),
+                })
+            carts.append(till_carts)
+        return carts
+
+    def summarize(self, outcomes, elapsed):
+        latencies = [latency for till in outcomes for latency in till[0]]
+        counts = Counter()
+        other_errors = Counter()
+        for till in outcomes:
+            for outcome in till[1]:
+                if outcome == 'ok':
+                    counts['ok'] += 1
+                elif 'locked' in outcome:
+                    counts['lock_errors'] += 1
+                elif outcome.startswith('Not enough stock'):
+                    counts['out_of_stock'] += 1
+                else:
+                    counts['other_errors'] += 1
+                    other_errors[outcome] += 1
+        summary = {
+            'latency': latency_summary(latencies, elapsed),
+            'sales_per_second': round(counts['ok'] / elapsed, 1) if elapsed else 0.0,
+            'outcomes': {key: counts[key] for key in ('ok', 'out_of_stock', 'lock_errors', 'other_errors')},
+            'error_samples': dict(other_errors.most_common(5)),
+        }
+        return summary
+
+    def check_consistency(self, start_stock, last_sale_id, successful):
+        """Stock must equal the starting stock minus what the committed sales took, and never go negative."""
+        sold = dict(
+            SaleItem.objects.filter(sale_id__gt=last_sale_id, product_id__in=start_stock)
+            .values_list('product_id').annotate(total=Sum('quantity')).order_by()
+        )
+        mismatched, oversold = {}, []
+        for product_id, current in Product.objects.filter(pk__in=start_stock).values_list('pk', 'current_stock'):
+            expected = start_stock[product_id] - sold.get(product_id, 0)
+            if current != expected:
+                mismatched[product_id] = {'expected': str(expected), 'actual': str(current)}
+            if current < 0:
+                oversold.append(product_id)
+        new_sales = Sale.objects.filter(id__gt=last_sale_id).count()
+        return {
+            'ok': not mismatched and not oversold and new_sales == successful,
+            'new_sales': new_sales,
+            'successful_checkouts': successful,
+            'mismatched_stock': mismatched,
+            'oversold_products': oversold,
+        }
+
+    def report(self, results):
+        latency, outcomes, consistency = results['latency'], results['outcomes'], results['consistency']
+        self.stdout.write(
+            f"{results['sales_per_second']} sales/s  p50 {latency['p50_ms']}ms  p95 {latency['p95_ms']}ms  "
+            f"p99 {latency['p99_ms']}ms  max {latency['max_ms']}ms"
+        )
+        self.stdout.write(
+            f"ok {outcomes['ok']}  out of stock {outcomes['out_of_stock']}  "
+            f"lock errors {outcomes['lock_errors']}  other errors {outcomes['other_errors']}"
+        )
+        for error, count in results['error_samples'].items():
+            self.stdout.write(f'  {count} x {error}')
+        if consistency['ok']:
+            self.stdout.write(self.style.SUCCESS('Stock consistent: no oversell, no lost updates, no partial sales'))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"Stock inconsistent: {len(consistency['mismatched_stock'])} mismatched, "
+                f"{len(consistency['oversold_products'])} oversold, "
+                f"{consistency['new_sales']} sales saved for {consistency['successful_checkouts']} successful checkouts"
+            ))
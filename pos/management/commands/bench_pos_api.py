@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from door_shop.benchmarking import bench_login, latency_summary, prepare_test_client
+from inventory.models import Customer, Product
+
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI throughput of the POS JSON endpoints with many concurrent tills'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tills', type=int, default=32, help='Concurrent tills (threads or coroutines)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per till')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        prepare_test_client()
+        product_ids = list(Product.objects.values_list('id', flat=True)[:200])
+        phones = list(Customer.objects.exclude(phone=None).values_list('phone', flat=True)[:200])
+        if not product_ids:
+            raise CommandError('No products found; seed the database first (manage.py seed_shop).')
+
+        self.urls = self.build_urls(product_ids, phones, options['tills'] * options['requests'])
+        login_client = Client()
+        results = {}
+        with bench_login(login_client):
+            self.session_cookie = login_client.cookies
+            if options['mode'] in ('wsgi', 'both'):
+                results['wsgi'] = self.run_wsgi(options['tills'], options['requests'])
+            if options['mode'] in ('asgi', 'both'):
+                results['asgi'] = asyncio.run(self.run_asgi(options['tills'], options['requests']))
+
+        for mode, summary in results.items():
+            self.stdout.write(
+                f"{mode.upper():5} {summary['per_second']:>8} req/s  p50 {summary['p50_ms']}ms  "
+                f"p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms  errors {summary['errors']}"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def build_urls(self, product_ids, phones, count):
+        """A till-like mix: mostly product lookups, some searches and customer lookups."""
+        products = itertools.cycle(product_ids)
+        phone_cycle = itertools.cycle(phones or ['0000000000'])
+        urls = []
+        for i in range(count):
+            kind = i % 10
+            if kind < 5:
+                urls.append(reverse('get_product_details', args=[next(products)]))
+            elif kind < 7:
+                urls.append(reverse('api_product_stock_info', args=[next(products)]))
+            elif kind < 9:
+                urls.append(reverse('api_product_search') + '?q=door')
+            else:
+                urls.append(reverse('get_customer_by_phone', args=[next(phone_cycle)]))
+        return urls
+
+    def run_wsgi(self, tills, per_till):
+        def till(index):
+            client = Client()
+            client.cookies = self.session_cookie
+            latencies, errors = [], 0
+            for url in self.urls[index * per_till:(index + 1) * per_till]:
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+            return latencies, errors
+
+        # An untimed request first, so no till pays for the first session and user lookup
+        client = Client()
+        client.cookies = self.session_cookie
+        self.check_warmup(client.get(self.urls[0]))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=tills) as pool:
+            outcomes = list(pool.map(till, range(tills)))
+        return self.summarize(outcomes, time.perf_counter() - start)
+
+    async def run_asgi(self, tills, per_till):
+        async def till(index):
+            client = AsyncClient()
+            client.cookies = self.session_cookie
+            latencies, errors = [], 0
+            for url in self.urls[index * per_till:(index + 1) * per_till]:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+            return latencies, errors
+
+        # An untimed request first, so no till pays for the first session and user lookup
+        client = AsyncClient()
+        client.cookies = self.session_cookie
+        self.check_warmup(await client.get(self.urls[0]))
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(till(i) for i in range(tills)))
+        return self.summarize(outcomes, time.perf_counter() - start)
+
+    def check_warmup(self, response):
+        if response.status_code != 200:
+            raise CommandError(f'Warm-up request to {self.urls[0]} failed with status {response.status_code}.')
+
+    def summarize(self, outcomes, elapsed):
+        latencies = [latency for till_latencies, _ in outcomes for latency in till_latencies]
+        summary = latency_summary(latencies, elapsed)
+        summary['errors'] = sum(errors for _, errors in outcomes)
+        return summary
@@ -0,0 +1,177 @@
+import json
+import re
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from door_shop.benchmarking import bench_login, compare_to_baseline, latency_summary, prepare_test_client
+from inventory import urls as inventory_urls
+from inventory.models import Customer, Product, PurchaseItem, PurchaseOrder, Supplier
+from pos import urls as pos_urls
+from pos.models import Sale
+from reports import urls as report_urls
+from reports.models import ReportJob
+
+# Endpoints that only act on POST; a GET just redirects
+ACTION_URLS = {'create_sale', 'search_or_create_customer', 'close_day', 'reopen_day', 'purchase_item_delete'}
+
+
+class Command(BaseCommand):
+    help = 'Time every read view against the current database and compare with a saved baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per view')
+        parser.add_argument('--views', help='Only URL names matching this regular expression')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file')
+        parser.add_argument('--baseline', help='Results file of an earlier run to compare with')
+        parser.add_argument('--threshold', type=float, default=10.0, help='Percent slower that counts as a regression')
+
+    def handle(self, *args, **options):
+        prepare_test_client()
+        self.client = Client()
+        self.cold = options['cold']
+
+        views = self.read_views(options['views'])
+        if not views:
+            raise CommandError('No views to benchmark.')
+
+        with bench_login(self.client):
+            results = self.run(views, options)
+
+        output = {
+            'meta': {
+                'run_at': timezone.now().isoformat(),
+                'iterations': options['iterations'],
+                'cold': self.cold,
+                'database': connection.vendor,
+                'products': Product.objects.count(),
+                'sales': Sale.objects.count(),
+            },
+            'views': results,
+        }
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(output, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            self.report_comparison(compare_to_baseline(results, baseline['views'], options['threshold']))
+
+    def run(self, views, options):
+        results = {}
+        for name, url in views:
+            results[name] = self.measure(url, options['warmup'], options['iterations'])
+            summary = results[name]
+            self.stdout.write(
+                f"{name:28} p50 {summary['p50_ms']:>8}ms  p95 {summary['p95_ms']:>8}ms  "
+                f"p99 {summary['p99_ms']:>8}ms  {summary['queries']:>4} queries  {summary['bytes'] / 1024:>8.1f}KB"
+            )
+        return results
+
+    def read_views(self, pattern):
+        """Every GET-able URL of the shop apps, with arguments taken from existing rows."""
+        objects = {
+            'product': Product.objects.order_by('pk').first(),
+            'supplier': Supplier.objects.order_by('pk').first(),
+            'customer': Customer.objects.filter(sale__isnull=False).order_by('pk').first(),
+            'purchase': PurchaseOrder.objects.filter(status='pending').order_by('pk').first()
+                        or PurchaseOrder.objects.order_by('pk').first(),
+            'purchase_item': PurchaseItem.objects.order_by('pk').first(),
+            'sale': Sale.objects.order_by('-pk').first(),
+            'job': ReportJob.objects.filter(status='done').order_by('-pk').first(),
+        }
+        kwargs = {
+            'product_detail': {'pk': objects['product']},
+            'product_edit': {'pk': objects['product']},
+            'product_delete': {'pk': objects['product']},
+            'api_product_stock_info': {'product_id': objects['product']},
+            'get_product_details': {'product_id': objects['product']},
+            'supplier_edit': {'pk': objects['supplier']},
+            'customer_edit': {'pk': objects['customer']},
+            'customer_sales': {'pk': objects['customer']},
+            'get_customer_by_phone': {'phone': objects['customer'] and objects['customer'].phone},
+            'purchase_detail': {'pk': objects['purchase']},
+            'purchase_receive': {'pk': objects['purchase']},
+            'print_receipt': {'sale_id': objects['sale']},
+            'report_job_detail': {'pk': objects['job']},
+            'report_job_status': {'pk': objects['job']},
+            'report_job_csv': {'pk': objects['job']},
+        }
+        query = {
+            'api_product_search': '?q=door',
+            'daily_sales': f'?date={timezone.now().date().isoformat()}',
+        }
+
+        views = []
+        for urlpatterns in (inventory_urls.urlpatterns, pos_urls.urlpatterns, report_urls.urlpatterns):
+            for url_pattern in urlpatterns:
+                name = url_pattern.name
+                if name in ACTION_URLS or (pattern and not re.search(pattern, name)):
+                    continue
+                view_kwargs = kwargs.get(name, {})
+                if any(value is None for value in view_kwargs.values()):
+                    self.stderr.write(f'Skipping {name}: no rows to show')
+                    continue
+                view_kwargs = {key: getattr(value, 'pk', value) for key, value in view_kwargs.items()}
+                try:
+                    views.append((name, reverse(name, kwargs=view_kwargs) + query.get(name, '')))
+                except NoReverseMatch:
+                    self.stderr.write(f'Skipping {name}: cannot build its URL')
+        return views
+
+    def measure(self, url, warmup, iterations):
+        for _ in range(warmup):
+            self.request(url)
+
+        # Count queries on a separate request so capturing doesn't skew the timings
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.request(url)
+        queries = len(ctx.captured_queries)
+
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            self.request(url)
+            latencies.append(time.perf_counter() - start)
+
+        summary = latency_summary(latencies)
+        summary.update({
+            'url': url,
+            'status': response.status_code,
+            'queries': queries,
+            'bytes': len(response.content),
+        })
+        return summary
+
+    def request(self, url):
+        if self.cold:
+            cache.clear()
+        return self.client.get(url)
+
+    def report_comparison(self, rows):
+        self.stdout.write('')
+        self.stdout.write(f"{'view':28} {'p50':>10} {'p95':>10} {'queries':>10}")
+        regressions = 0
+        for row in rows:
+            line = (
+                f"{row['name']:28} {row['p50_change']:>+9.1f}% {row['p95_change']:>+9.1f}% "
+                f"{row['queries_change']:>+10}"
+            )
+            if row['regression']:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f'{line}  REGRESSION'))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            self.stdout.write(self.style.ERROR(f'{regressions} view(s) regressed against the baseline'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
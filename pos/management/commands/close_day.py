@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pos.models import DailySummary
+
+
+class Command(BaseCommand):
+    help = 'Finalize and close the daily sales summary (defaults to yesterday)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to close, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                date = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Date must be in YYYY-MM-DD format')
+        else:
+            date = timezone.now().date() - timedelta(days=1)
+
+        try:
+            summary = DailySummary.close_day(date)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Closed {summary.date}: {summary.sale_count} sales, total {summary.total_sales}, profit {summary.total_profit}'
+        ))
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from door_shop.querylog import load_dumps
+
+SORT_KEYS = {'total': 'total', 'max': 'max', 'count': 'count', 'avg': 'avg'}
+
+
+class Command(BaseCommand):
+    help = 'Top SQL fingerprints by time, merged from the query log dumps of every web process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total', help='Rank by this figure')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--view', help='Only fingerprints run by this URL name')
+        parser.add_argument('--dir', help=f'Dump directory (default {settings.QUERYLOG_DIR})')
+        parser.add_argument('--json', dest='json_path', help='Also write the rows to this file')
+        parser.add_argument('--reset', action='store_true', help='Delete the dumps after reading them')
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'] or settings.QUERYLOG_DIR)
+        stats = load_dumps(directory)
+        if not stats:
+            self.stdout.write(f'No query log dumps in {directory}')
+            return
+
+        rows = []
+        for sql, entry in stats.items():
+            if options['view'] and options['view'] not in entry['views']:
+                continue
+            rows.append({
+                'sql': sql,
+                'count': entry['count'],
+                'total': round(entry['total'] * 1000, 1),
+                'avg': round(entry['total'] * 1000 / entry['count'], 2),
+                'max': round(entry['max'] * 1000, 1),
+                'views': dict(entry['views'].most_common(3)),
+            })
+        rows.sort(key=lambda row: row[SORT_KEYS[options['sort']]], reverse=True)
+        rows = rows[:options['limit']]
+
+        for rank, row in enumerate(rows, 1):
+            views = ', '.join(f'{view or "-"} x{count}' for view, count in row['views'].items())
+            self.stdout.write(
+                f"{rank:>3}. total {row['total']:>10}ms  avg {row['avg']:>8}ms  max {row['max']:>8}ms  "
+                f"{row['count']:>7} calls  [{views}]"
+            )
+            self.stdout.write(f"     {row['sql'][:300]}")
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(rows, f, indent=2)
+        if options['reset']:
+            for path in directory.glob('querylog-*.json'):
+                path.unlink(missing_ok=True)
+            self.stdout.write(f'Removed the dumps in {directory}')
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("pos", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailysummary",
+            name="closed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="dailysummary",
+            name="closed_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="closed_days",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailysummary",
+            name="is_closed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="dailysummary",
+            name="sale_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailysummary",
+            name="total_cost",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_hot_path_indexes"),
+        ("pos", "0002_dailysummary_close"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="sale",
+            name="customer",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="inventory.customer",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="saleitem",
+            name="product",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventory.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(fields=["sale_date"], name="pos_sale_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                fields=["customer", "sale_date"], name="pos_sale_customer_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="saleitem",
+            index=models.Index(
+                fields=["product", "sale"], name="pos_saleitem_product_sale_idx"
+            ),
+        ),
+    ]
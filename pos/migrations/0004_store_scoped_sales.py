@@ -0,0 +1,75 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_main_store(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Store = apps.get_model("inventory", "Store")
+    Sale = apps.get_model("pos", "Sale")
+    main = Store.objects.using(db).filter(is_default=True).first()
+    if main is not None:
+        Sale.objects.using(db).filter(store__isnull=True).update(store=main)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_stores"),
+        ("pos", "0003_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailysummary",
+            name="store",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="daily_summaries",
+                to="inventory.store",
+            ),
+        ),
+        migrations.AddField(
+            model_name="sale",
+            name="store",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="sales",
+                to="inventory.store",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dailysummary",
+            name="date",
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                fields=["store", "sale_date"], name="pos_sale_store_date_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailysummary",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("store__isnull", True)),
+                fields=("date",),
+                name="unique_shop_daily_summary",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailysummary",
+            constraint=models.UniqueConstraint(
+                fields=("store", "date"), name="unique_store_daily_summary"
+            ),
+        ),
+        migrations.RunPython(
+            assign_main_store, migrations.RunPython.noop, hints={"model_name": "store"}
+        ),
+    ]
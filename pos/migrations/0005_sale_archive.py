@@ -0,0 +1,167 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_stores"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("pos", "0004_store_scoped_sales"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedSale",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("sale_date", models.DateTimeField()),
+                (
+                    "total_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "discount_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "tax_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "grand_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Cash"),
+                            ("card", "Card"),
+                            ("mobile", "Mobile Banking"),
+                            ("due", "Customer Due"),
+                        ],
+                        default="cash",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "payment_received",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "change_given",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("notes", models.TextField(blank=True)),
+                ("receipt_printed", models.BooleanField(default=False)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_sales",
+                        to="inventory.customer",
+                    ),
+                ),
+                (
+                    "sale_person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="+",
+                        to="inventory.store",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedPayment",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Cash"),
+                            ("card", "Card"),
+                            ("mobile", "Mobile Banking"),
+                            ("due", "Customer Due"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("payment_date", models.DateTimeField()),
+                ("reference", models.CharField(blank=True, max_length=100)),
+                ("notes", models.TextField(blank=True)),
+                (
+                    "sale",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payments",
+                        to="pos.archivedsale",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedSaleItem",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("unit_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("total_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="inventory.product",
+                    ),
+                ),
+                (
+                    "sale",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="pos.archivedsale",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["product", "sale"], name="pos_architem_product_sale_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="archivedsale",
+            index=models.Index(fields=["sale_date"], name="pos_archsale_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="archivedsale",
+            index=models.Index(
+                fields=["customer", "sale_date"], name="pos_archsale_customer_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_due_balances(apps, schema_editor):
+    # What existing due sales leave owing becomes each customer's opening balance
+    db = schema_editor.connection.alias
+    Customer = apps.get_model("inventory", "Customer")
+    CustomerLedgerEntry = apps.get_model("pos", "CustomerLedgerEntry")
+    owing = {}
+    for model_name in ("Sale", "ArchivedSale"):
+        rows = (
+            apps.get_model("pos", model_name)
+            .objects.using(db)
+            .filter(payment_method="due", customer__isnull=False)
+            .values("customer")
+            .annotate(
+                due=models.Sum(models.F("grand_total") - models.F("payment_received"))
+            )
+            .order_by()
+        )
+        for row in rows:
+            owing[row["customer"]] = owing.get(row["customer"], 0) + (row["due"] or 0)
+    entries = []
+    for customer_id, due in owing.items():
+        if due > 0:
+            Customer.objects.using(db).filter(pk=customer_id).update(due_balance=due)
+            entries.append(
+                CustomerLedgerEntry(
+                    customer_id=customer_id, kind="opening", amount=due, balance=due
+                )
+            )
+    CustomerLedgerEntry.objects.using(db).bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("inventory", "0010_customer_due_balance"),
+        ("pos", "0005_sale_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("opening", "Opening balance"),
+                            ("sale", "Sale on due"),
+                            ("payment", "Payment collected"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "payment_method",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("cash", "Cash"),
+                            ("card", "Card"),
+                            ("mobile", "Mobile Banking"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("reference", models.CharField(blank=True, max_length=100)),
+                ("notes", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "customer",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="inventory.customer",
+                    ),
+                ),
+                (
+                    "sale",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="pos.sale",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "customer ledger entries",
+                "indexes": [
+                    models.Index(
+                        fields=["customer", "created_at"],
+                        name="pos_ledger_customer_date_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            open_due_balances,
+            migrations.RunPython.noop,
+            hints={"model_name": "customerledgerentry"},
+        ),
+    ]
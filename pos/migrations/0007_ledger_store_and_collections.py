@@ -0,0 +1,57 @@
+# Generated by Django 4.2.26 on 2026-10-19 02:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_sale_stores(apps, schema_editor):
+    # Entries of sales kept on default take their sale's store; store databases
+    # aren't reachable from here, so entries of their sales stay empty
+    db = schema_editor.connection.alias
+    Sale = apps.get_model("pos", "Sale")
+    CustomerLedgerEntry = apps.get_model("pos", "CustomerLedgerEntry")
+    entries = CustomerLedgerEntry.objects.using(db).filter(
+        kind="sale", sale__isnull=False
+    )
+    for entry in entries:
+        sale = (
+            Sale.objects.using(db)
+            .filter(pk=entry.sale_id, customer=entry.customer_id)
+            .first()
+        )
+        if sale is not None and sale.store_id:
+            entry.store_id = sale.store_id
+            entry.save(update_fields=["store"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_customer_due_balance"),
+        ("pos", "0006_customer_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customerledgerentry",
+            name="store",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="inventory.store",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailysummary",
+            name="total_collected",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(
+            set_sale_stores,
+            migrations.RunPython.noop,
+            hints={"model_name": "customerledgerentry"},
+        ),
+    ]
@@ -1,8 +1,148 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from inventory.models import Product, Customer
+from django.conf import settings
+from inventory.models import Product, Customer, Store, StoreStock
+from django.utils import timezone
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
+class ClosedPeriodError(Exception):
+    """Raised when a sale would change a day that has been closed."""
+
+
+# Days already checked open by the enclosing period_checked() block
+_checked_open = ContextVar('checked_open_days', default=frozenset())
+
+
+def check_period_open(date):
+    if date in _checked_open.get():
+        return
+    if DailySummary.is_date_closed(date):
+        raise ClosedPeriodError(f'Sales for {date} are closed and can no longer be changed.')
+
+
+@contextmanager
+def period_checked(date):
+    """Check once that ``date`` is open, for a block of writes to it such as a checkout.
+
+    Use it inside the block's transaction, so a close can't slip in between.
+    """
+    check_period_open(date)
+    token = _checked_open.set(_checked_open.get() | {date})
+    try:
+        yield
+    finally:
+        _checked_open.reset(token)
+
+
+def day_range(start_date, end_date=None):
+    """Datetime bounds [start, end) covering whole days.
+
+    Filtering ``sale_date`` on these bounds can use its index, unlike a
+    ``sale_date__date`` lookup which wraps the column in a function.
+    """
+    end_date = end_date or start_date
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def sale_databases():
+    """Aliases holding sales: ``default``, then each store database (door_shop.routers)."""
+    return ['default', *sorted(set(settings.STORE_DATABASES.values()))]
+
+
+def in_sale_databases(model):
+    """``(database, queryset)`` of ``model`` (Sale, SaleItem or Payment) in every sale database.
+
+    Whatever lists or adds up sales loops over these, so a store with its own
+    database isn't left out. ``default`` is left to the routers, so report
+    views still read the snapshot. A store database holds only the sales
+    tables: prefetch customers and products there, or look them up on default,
+    rather than joining them (see ``with_shared``).
+    """
+    return [
+        (database, model.objects.all() if database == 'default' else model.objects.using(database))
+        for database in sale_databases()
+    ]
+
+
+def with_shared(sales, database, *fields):
+    """``select_related(*fields)`` on default; prefetched on a store database, which can't join shared tables."""
+    if database == 'default':
+        return sales.select_related(*fields)
+    return sales.prefetch_related(*fields)
+
+
+def item_revenue_and_cost(items, database='default'):
+    """Revenue and cost (at the products' cost price) of the sale items in ``items``."""
+    from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+    if database == 'default':
+        totals = items.aggregate(
+            revenue=Sum('total_price'),
+            cost=Sum(ExpressionWrapper(
+                F('product__cost_price') * F('quantity'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )),
+        )
+        return totals['revenue'] or 0, totals['cost'] or 0
+    # Products live on default, so cost the per-product quantities there
+    sold = list(items.values('product').annotate(revenue=Sum('total_price'), quantity=Sum('quantity')).order_by())
+    costs = dict(Product.objects.filter(pk__in=[row['product'] for row in sold]).values_list('pk', 'cost_price'))
+    return (
+        sum(row['revenue'] for row in sold),
+        sum(costs.get(row['product'], 0) * row['quantity'] for row in sold),
+    )
+
+
+def tender_totals(sales, payments, **aggregates):
+    """``sales`` aggregated with ``aggregates`` plus their takings per method, in two queries.
+
+    A checkout's takings per method come from its ``payments`` rows, and what
+    they leave unpaid is due. Sales rung up before split payments have no
+    rows and count wholly under their ``payment_method``. ``payments`` must
+    cover the same sales (Payment or ArchivedPayment).
+    """
+    from django.db.models import Exists, OuterRef, Q, Sum
+    unsplit = Q(has_payments=False)
+    paid_rows = payments.model.objects.filter(sale=OuterRef('pk'))
+    totals = sales.annotate(has_payments=Exists(paid_rows)).aggregate(
+        tendered=Sum('grand_total', filter=Q(has_payments=True)),
+        **{method: Sum('grand_total', filter=unsplit & Q(payment_method=method)) for method in ('cash', 'card', 'mobile', 'due')},
+        **aggregates,
+    )
+    paid = payments.aggregate(
+        total=Sum('amount'),
+        **{method: Sum('amount', filter=Q(payment_method=method)) for method in ('cash', 'card', 'mobile')},
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    for method in ('cash', 'card', 'mobile'):
+        totals[method] += paid[method] or 0
+    # Change is kept out of the payments, so they never exceed the sale
+    totals['due'] += totals.pop('tendered') - (paid['total'] or 0)
+    return totals
+
+
+def customer_sale_totals():
+    """``{customer_id: {'count', 'spent', 'last'}}`` for every customer with sales, in any
+    sale database or archived (pos.archive), so archiving doesn't change a customer's totals."""
+    from django.db.models import Count, Max, Sum
+    totals = {}
+    for sales in [sales for _, sales in in_sale_databases(Sale)] + [ArchivedSale.objects.all()]:
+        rows = sales.filter(customer__isnull=False).values('customer').annotate(
+            count=Count('id'), spent=Sum('grand_total'), last=Max('sale_date'),
+        ).order_by()
+        for row in rows:
+            total = totals.setdefault(row['customer'], {'count': 0, 'spent': Decimal('0'), 'last': row['last']})
+            total['count'] += row['count']
+            total['spent'] += row['spent'] or 0
+            total['last'] = max(total['last'], row['last'])
+    return totals
+
+
 class Sale(models.Model):
     PAYMENT_METHODS = [
         ('cash', 'Cash'),
@@ -11,7 +151,8 @@ class Sale(models.Model):
         ('due', 'Customer Due'),
     ]
 
-    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, null=True, blank=True, related_name='sales', db_index=False)
     sale_date = models.DateTimeField(auto_now_add=True)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -24,23 +165,83 @@ class Sale(models.Model):
     notes = models.TextField(blank=True)
     receipt_printed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sale_date'], name='pos_sale_date_idx'),
+            # Also serves plain customer lookups, so the FK index is dropped
+            models.Index(fields=['customer', 'sale_date'], name='pos_sale_customer_date_idx'),
+            # Store-scoped daily totals; also serves plain store lookups
+            models.Index(fields=['store', 'sale_date'], name='pos_sale_store_date_idx'),
+        ]
+
+    @property
+    def business_date(self):
+        return self.sale_date.date() if self.sale_date else timezone.now().date()
+
     def save(self, *args, **kwargs):
+        check_period_open(self.business_date)
         self.grand_total = self.total_amount - self.discount_amount + self.tax_amount
         if self.payment_method != 'due':
             self.change_given = max(Decimal('0.00'), self.payment_received - self.grand_total)
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        check_period_open(self.business_date)
+        return super().delete(*args, **kwargs)
+
+    def settle(self, tenders, user=None):
+        """Record a checkout's payments once its items are saved.
+
+        ``tenders`` is a list of ``(method, amount, reference)``, e.g. part cash
+        and part card. Change comes out of the cash, and whatever is left unpaid
+        goes on the customer's due ledger (the sale then counts as a due sale).
+        """
+        paid = sum((amount for _, amount, _ in tenders), Decimal('0.00'))
+        change = max(Decimal('0.00'), paid - self.grand_total)
+        if change > sum((amount for method, amount, _ in tenders if method == 'cash'), Decimal('0.00')):
+            raise ValueError('Only cash can be paid over the total.')
+        due = max(Decimal('0.00'), self.grand_total - paid)
+        if due and self.customer_id is None:
+            raise ValueError('Choose a customer to leave part of the sale due.')
+
+        payments = []
+        for method, amount, reference in tenders:
+            if method == 'cash':
+                kept = min(change, amount)
+                amount, change = amount - kept, change - kept
+            if amount:
+                payments.append(Payment(sale=self, amount=amount, payment_method=method, reference=reference))
+        Payment.objects.using(self._state.db).bulk_create(payments)
+
+        self.payment_received = paid
+        self.change_given = max(Decimal('0.00'), paid - self.grand_total)
+        if due:
+            self.payment_method = 'due'
+        elif tenders:
+            self.payment_method = max(tenders, key=lambda tender: tender[1])[0]
+        self.save(update_fields=['payment_received', 'change_given', 'payment_method', 'grand_total'])
+        if due:
+            CustomerLedgerEntry.record(self.customer, due, kind='sale', sale=self, store=self.store, created_by=user)
+        return payments
+
     def __str__(self):
         return f"Sale #{self.id} - {self.sale_date.strftime('%Y-%m-%d %H:%M')}"
 
 class SaleItem(models.Model):
     sale = models.ForeignKey(Sale, related_name='items', on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Also serves plain product lookups, so the FK index is dropped
+            models.Index(fields=['product', 'sale'], name='pos_saleitem_product_sale_idx'),
+        ]
+
     def save(self, *args, **kwargs):
+        check_period_open(self.sale.business_date)
         self.total_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
         
@@ -48,10 +249,12 @@ class SaleItem(models.Model):
         self.sale.total_amount = sum(item.total_price for item in self.sale.items.all())
         self.sale.save()
         
-        # Update stock
+        # Update stock (the shop total, and the branch's share when sold at a branch)
         if self.product.track_stock:
             self.product.current_stock -= self.quantity
             self.product.save()
+            if self.sale.store_id:
+                StoreStock.move(self.product, self.sale.store, -self.quantity)
 
 class Payment(models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE)
@@ -61,34 +264,269 @@ class Payment(models.Model):
     reference = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
 
+
+class CustomerLedgerEntry(models.Model):
+    """One change to a customer's due balance (``Customer.due_balance``).
+
+    A sale left partly or wholly unpaid adds to it, a payment collected at the
+    till takes it down. ``balance`` is the customer's balance after the entry.
+    ``store`` is where the sale was made or the payment taken; a sale's id is
+    only unique within its store's database (see ``sale_database``).
+    """
+    KINDS = [
+        ('opening', 'Opening balance'),
+        ('sale', 'Sale on due'),
+        ('payment', 'Payment collected'),
+    ]
+    TENDERS = [method for method in Sale.PAYMENT_METHODS if method[0] != 'due']
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='ledger_entries', db_index=False)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    # No database constraint: the sale may be in a store's database or archived (same id),
+    # so read it with Sale.objects.using(entry.sale_database) rather than entry.sale
+    sale = models.ForeignKey(Sale, on_delete=models.DO_NOTHING, null=True, blank=True, related_name='+', db_constraint=False)
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    payment_method = models.CharField(max_length=20, choices=TENDERS, blank=True)
+    reference = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'customer ledger entries'
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='pos_ledger_customer_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer} {self.get_kind_display()} {self.amount}"
+
+    @property
+    def sale_database(self):
+        return self.store.database if self.store_id else 'default'
+
+    @classmethod
+    def record(cls, customer, amount, **fields):
+        """Add an entry and move the customer's balance by ``amount`` with it."""
+        with transaction.atomic():
+            # The UPDATE serializes concurrent entries for the customer
+            Customer.objects.filter(pk=customer.pk).update(due_balance=models.F('due_balance') + amount)
+            customer.due_balance = Customer.objects.filter(pk=customer.pk).values_list('due_balance', flat=True).get()
+            return cls.objects.create(customer=customer, amount=amount, balance=customer.due_balance, **fields)
+
+    @classmethod
+    def collect(cls, customer, amount, payment_method, user=None, reference='', notes='', store=None):
+        """Take a payment against what the customer owes; it counts in the day's takings at ``store``."""
+        if amount <= 0:
+            raise ValueError('Enter an amount above zero.')
+        if payment_method not in dict(cls.TENDERS):
+            raise ValueError(f'Unknown payment method {payment_method!r}.')
+        with transaction.atomic():
+            entry = cls.record(
+                customer, -amount, kind='payment', payment_method=payment_method,
+                reference=reference, notes=notes, store=store, created_by=user,
+            )
+            if entry.balance < 0:
+                raise ValueError(f'{customer} owes only {entry.balance + amount}.')
+        return entry
+
 class DailySummary(models.Model):
-    date = models.DateField(unique=True)
+    """A day's totals for the whole shop (``store`` empty) or for one store.
+
+    The shop-wide row is kept current by checkouts; a store's row is written
+    when the day is closed, and open days are computed on the fly.
+    """
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, null=True, blank=True, related_name='daily_summaries')
+    date = models.DateField()
+    sale_count = models.PositiveIntegerField(default=0)
     total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_cash = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_card = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_mobile = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Due payments collected that day; also counted in the cash/card/mobile totals
+    total_collected = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_discount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_profit = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # End-of-day close: once closed the totals above are a frozen snapshot
+    is_closed = models.BooleanField(default=False)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='closed_days')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date'], condition=models.Q(store__isnull=True), name='unique_shop_daily_summary'),
+            models.UniqueConstraint(fields=['store', 'date'], name='unique_store_daily_summary'),
+        ]
+
+    def __str__(self):
+        where = f' {self.store}' if self.store_id else ''
+        return f"{self.date}{where} ({'closed' if self.is_closed else 'open'})"
+
+    @classmethod
+    def is_date_closed(cls, date):
+        # Days are closed for the whole shop at once
+        return cls.objects.filter(date=date, store__isnull=True, is_closed=True).exists()
+
+    @staticmethod
+    def compute_totals(date, store=None):
+        """Aggregate the day's sales (of one store, or all of them), without saving anything."""
+        if store is not None:
+            totals = DailySummary._database_totals(store.database, date, store)
+        else:
+            totals = {}
+            for database in sale_databases():
+                for key, value in DailySummary._database_totals(database, date).items():
+                    totals[key] = totals.get(key, 0) + value
+        return DailySummary._add_collections(totals, date, store)
+
+    @staticmethod
+    def _add_collections(totals, date, store=None):
+        """Count the due payments collected that day in its takings, in one query."""
+        from django.db.models import Q, Sum
+        start, end = day_range(date)
+        entries = CustomerLedgerEntry.objects.filter(kind='payment', created_at__gte=start, created_at__lt=end)
+        if store is not None:
+            entries = entries.filter(store=store)
+        # Collections are stored as negative ledger amounts
+        collected = entries.aggregate(
+            total_collected=Sum('amount'),
+            **{f'total_{method}': Sum('amount', filter=Q(payment_method=method)) for method in ('cash', 'card', 'mobile')},
+        )
+        for key, value in collected.items():
+            totals[key] = totals.get(key, 0) - (value or 0)
+        return totals
+
+    @staticmethod
+    def _database_totals(database, date, store=None):
+        """The day's totals from one database, in three queries (four on a store database).
+
+        Takings per method are split as ``tender_totals`` does.
+        """
+        from django.db.models import Count, Sum
+        start, end = day_range(date)
+        sales = Sale.objects.using(database).filter(sale_date__gte=start, sale_date__lt=end)
+        items = SaleItem.objects.using(database).filter(sale__sale_date__gte=start, sale__sale_date__lt=end)
+        payments = Payment.objects.using(database).filter(sale__sale_date__gte=start, sale__sale_date__lt=end)
+        if store is not None:
+            sales = sales.filter(store=store)
+            items = items.filter(sale__store=store)
+            payments = payments.filter(sale__store=store)
+        tenders = tender_totals(
+            sales, payments,
+            sale_count=Count('id'), total_sales=Sum('grand_total'), total_discount=Sum('discount_amount'),
+        )
+        totals = {
+            key if key.startswith(('sale_', 'total_')) else f'total_{key}': value
+            for key, value in tenders.items()
+        }
+        revenue, cost = item_revenue_and_cost(items, database)
+        totals['total_cost'] = cost
+        totals['total_profit'] = revenue - cost
+        return totals
+
     def update_totals(self):
-        from django.db.models import Sum
-        sales = Sale.objects.filter(sale_date__date=self.date)
-        
-        self.total_sales = sales.aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        self.total_cash = sales.filter(payment_method='cash').aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        self.total_card = sales.filter(payment_method='card').aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        self.total_mobile = sales.filter(payment_method='mobile').aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        self.total_due = sales.filter(payment_method='due').aggregate(Sum('grand_total'))['grand_total__sum'] or 0
-        self.total_discount = sales.aggregate(Sum('discount_amount'))['discount_amount__sum'] or 0
-        
-        # Calculate profit (simplified)
-        profit = 0
-        for sale in sales:
-            for item in sale.items.all():
-                cost = item.product.cost_price * item.quantity
-                profit += (item.total_price - cost)
-        self.total_profit = profit
-        
-        self.save()
\ No newline at end of file
+        if self.is_closed:
+            raise ClosedPeriodError(f'{self.date} is closed; reopen the day before changing its totals.')
+        for field, value in self.compute_totals(self.date, self.store).items():
+            setattr(self, field, value)
+        self.save()
+
+    @classmethod
+    def close_day(cls, date, user=None):
+        """Finalize a day's totals and freeze them against further edits.
+
+        Only past days can be closed; today is still taking sales.
+        """
+        from django.utils import timezone
+        if date >= timezone.now().date():
+            raise ValueError(f'{date} is not over yet; only past days can be closed.')
+        with transaction.atomic():
+            shop, created = cls.objects.select_for_update().get_or_create(date=date, store=None)
+            if shop.is_closed:
+                return shop
+            # Each store's totals are frozen alongside the shop's
+            summaries = [shop] + [cls.objects.get_or_create(date=date, store=store)[0] for store in Store.objects.all()]
+            closed_at = timezone.now()
+            for summary in summaries:
+                summary.update_totals()
+                summary.is_closed = True
+                summary.closed_at = closed_at
+                summary.closed_by = user
+                summary.save(update_fields=['is_closed', 'closed_at', 'closed_by'])
+        return shop
+
+    def reopen(self):
+        """Adjustment path: reopen a closed day so corrections can be made."""
+        from .archive import has_archived_sales
+        # Closing it again would recompute the totals without the archived sales
+        if has_archived_sales(self.date):
+            raise ClosedPeriodError(f'Sales for {self.date} have been archived and can no longer be changed.')
+        summaries = [self]
+        if self.store_id is None:
+            summaries += list(DailySummary.objects.filter(date=self.date, store__isnull=False, is_closed=True))
+        for summary in summaries:
+            summary.is_closed = False
+            summary.closed_at = None
+            summary.closed_by = None
+            summary.save(update_fields=['is_closed', 'closed_at', 'closed_by'])
+
+
+# Cold storage: sales of closed days older than SALES_ARCHIVE_AFTER_DAYS are
+# moved here, ids and all, by `manage.py archive_sales` (see pos.archive). The
+# DailySummary rows of those days stay where they are.
+
+class ArchivedSale(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_sales', db_index=False)
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    sale_date = models.DateTimeField()
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    grand_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=20, choices=Sale.PAYMENT_METHODS, default='cash')
+    payment_received = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    change_given = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    sale_person = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    notes = models.TextField(blank=True)
+    receipt_printed = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sale_date'], name='pos_archsale_date_idx'),
+            models.Index(fields=['customer', 'sale_date'], name='pos_archsale_customer_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived sale #{self.id} - {self.sale_date.strftime('%Y-%m-%d %H:%M')}"
+
+
+class ArchivedSaleItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'sale'], name='pos_architem_product_sale_idx'),
+        ]
+
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, related_name='payments', on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_method = models.CharField(max_length=20, choices=Sale.PAYMENT_METHODS)
+    payment_date = models.DateTimeField()
+    reference = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
@@ -1,3 +1,621 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from door_shop.benchmarking import bench_login, compare_to_baseline, latency_summary, percentile, set_sqlite_locking
+from door_shop.testing import QueryBudgetMixin, QueryPlanMixin, StoreDatabaseMixin, create_shop_data
+from inventory.models import Customer, Product, Store, StoreStock
+from pos import urls as pos_urls, views
+from pos.management.commands.bench_checkout import Command as BenchCheckoutCommand
+from pos.models import (
+    ArchivedSale, ArchivedSaleItem, ClosedPeriodError, CustomerLedgerEntry, DailySummary, Payment, Sale, SaleItem,
+)
+from reports.builders import build_profit_report, build_sales_report
+from reports.models import CustomerSegment
+from reports.segments import refresh_customer_segments
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+class PosQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def test_daily_sales_uses_sale_date_index(self):
+        url = reverse('daily_sales') + f'?date={timezone.now().date().isoformat()}'
+        self.assertUsesIndex(url, 'pos_sale', 'pos_sale_date_idx')
+        self.assertNoFullScan(url, 'pos_sale')
+
+
+class PosQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlpatterns = pos_urls.urlpatterns
+    query_budgets = {
+        'pos_dashboard': 4,
+        'get_product_details': 5,
+        'create_sale': 4,
+        'search_or_create_customer': 2,
+        'get_customer_by_phone': 3,
+        'print_receipt': 8,
+        'daily_sales': 11,
+        'close_day': 2,
+        'reopen_day': 2,
+        'select_store': 2,
+        'customer_due': 3,
+        'create_sale POST': 26,
+        'close_day POST': 35,
+        'reopen_day POST': 8,
+        'select_store POST': 6,
+        'customer_due POST': 12,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        today = timezone.now().date()
+        cls.closed_day, cls.open_day = today - timedelta(days=2), today - timedelta(days=1)
+        DailySummary.close_day(cls.closed_day)
+        CustomerLedgerEntry.record(cls.data['customer'], Decimal('500.00'), kind='opening')
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+        self.url_kwargs = {
+            'get_product_details': {'product_id': self.data['product'].pk},
+            'get_customer_by_phone': {'phone': self.data['customer'].phone},
+            'print_receipt': {'sale_id': self.data['sale'].pk},
+            'customer_due': {'customer_id': self.data['customer'].pk},
+        }
+        self.url_query = {
+            'daily_sales': f'?date={timezone.now().date().isoformat()}',
+        }
+        self.url_requests = {
+            'create_sale': {'method': 'post', 'content_type': 'application/json', 'data': {
+                'customer_id': self.data['customer'].pk,
+                'items': [{'product_id': self.data['product'].pk, 'quantity': '2', 'unit_price': '150.00'}],
+                'payments': [{'method': 'cash', 'amount': '200'}, {'method': 'card', 'amount': '100'}],
+            }},
+            'close_day': {'method': 'post', 'data': {'date': self.open_day.isoformat()}},
+            'reopen_day': {'method': 'post', 'data': {'date': self.closed_day.isoformat()}},
+            'select_store': {'method': 'post', 'data': {'store': self.data['branch'].pk}},
+            'customer_due': {'method': 'post', 'content_type': 'application/json', 'data': {
+                'amount': '50', 'payment_method': 'cash',
+            }},
+        }
+
+
+class ProductDetailsConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.data['user'])
+        self.url = reverse('get_product_details', args=[self.data['product'].pk])
+
+    def test_unchanged_product_is_not_modified_without_reading_it(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if '"inventory_product"' in q['sql']])
+
+    def test_saving_the_product_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        product = self.data['product']
+        product.current_stock -= 1
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # The till sells from the default store, which holds all but the branch's share
+        branch_share = StoreStock.objects.get(store=self.data['branch'], product=product).quantity
+        self.assertEqual(Decimal(response.json()['current_stock']), product.current_stock - branch_share)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_queryset_updates_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.data['product'].pk).update(selling_price=Decimal('175.00'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['selling_price'], '175.00')
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_stay_coroutines(self):
+        self.assertTrue(iscoroutinefunction(views.get_product_details))
+        self.assertTrue(iscoroutinefunction(views.get_customer_by_phone))
+
+    async def test_anonymous_requests_are_sent_to_login(self):
+        url = reverse('get_customer_by_phone', args=[self.data['customer'].phone])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], f"{settings.LOGIN_URL}?next={url}")
+
+    async def test_lookups_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.data['user'])
+        response = await self.async_client.get(reverse('get_customer_by_phone', args=['0180-000-0000']))
+        self.assertEqual(response.json()['customer']['name'], 'Rahim')
+        response = await self.async_client.get(reverse('get_customer_by_phone', args=['0199']))
+        self.assertEqual(response.json(), {'success': False, 'error': 'Customer not found'})
+
+        response = await self.async_client.get(reverse('get_product_details', args=[self.data['product'].pk]))
+        self.assertEqual(response.json()['name'], 'Oak Door')
+        response = await self.async_client.get(reverse('get_product_details', args=[self.data['product'].pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_lookups_under_wsgi(self):
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('get_customer_by_phone', args=[self.data['customer'].phone]))
+        self.assertEqual(response.json()['customer']['id'], self.data['customer'].pk)
+
+
+class StoreCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.data['user'])
+        self.client.post(reverse('select_store'), {'store': self.data['branch'].pk})
+
+    def checkout(self, quantity):
+        payload = {
+            'items': [{'product_id': self.data['product'].pk, 'quantity': str(quantity), 'unit_price': '150.00'}],
+            'payment_received': '10000',
+        }
+        return self.client.post(reverse('create_sale'), json.dumps(payload), content_type='application/json').json()
+
+    def test_branch_sells_only_its_own_stock(self):
+        product = self.data['product']
+        total = product.current_stock
+        self.assertFalse(self.checkout(21)['success'])  # the branch holds 20
+        self.assertTrue(self.checkout(5)['success'])
+        product.refresh_from_db()
+        self.assertEqual(product.current_stock, total - 5)
+        self.assertEqual(StoreStock.objects.get(store=self.data['branch'], product=product).quantity, 15)
+
+    def test_closing_a_day_freezes_each_store_total(self):
+        self.checkout(2)
+        # Only past days can be closed
+        Sale.objects.update(sale_date=timezone.now() - timedelta(days=1))
+        today = timezone.now().date() - timedelta(days=1)
+        shop = DailySummary.close_day(today)
+        branch = DailySummary.objects.get(date=today, store=self.data['branch'])
+        self.assertTrue(branch.is_closed)
+        self.assertEqual(branch.sale_count, 1)
+        self.assertEqual(branch.total_sales, Decimal('300.00'))
+        self.assertEqual(shop.sale_count, 4)
+        response = self.client.get(reverse('daily_sales'), {'date': today.isoformat(), 'store': 'branch'})
+        self.assertEqual(len(response.context['sales']), 1)
+
+
+class ClosedPeriodTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        cls.yesterday = timezone.now().date() - timedelta(days=1)
+        Sale.objects.update(sale_date=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def test_past_days_close_and_today_does_not(self):
+        today = timezone.now().date()
+        self.client.post(reverse('close_day'), {'date': today.isoformat()})
+        self.assertFalse(DailySummary.objects.filter(date=today, is_closed=True).exists())
+        with self.assertRaises(CommandError):
+            call_command('close_day', date=today.isoformat(), stdout=StringIO())
+
+        self.client.post(reverse('close_day'), {'date': self.yesterday.isoformat()})
+        summary = DailySummary.objects.get(date=self.yesterday, store__isnull=True)
+        self.assertTrue(summary.is_closed)
+        self.assertEqual(summary.closed_by, self.data['user'])
+        self.assertEqual((summary.sale_count, summary.total_sales), (3, Decimal('450.00')))
+
+    def test_closed_days_refuse_edits_until_reopened(self):
+        DailySummary.close_day(self.yesterday)
+        sale = self.data['sale']
+        sale.refresh_from_db()
+        sale.notes = 'late change'
+        with self.assertRaises(ClosedPeriodError):
+            sale.save()
+        with self.assertRaises(ClosedPeriodError):
+            SaleItem(sale=sale, product=self.data['product'], quantity=Decimal('1'), unit_price=Decimal('1')).save()
+        with self.assertRaises(ClosedPeriodError):
+            sale.delete()
+
+        self.client.post(reverse('reopen_day'), {'date': self.yesterday.isoformat()})
+        self.assertFalse(DailySummary.is_date_closed(self.yesterday))
+        sale.save()
+        self.assertEqual(Sale.objects.get(pk=sale.pk).notes, 'late change')
+
+    def test_a_checkout_checks_the_day_once(self):
+        payload = {
+            'items': [{'product_id': self.data['product'].pk, 'quantity': '1', 'unit_price': '150.00'}] * 3,
+            'payment_received': '500',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.post(reverse('create_sale'), json.dumps(payload), content_type='application/json').json()
+        self.assertTrue(result['success'])
+        checks = [q['sql'] for q in queries if q['sql'].startswith('SELECT 1 AS "a" FROM "pos_dailysummary"')]
+        self.assertEqual(len(checks), 1)
+
+        # A day closed behind the till's back still stops the checkout
+        DailySummary.objects.filter(date=timezone.now().date(), store__isnull=True).update(is_closed=True)
+        result = self.client.post(reverse('create_sale'), json.dumps(payload), content_type='application/json').json()
+        self.assertFalse(result['success'])
+
+
+class SalesArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        cls.day = timezone.now().date() - timedelta(days=400)
+        Sale.objects.update(sale_date=timezone.now() - timedelta(days=400))
+        cls.summary = DailySummary.close_day(cls.day)
+
+    def test_closed_days_move_to_the_archive_and_reports_still_see_them(self):
+        sales, items = Sale.objects.count(), SaleItem.objects.count()
+        before = build_sales_report(self.day, self.day)
+        top_products = list(before['top_products'])
+        profit = build_profit_report(self.day, self.day)['total_profit']
+
+        call_command('archive_sales', batch_size=2, stdout=StringIO())
+
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(ArchivedSale.objects.count(), sales)
+        self.assertEqual(ArchivedSaleItem.objects.count(), items)
+        self.assertEqual(DailySummary.objects.get(pk=self.summary.pk).total_sales, self.summary.total_sales)
+        after = build_sales_report(self.day, self.day)
+        self.assertEqual(after['total_sales'], before['total_sales'])
+        self.assertEqual(len(after['sales']), sales)
+        self.assertEqual(after['top_products'], top_products)
+        self.assertEqual(build_profit_report(self.day, self.day)['total_profit'], profit)
+
+        with self.assertRaises(ClosedPeriodError):
+            self.summary.reopen()
+
+    def test_archived_sales_still_count_for_their_customer(self):
+        customer = self.data['customer']
+        self.client.force_login(self.data['user'])
+
+        def customer_view():
+            refresh_customer_segments()
+            segment = CustomerSegment.objects.get(customer=customer)
+            listed = next(c for c in self.client.get(reverse('customer_list')).context['customers'] if c.pk == customer.pk)
+            return (
+                segment.frequency, segment.monetary, segment.recency_days, segment.segment,
+                listed.sales_count, listed.total_spent, listed.last_purchase_date,
+            )
+
+        before = customer_view()
+        self.assertEqual(before[0], 2)
+        call_command('archive_sales', stdout=StringIO())
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(customer_view(), before)
+
+    def test_open_and_recent_days_are_left_alone(self):
+        call_command('archive_sales', older_than=500, stdout=StringIO())
+        self.summary.reopen()
+        call_command('archive_sales', stdout=StringIO())
+        self.assertFalse(ArchivedSale.objects.exists())
+
+
+class SplitTenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def checkout(self, payments, customer=True):
+        payload = {
+            'customer_id': self.data['customer'].pk if customer else None,
+            'items': [{'product_id': self.data['product'].pk, 'quantity': '2', 'unit_price': '150.00'}],
+            'payments': payments,
+        }
+        return self.client.post(reverse('create_sale'), json.dumps(payload), content_type='application/json').json()
+
+    def test_split_payment_leaves_the_rest_on_the_customer_ledger(self):
+        result = self.checkout([{'method': 'cash', 'amount': '100'}, {'method': 'card', 'amount': '150'}])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['balance_due'], '50.00')
+        sale = Sale.objects.get(pk=result['sale_id'])
+        self.assertEqual(sale.payment_method, 'due')
+        self.assertEqual(
+            sorted(Payment.objects.filter(sale=sale).values_list('payment_method', 'amount')),
+            [('card', Decimal('150.00')), ('cash', Decimal('100.00'))],
+        )
+        entry = CustomerLedgerEntry.objects.get(sale=sale)
+        self.assertEqual((entry.kind, entry.amount, entry.balance), ('sale', Decimal('50.00'), Decimal('50.00')))
+
+        # Card can't be overpaid, and walk-ins can't leave anything due
+        self.assertFalse(self.checkout([{'method': 'card', 'amount': '400'}])['success'])
+        self.assertFalse(self.checkout([{'method': 'cash', 'amount': '100'}], customer=False)['success'])
+        self.assertEqual(Sale.objects.filter(pk__gt=sale.pk).count(), 0)
+
+        # Change comes out of the cash
+        result = self.checkout([{'method': 'card', 'amount': '200'}, {'method': 'cash', 'amount': '500'}])
+        self.assertEqual(result['change_given'], '400.00')
+        self.assertEqual(Payment.objects.get(sale_id=result['sale_id'], payment_method='cash').amount, Decimal('100.00'))
+
+    def test_collecting_a_payment_brings_the_balance_down(self):
+        self.checkout([])
+        url = reverse('customer_due', args=[self.data['customer'].pk])
+        self.assertEqual(self.client.get(url).json()['balance_due'], '300.00')
+
+        result = self.client.post(url, json.dumps({'amount': '120', 'payment_method': 'mobile'}), content_type='application/json').json()
+        self.assertEqual(result['balance_due'], '180.00')
+        result = self.client.post(url, json.dumps({'amount': '500', 'payment_method': 'cash'}), content_type='application/json').json()
+        self.assertFalse(result['success'])
+        self.assertEqual(Customer.objects.get(pk=self.data['customer'].pk).due_balance, Decimal('180.00'))
+        self.assertEqual(self.client.get(url).json()['balance_due'], '180.00')
+
+    def test_day_totals_follow_the_payments(self):
+        today = timezone.now().date()
+        before = DailySummary.compute_totals(today)
+        result = self.checkout([{'method': 'cash', 'amount': '100'}, {'method': 'card', 'amount': '150'}])
+        entry = CustomerLedgerEntry.objects.get(sale_id=result['sale_id'])
+        self.assertEqual(entry.store, Store.default())
+        self.assertEqual(entry.sale_database, 'default')
+        url = reverse('customer_due', args=[self.data['customer'].pk])
+        self.client.post(url, json.dumps({'amount': '20', 'payment_method': 'cash'}), content_type='application/json')
+
+        after = DailySummary.compute_totals(today)
+        change = {key: after[key] - before[key] for key in ('total_sales', 'total_cash', 'total_card', 'total_due', 'total_collected')}
+        self.assertEqual(change, {
+            'total_sales': Decimal('300.00'),
+            # The sale's cash plus the due collected at the till
+            'total_cash': Decimal('120.00'),
+            'total_card': Decimal('150.00'),
+            'total_due': Decimal('50.00'),
+            'total_collected': Decimal('20.00'),
+        })
+        self.assertEqual(DailySummary.compute_totals(today, Store.default())['total_collected'], Decimal('20.00'))
+
+
+class ReadViewBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentiles_use_the_nearest_rank(self):
+        values = [0.001 * i for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), values[49])
+        self.assertEqual(percentile(values, 99), values[98])
+        self.assertEqual(percentile([0.5], 95), 0.5)
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(
+            latency_summary([0.004, 0.001, 0.002, 0.003], elapsed=2),
+            {'count': 4, 'p50_ms': 2.0, 'p95_ms': 4.0, 'p99_ms': 4.0, 'max_ms': 4.0, 'per_second': 2.0},
+        )
+        self.assertEqual(latency_summary([])['max_ms'], 0.0)
+
+    def test_slower_p95_or_more_queries_is_a_regression(self):
+        baseline = {
+            'steady': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 5},
+            'slower': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 5},
+            'chattier': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 5},
+        }
+        results = {
+            'steady': {'p50_ms': 11.0, 'p95_ms': 21.0, 'queries': 5},
+            'slower': {'p50_ms': 10.0, 'p95_ms': 25.0, 'queries': 5},
+            'chattier': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 6},
+            'new_view': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 5},
+        }
+        rows = {row['name']: row for row in compare_to_baseline(results, baseline, threshold=10.0)}
+        self.assertEqual(set(rows), {'steady', 'slower', 'chattier'})
+        self.assertEqual((rows['steady']['p50_change'], rows['steady']['p95_change']), (10.0, 5.0))
+        self.assertFalse(rows['steady']['regression'])
+        self.assertTrue(rows['slower']['regression'])
+        self.assertEqual(rows['chattier']['queries_change'], 1)
+        self.assertTrue(rows['chattier']['regression'])
+
+    def test_command_writes_results_and_compares_with_a_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            out = StringIO()
+            call_command(
+                'bench_read_views', iterations=2, warmup=0, views='^(daily_sales|pos_dashboard)$',
+                json_path=path, stdout=out, stderr=StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)
+            self.assertEqual(set(results['views']), {'daily_sales', 'pos_dashboard'})
+            daily = results['views']['daily_sales']
+            self.assertEqual(daily['status'], 200)
+            self.assertEqual(daily['count'], 2)
+            self.assertTrue(daily['url'].startswith(reverse('daily_sales') + '?date='))
+            self.assertGreater(daily['queries'], 0)
+            self.assertEqual(results['meta']['sales'], Sale.objects.count())
+
+            # A baseline that needed fewer queries flags the view
+            results['views']['daily_sales']['queries'] -= 1
+            results['views']['pos_dashboard']['p95_ms'] = 1e6
+            with open(path, 'w') as f:
+                json.dump(results, f)
+            out = StringIO()
+            call_command(
+                'bench_read_views', iterations=1, warmup=0, views='^(daily_sales|pos_dashboard)$',
+                baseline=path, stdout=out, stderr=StringIO(),
+            )
+        lines = {line.split()[0]: line for line in out.getvalue().splitlines()[-4:] if line}
+        self.assertIn('REGRESSION', lines['daily_sales'])
+        self.assertNotIn('REGRESSION', lines['pos_dashboard'])
+        self.assertIn('1 view(s) regressed', out.getvalue())
+        self.assertFalse(User.objects.filter(username='bench').exists())
+
+    def test_bench_login_leaves_no_user_or_session_behind(self):
+        client = Client()
+        with bench_login(client) as user:
+            self.assertTrue(user.is_staff)
+            self.assertFalse(user.is_superuser)
+            self.assertFalse(user.has_usable_password())
+            self.assertEqual(client.get(reverse('get_product_details', args=[self.data['product'].pk])).status_code, 200)
+        self.assertFalse(User.objects.filter(username='bench').exists())
+        self.assertFalse(Session.objects.exists())
+
+        # An existing user, or one the run's rows point at, is kept
+        with bench_login(client, username='tester'):
+            pass
+        with bench_login(client, keep_user=True):
+            pass
+        self.assertEqual(User.objects.filter(username__in=['tester', 'bench']).count(), 2)
+
+    def test_command_refuses_an_empty_selection(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_read_views', views='^no_such_view$', stdout=StringIO())
+
+
+class CheckoutBenchmarkTests(TransactionTestCase):
+    # The tills post from their own threads, so they need committed rows; the
+    # default store comes from a data migration and is restored after each flush
+    serialized_rollback = True
+
+    def setUp(self):
+        cache.clear()
+        self.data = create_shop_data()
+
+    def test_concurrent_tills_never_oversell(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'checkout.json')
+            call_command(
+                'bench_checkout', tills=2, sales=3, products=1, stock=4, json_path=path, stdout=StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)
+        outcomes = results['outcomes']
+        self.assertEqual(sum(outcomes.values()), 6)
+        self.assertEqual(results['latency']['count'], 6)
+        self.assertGreater(outcomes['out_of_stock'], 0)  # 4 doors can't cover six carts
+        self.assertEqual(outcomes['other_errors'], 0, results['error_samples'])
+        consistency = results['consistency']
+        self.assertTrue(consistency['ok'], consistency)
+        self.assertEqual(consistency['new_sales'], outcomes['ok'])
+        # The bench user stays with the sales it made, but its session is gone
+        self.assertEqual(Sale.objects.filter(sale_person__username='bench').count(), outcomes['ok'])
+        self.assertFalse(Session.objects.exists())
+        product = Product.objects.get(pk=self.data['product'].pk)
+        self.assertGreaterEqual(product.current_stock, 0)
+        self.assertEqual(results['config']['database'], 'sqlite')
+
+    def test_carts_and_outcomes(self):
+        command = BenchCheckoutCommand()
+        pool = list(Product.objects.all())
+        options = {'tills': 2, 'sales': 4, 'max_items': 3, 'seed': 7}
+        carts = command.build_carts(pool, options)
+        self.assertEqual(carts, command.build_carts(pool, options))
+        self.assertEqual([len(till) for till in carts], [4, 4])
+        cart = carts[0][0]
+        self.assertEqual(cart['items'][0]['product_id'], self.data['product'].pk)
+        self.assertEqual(Decimal(cart['payment_received']), sum(
+            Decimal(item['quantity']) * Decimal(item['unit_price']) for item in cart['items']
+        ))
+
+        outcomes = [
+            ([0.01, 0.02], ['ok', 'database is locked'], 0, 1),
+            ([0.03, 0.04], ['Not enough stock for Oak Door', 'Boom'], 0, 1),
+        ]
+        summary = command.summarize(outcomes, elapsed=2)
+        self.assertEqual(summary['outcomes'], {'ok': 1, 'out_of_stock': 1, 'lock_errors': 1, 'other_errors': 1})
+        self.assertEqual(summary['error_samples'], {'Boom': 1})
+        self.assertEqual(summary['sales_per_second'], 0.5)
+
+        # A stock change no sale accounts for is a lost update
+        product = self.data['product']
+        start = {product.pk: product.current_stock}
+        last_sale_id = Sale.objects.latest('id').id
+        Product.objects.filter(pk=product.pk).update(current_stock=product.current_stock - 1)
+        consistency = command.check_consistency(start, last_sale_id, successful=0)
+        self.assertFalse(consistency['ok'])
+        self.assertIn(product.pk, consistency['mismatched_stock'])
+
+    def test_locking_options_apply_to_new_connections(self):
+        with mock.patch.dict(connections.settings['default'], {'OPTIONS': {}}):
+            set_sqlite_locking('IMMEDIATE', 2500)
+            options = connections.settings['default']['OPTIONS']
+            self.assertEqual(options['transaction_mode'], 'IMMEDIATE')
+            self.assertEqual(options['timeout'], 2.5)
+            self.assertEqual(options['pragmas'], {'busy_timeout': 2500})
+
+    def test_refuses_a_closed_day_or_an_empty_shop(self):
+        DailySummary.objects.create(date=timezone.now().date(), is_closed=True)
+        with self.assertRaisesMessage(CommandError, 'Today is closed'):
+            call_command('bench_checkout', stdout=StringIO())
+        DailySummary.objects.all().delete()
+        Product.objects.update(track_stock=False)
+        with self.assertRaisesMessage(CommandError, 'No stocked products'):
+            call_command('bench_checkout', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The store database is an in-memory SQLite database')
+class StoreReceiptTests(StoreDatabaseMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        # Sale #1 exists on default too: ids only are unique within a database
+        cls.branch_sales = []
+        for sale_id in (1, 50):
+            sale = Sale(id=sale_id, store=cls.data['branch'], sale_person=cls.data['user'])
+            sale.save()
+            SaleItem(sale=sale, product=cls.data['product'], quantity=Decimal('2'), unit_price=Decimal('150.00')).save()
+            cls.branch_sales.append(sale)
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def receipt(self, sale_id, **query):
+        return self.client.get(reverse('print_receipt', args=[sale_id]), query)
+
+    def test_receipts_come_from_the_sale_s_store_database(self):
+        # Only the branch has #50, whichever store the till sells from
+        response = self.receipt(50)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sale']._state.db, 'store_branch')
+        self.assertTrue(Sale.objects.using('store_branch').get(pk=50).receipt_printed)
+
+        # #1 is the till's own sale, unless the link names the branch
+        self.assertEqual(self.receipt(1).context['sale']._state.db, 'default')
+        response = self.receipt(1, store=self.data['branch'].pk)
+        self.assertEqual((response.context['sale']._state.db, response.context['sale'].grand_total), ('store_branch', Decimal('300.00')))
+        self.client.post(reverse('select_store'), {'store': self.data['branch'].pk})
+        self.assertEqual(self.receipt(1).context['sale']._state.db, 'store_branch')
+
+        self.assertEqual(self.receipt(99).status_code, 404)
+
+    def test_daily_sales_links_name_the_store(self):
+        response = self.client.get(reverse('daily_sales'), {'date': timezone.now().date().isoformat()})
+        self.assertContains(response, f"{reverse('print_receipt', args=[50])}?store={self.data['branch'].pk}")
@@ -7,6 +7,10 @@ urlpatterns = [
     path('api/create-sale/', views.create_sale, name='create_sale'),
     path('api/customer/search-create/', views.search_or_create_customer, name='search_or_create_customer'),
     path('api/customer/by-phone/<str:phone>/', views.get_customer_by_phone, name='get_customer_by_phone'),
+    path('api/customer/<int:customer_id>/due/', views.customer_due, name='customer_due'),
     path('receipt/<int:sale_id>/', views.print_receipt, name='print_receipt'),
     path('daily-sales/', views.daily_sales_report, name='daily_sales'),
+    path('daily-sales/close/', views.close_day, name='close_day'),
+    path('daily-sales/reopen/', views.reopen_day, name='reopen_day'),
+    path('store/', views.select_store, name='select_store'),
 ]
\ No newline at end of file
@@ -1,91 +1,80 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from .models import Sale, SaleItem, DailySummary
+from django.db.models import F
+from .models import (
+    ClosedPeriodError, CustomerLedgerEntry, Sale, SaleItem, DailySummary, day_range, period_checked, sale_databases,
+    with_shared,
+)
 from .forms import SaleForm, SaleItemForm
-from inventory.models import Product, Customer
+from inventory.models import Product, Customer, Store, StoreStock
+from django.contrib import messages
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from door_shop.decorators import async_login_required
+from door_shop.events import publish
+from door_shop.versioning import arow_version, table_version
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from contextlib import nullcontext
 import json
+from datetime import datetime
+from functools import partial
 from decimal import Decimal
 from inventory.forms import CustomerForm
 
-@login_required
-def get_product_details(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    return JsonResponse({
-        'id': product.id,
-        'name': product.name,
-        'selling_price': str(product.selling_price),
-        'current_stock': str(product.current_stock),
-        'track_stock': product.track_stock,
-        'min_stock_level': str(product.min_stock_level)
-    })
+def current_store(request):
+    """The store this till sells from: the one picked for the session, else the default store."""
+    stores = list(Store.objects.cached())
+    store_id = request.session.get('store_id')
+    picked = [store for store in stores if store.pk == store_id and store.is_active]
+    return picked[0] if picked else Store.default()
 
 @login_required
-@csrf_exempt
-@transaction.atomic
-def create_sale(request):
+def select_store(request):
     if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            
-            # Validate stock before creating sale
-            for item_data in data.get('items', []):
-                product = Product.objects.get(id=item_data['product_id'])
-                quantity = Decimal(item_data['quantity'])
-                
-                if product.track_stock and quantity > product.current_stock:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Not enough stock for {product.name}. Available: {product.current_stock}'
-                    })
-            
-            # Create sale
-            sale = Sale(
-                customer_id=data.get('customer_id'),
-                discount_amount=Decimal(data.get('discount_amount', 0)),
-                payment_method=data.get('payment_method', 'cash'),
-                payment_received=Decimal(data.get('payment_received', 0)),
-                sale_person=request.user,
-                notes=data.get('notes', '')
-            )
-            sale.save()
-            
-            # Add sale items and update stock
-            for item_data in data.get('items', []):
-                product = Product.objects.get(id=item_data['product_id'])
-                quantity = Decimal(item_data['quantity'])
-                
-                sale_item = SaleItem(
-                    sale=sale,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=Decimal(item_data['unit_price'])
-                )
-                sale_item.save()
-                
-                # Update product stock
-                if product.track_stock:
-                    product.current_stock -= quantity
-                    product.save()
-            
-            # Update daily summary
-            date = sale.sale_date.date()
-            daily_summary, created = DailySummary.objects.get_or_create(date=date)
-            daily_summary.update_totals()
-            
-            return JsonResponse({
-                'success': True,
-                'sale_id': sale.id,
-                'grand_total': str(sale.grand_total),
-                'change_given': str(sale.change_given)
-            })
-            
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)})
-    
-    return JsonResponse({'success': False, 'error': 'Invalid request method'})
+        store = get_object_or_404(Store, pk=request.POST.get('store'), is_active=True)
+        request.session['store_id'] = store.pk
+        messages.success(request, f'This till now sells from {store.name}.')
+    return redirect(request.POST.get('next') or 'pos_dashboard')
+
+@async_login_required
+async def get_product_details(request, product_id):
+    # Tills poll this: an unchanged product is answered 304 from the cached version alone.
+    # Transfers and branch sales save the product too, so its version covers store stock.
+    try:
+        version, product = await arow_version(Product.objects.all(), product_id)
+    except Product.DoesNotExist:
+        raise Http404('Product not found')
+    store = await sync_to_async(current_store)(request)
+    etag = f'"product-{product_id}-{store.pk if store else 0}-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if product is None:
+            try:
+                product = await Product.objects.aget(id=product_id)
+            except Product.DoesNotExist:
+                raise Http404('Product not found')
+        stock = product.current_stock
+        if store is not None:
+            stock = (await sync_to_async(store.stock_levels)([product]))[product.pk]
+        response = JsonResponse({
+            'id': product.id,
+            'name': product.name,
+            'selling_price': str(product.selling_price),
+            'current_stock': str(stock),
+            'track_stock': product.track_stock,
+            'min_stock_level': str(product.min_stock_level)
+        })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(version)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 @csrf_exempt
@@ -116,7 +105,8 @@ def search_or_create_customer(request):
                         'name': customer.name,
                         'phone': customer.phone,
                         'email': customer.email or '',
-                        'address': customer.address or ''
+                        'address': customer.address or '',
+                        'balance_due': str(customer.due_balance),
                     },
                     'exists': True
                 })
@@ -139,7 +129,8 @@ def search_or_create_customer(request):
                         'name': customer.name,
                         'phone': customer.phone,
                         'email': customer.email or '',
-                        'address': customer.address or ''
+                        'address': customer.address or '',
+                        'balance_due': str(customer.due_balance),
                     },
                     'exists': False,
                     'message': 'New customer created successfully'
@@ -153,14 +144,15 @@ def search_or_create_customer(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
-@login_required
-def get_customer_by_phone(request, phone):
+@async_login_required
+async def get_customer_by_phone(request, phone):
     """Get customer details by phone number"""
     try:
         # Clean phone number
         phone = phone.replace(' ', '').replace('-', '').replace('+', '')
         
-        customer = Customer.objects.get(phone=phone)
+        customer = await Customer.objects.select_related('segment').aget(phone=phone)
+        segment = customer.segment if hasattr(customer, 'segment') else None
         return JsonResponse({
             'success': True,
             'customer': {
@@ -168,7 +160,10 @@ def get_customer_by_phone(request, phone):
                 'name': customer.name,
                 'phone': customer.phone,
                 'email': customer.email or '',
-                'address': customer.address or ''
+                'address': customer.address or '',
+                'balance_due': str(customer.due_balance),
+                'segment': segment.segment if segment else None,
+                'segment_label': segment.get_segment_display() if segment else None,
             }
         })
     except Customer.DoesNotExist:
@@ -184,64 +179,131 @@ def get_customer_by_phone(request, phone):
 
 @login_required
 def pos_dashboard(request):
+    store = current_store(request)
     products = Product.objects.all()
+    if store is not None:
+        products = store.with_stock(products)
+    else:
+        products = products.annotate(store_stock=F('current_stock'))
     customers = Customer.objects.all()
     return render(request, 'pos/dashboard.html', {
         'products': products,
-        'customers': customers
+        'customers': customers,
+        'store': store,
+        'stores': [s for s in Store.objects.cached() if s.is_active],
+        'grid_version': f'{store.pk if store else 0}-{table_version(Product, StoreStock)}',
+        'fragment_ttl': settings.FRAGMENT_CACHE_TTL,
     })
 
-@login_required
-def get_product_details(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    return JsonResponse({
-        'id': product.id,
-        'name': product.name,
-        'selling_price': str(product.selling_price),
-        'current_stock': str(product.current_stock),
-        'track_stock': product.track_stock
-    })
+def _checkout_tenders(data):
+    """``(method, amount, reference)`` for each way a checkout is paid.
+
+    Split payments come as ``payments: [{"method": "cash", "amount": "500"}, ...]``;
+    a single ``payment_method`` with ``payment_received`` is one tender (none for due).
+    """
+    if 'payments' in data:
+        rows = data['payments']
+    elif data.get('payment_method', 'cash') == 'due':
+        rows = []
+    else:
+        rows = [{'method': data.get('payment_method', 'cash'), 'amount': data.get('payment_received', 0)}]
+    tenders = []
+    for row in rows:
+        if row.get('method') not in dict(CustomerLedgerEntry.TENDERS):
+            raise ValueError(f"Unknown payment method {row.get('method')!r}.")
+        amount = Decimal(str(row.get('amount') or 0))
+        if amount < 0:
+            raise ValueError('Payment amounts cannot be negative.')
+        if amount:
+            tenders.append((row['method'], amount, row.get('reference', '')))
+    return tenders
 
 @login_required
 @csrf_exempt
-@transaction.atomic
 def create_sale(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
+            items = data.get('items', [])
             
-            # Create sale
-            sale = Sale(
-                customer_id=data.get('customer_id'),
-                discount_amount=Decimal(data.get('discount_amount', 0)),
-                payment_method=data.get('payment_method', 'cash'),
-                payment_received=Decimal(data.get('payment_received', 0)),
-                sale_person=request.user,
-                notes=data.get('notes', '')
-            )
-            sale.save()
-            
-            # Add sale items
-            for item_data in data.get('items', []):
-                product = Product.objects.get(id=item_data['product_id'])
-                sale_item = SaleItem(
-                    sale=sale,
-                    product=product,
-                    quantity=Decimal(item_data['quantity']),
-                    unit_price=Decimal(item_data['unit_price'])
+            # Rolls back on any error below, so a failed checkout never leaves half a sale.
+            # A store with its own database gets its sale rows written there.
+            store = current_store(request)
+            sales_db = store.database if store else 'default'
+            with transaction.atomic(), (transaction.atomic(using=sales_db) if sales_db != 'default' else nullcontext()), \
+                    period_checked(timezone.now().date()):
+                # Every save below is to today's sales, so the closed-day check runs once
+                # Lock the cart's products (in id order, so two tills can't deadlock)
+                # and check stock against the locked rows so concurrent tills can't oversell
+                needed = {}
+                for item_data in items:
+                    product_id = int(item_data['product_id'])
+                    needed[product_id] = needed.get(product_id, 0) + Decimal(item_data['quantity'])
+                products = {
+                    product.pk: product
+                    for product in Product.objects.select_for_update().filter(pk__in=needed).order_by('pk')
+                }
+                for product_id in needed:
+                    if product_id not in products:
+                        raise Product.DoesNotExist(f'Product {product_id} does not exist.')
+                # This store's share of each product (all of it without stores)
+                if store is not None:
+                    available = store.stock_levels(list(products.values()))
+                else:
+                    available = {pk: product.current_stock for pk, product in products.items()}
+                for product_id, quantity in needed.items():
+                    product = products[product_id]
+                    if product.track_stock and quantity > available[product_id]:
+                        return JsonResponse({
+                            'success': False,
+                            'error': f'Not enough stock for {product.name}. Available: {available[product_id]}'
+                        })
+                
+                # Create sale
+                tenders = _checkout_tenders(data)
+                sale = Sale(
+                    store=store,
+                    customer_id=data.get('customer_id'),
+                    discount_amount=Decimal(data.get('discount_amount', 0)),
+                    payment_method=data.get('payment_method', 'cash'),
+                    payment_received=sum((amount for _, amount, _ in tenders), Decimal('0')),
+                    sale_person=request.user,
+                    notes=data.get('notes', '')
                 )
-                sale_item.save()
-            
-            # Update daily summary
-            date = sale.sale_date.date()
-            daily_summary, created = DailySummary.objects.get_or_create(date=date)
-            daily_summary.update_totals()
+                sale.save()
+                
+                # Add sale items (SaleItem.save takes the stock off the locked product)
+                for item_data in items:
+                    sale_item = SaleItem(
+                        sale=sale,
+                        product=products[int(item_data['product_id'])],
+                        quantity=Decimal(item_data['quantity']),
+                        unit_price=Decimal(item_data['unit_price'])
+                    )
+                    sale_item.save()
+                
+                # Payments, and anything left unpaid onto the customer's due ledger
+                sale.settle(tenders, request.user)
+                
+                # Update daily summary
+                date = sale.sale_date.date()
+                daily_summary, created = DailySummary.objects.get_or_create(date=date, store=None)
+                daily_summary.update_totals()
+                
+                # Tell live dashboards about the sale once it is committed
+                transaction.on_commit(partial(publish, 'sale-committed', {
+                    'sale_id': sale.id,
+                    'grand_total': str(sale.grand_total),
+                    'today_total': str(daily_summary.total_sales),
+                    'today_count': daily_summary.sale_count,
+                }))
             
             return JsonResponse({
                 'success': True,
                 'sale_id': sale.id,
                 'grand_total': str(sale.grand_total),
-                'change_given': str(sale.change_given)
+                'change_given': str(sale.change_given),
+                'balance_due': str(sale.customer.due_balance) if sale.customer_id else None,
             })
             
         except Exception as e:
@@ -249,28 +311,175 @@ def create_sale(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
+def _receipt_sale(request, sale_id):
+    """The sale a receipt is for, from the database of the store it was sold at.
+
+    Links pass ``?store=<pk>``; without it the till's store database is tried
+    first, then every other sale database. Ids repeat across databases, so the
+    first match wins.
+    """
+    store = next(
+        (s for s in Store.objects.cached() if str(s.pk) == request.GET.get('store')), None
+    ) or current_store(request)
+    databases = [store.database] + [database for database in sale_databases() if database != store.database]
+    for database in databases:
+        sale = _sales_in(database).filter(id=sale_id).first()
+        if sale is not None:
+            return sale
+    raise Http404('Sale not found')
+
 @login_required
 def print_receipt(request, sale_id):
-    sale = get_object_or_404(Sale, id=sale_id)
+    sale = _receipt_sale(request, sale_id)
+    # Flag only; a queryset update so receipts can be reprinted for closed days
+    Sale.objects.using(sale._state.db).filter(pk=sale.pk).update(receipt_printed=True)
     sale.receipt_printed = True
-    sale.save()
     
-    return render(request, 'pos/receipt.html', {'sale': sale})
+    return render(request, 'pos/receipt.html', {
+        'sale': sale,
+        'payments': list(sale.payment_set.all()),
+        'amount_due': max(Decimal('0'), sale.grand_total - sale.payment_received),
+    })
+
+@login_required
+def customer_due(request, customer_id):
+    """GET: what the customer owes. POST (JSON amount, payment_method, reference, notes): collect a payment."""
+    if request.method == 'POST':
+        customer = get_object_or_404(Customer, pk=customer_id)
+        try:
+            data = json.loads(request.body)
+            entry = CustomerLedgerEntry.collect(
+                customer,
+                Decimal(str(data.get('amount') or 0)),
+                data.get('payment_method', 'cash'),
+                user=request.user,
+                reference=data.get('reference', ''),
+                notes=data.get('notes', ''),
+                store=current_store(request),
+            )
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+        return JsonResponse({
+            'success': True,
+            'customer_id': customer.pk,
+            'collected': str(-entry.amount),
+            'balance_due': str(entry.balance),
+        })
+
+    # One primary-key read of the maintained balance
+    customer = Customer.objects.filter(pk=customer_id).values('pk', 'name', 'due_balance').first()
+    if customer is None:
+        return JsonResponse({'success': False, 'error': 'Customer not found'}, status=404)
+    return JsonResponse({
+        'success': True,
+        'customer_id': customer['pk'],
+        'name': customer['name'],
+        'balance_due': str(customer['due_balance']),
+    })
 
 @login_required
 def daily_sales_report(request):
     date = request.GET.get('date')
+    # ?store=<code> narrows the page to one store; without it the whole shop is shown
+    stores = list(Store.objects.cached())
+    store = next((s for s in stores if s.code == request.GET.get('store')), None)
     if date:
-        sales = Sale.objects.filter(sale_date__date=date)
-        daily_summary, created = DailySummary.objects.get_or_create(date=date)
-        if created:
-            daily_summary.update_totals()
+        try:
+            date = datetime.strptime(date, '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, 'Invalid date.')
+            return redirect('daily_sales')
+        daily_summary = DailySummary.objects.filter(date=date, store=store).first()
+        if daily_summary and daily_summary.is_closed:
+            return _closed_day_report(request, daily_summary, store, stores)
+        
+        # Open day: totals are computed on the fly, nothing is written on a GET
+        daily_summary = DailySummary(date=date, store=store, **DailySummary.compute_totals(date, store))
+        sales = _day_sales(date, store)
     else:
-        sales = Sale.objects.all()[:50]
+        sales = _store_sales(store, limit=50)
         daily_summary = None
     
     return render(request, 'pos/daily_sales.html', {
         'sales': sales,
         'daily_summary': daily_summary,
-        'selected_date': date
-    })
\ No newline at end of file
+        'selected_date': date.isoformat() if date else None,
+        # Only past days can be closed
+        'can_close': bool(date) and date < timezone.now().date(),
+        'store': store,
+        'stores': stores,
+    })
+
+def _sales_in(database):
+    """Sales kept in ``database``, with what the sales pages show of them."""
+    sales = Sale.objects.using(database).prefetch_related('items__product')
+    # No joins across databases: on a store database the router sends these lookups to default
+    return with_shared(sales, database, 'customer', 'sale_person')
+
+def _store_sales(store, limit=None, **filters):
+    """One store's sales, or without a store the whole shop's from every sale database."""
+    if store is not None:
+        sales = _sales_in(store.database).filter(store=store, **filters)
+        return sales[:limit] if limit else sales
+    sales = []
+    for database in sale_databases():
+        queryset = _sales_in(database).filter(**filters)
+        sales += queryset[:limit] if limit else queryset
+    sales.sort(key=lambda sale: sale.sale_date)
+    return sales[:limit] if limit else sales
+
+def _day_sales(date, store=None):
+    start, end = day_range(date)
+    return _store_sales(store, sale_date__gte=start, sale_date__lt=end)
+
+def _closed_day_report(request, daily_summary, store=None, stores=()):
+    """A closed day never changes, so its page is revalidated by ETag and its sales cached."""
+    version = f'{daily_summary.date.isoformat()}-{store.code if store else "all"}-{daily_summary.closed_at.timestamp()}'
+    etag = f'"closed-day-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'closed-day-sales:{version}'
+        sales = cache.get(cache_key)
+        if sales is None:
+            sales = list(_day_sales(daily_summary.date, store))
+            cache.set(cache_key, sales, None)
+        response = render(request, 'pos/daily_sales.html', {
+            'sales': sales,
+            'daily_summary': daily_summary,
+            'selected_date': daily_summary.date.isoformat(),
+            'store': store,
+            'stores': stores,
+        })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+def close_day(request):
+    if request.method != 'POST':
+        return redirect('daily_sales')
+    try:
+        date = datetime.strptime(request.POST.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, 'Invalid date.')
+        return redirect('daily_sales')
+    try:
+        summary = DailySummary.close_day(date, user=request.user)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('daily_sales')
+    messages.success(request, f'Sales for {summary.date} closed. Totals are now final.')
+    return redirect(f"{reverse('daily_sales')}?date={date.isoformat()}")
+
+@login_required
+def reopen_day(request):
+    if request.method != 'POST' or not request.user.is_staff:
+        return redirect('daily_sales')
+    summary = get_object_or_404(DailySummary, date=request.POST.get('date'), store__isnull=True, is_closed=True)
+    try:
+        summary.reopen()
+    except ClosedPeriodError as e:
+        messages.error(request, str(e))
+        return redirect(f"{reverse('daily_sales')}?date={summary.date.isoformat()}")
+    messages.warning(request, f'Sales for {summary.date} reopened for adjustment. Close the day again when done.')
+    return redirect(f"{reverse('daily_sales')}?date={summary.date.isoformat()}")
@@ -0,0 +1,257 @@
+"""Report calculations shared by the report views and background report jobs."""
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, QuerySet, Sum
+from django.db.models.functions import TruncDate
+
+from door_shop.versioning import table_version
+from pos.archive import has_archived_sales
+from inventory.models import Product
+from pos.models import (
+    ArchivedPayment, ArchivedSale, ArchivedSaleItem, DailySummary, Payment, Sale, SaleItem, day_range, in_sale_databases,
+    item_revenue_and_cost, tender_totals, with_shared,
+)
+
+
+def _report_progress(progress, done, total):
+    if progress and total:
+        progress(int(done * 100 / total))
+
+
+def report_version(start_date, end_date, *models):
+    """Cache version of a report over [start_date, end_date].
+
+    A period whose days are all closed is final (like its DailySummary totals)
+    and only changes when one of them is reopened and closed again, so new sales
+    don't invalidate it. Any other period follows the versions of the sales
+    tables and of ``models``.
+    """
+    closed = DailySummary.objects.filter(date__gte=start_date, date__lte=end_date, store__isnull=True, is_closed=True).aggregate(
+        days=Count('id'), last_closed=Max('closed_at'),
+    )
+    if closed['days'] == (end_date - start_date).days + 1:
+        return f"closed-{closed['last_closed'].timestamp()}"
+    return f'live-{table_version(Sale, SaleItem, *models)}'
+
+
+def _sources(start_date, end_date):
+    """``(database, sales, items, payments)`` holding a period's sales: every sale database,
+    and the archive tables too once some of it has been archived (pos.archive)."""
+    items, payments = dict(in_sale_databases(SaleItem)), dict(in_sale_databases(Payment))
+    sources = [(database, sales, items[database], payments[database]) for database, sales in in_sale_databases(Sale)]
+    if has_archived_sales(start_date, end_date):
+        sources.insert(0, ('default', ArchivedSale.objects.all(), ArchivedSaleItem.objects.all(), ArchivedPayment.objects.all()))
+    return sources
+
+
+def _add_up(rows):
+    totals = {}
+    for row in rows:
+        for key, value in row.items():
+            totals[key] = (totals.get(key) or 0) + (value or 0)
+    return totals
+
+
+def _all_sales(sources):
+    # A single queryset stays lazy; otherwise every source's sales are listed oldest first
+    if len(sources) == 1:
+        return sources[0]
+    return sorted((sale for sales in sources for sale in sales), key=lambda sale: sale.sale_date)
+
+
+def _product_rows(items, database):
+    """Quantity and revenue per product; a store database's products are named from default."""
+    if database == 'default':
+        return items.values('product__name', 'product__category__name').annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum('total_price'),
+        ).order_by('-total_quantity')
+    rows = list(items.values('product').annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('total_price'),
+    ).order_by())
+    names = {
+        pk: (name, category)
+        for pk, name, category in Product.objects.filter(pk__in=[row['product'] for row in rows]).values_list(
+            'pk', 'name', 'category__name',
+        )
+    }
+    for row in rows:
+        row['product__name'], row['product__category__name'] = names.get(row['product'], (f"Product #{row['product']}", None))
+        del row['product']
+    return rows
+
+
+def build_sales_report(start_date, end_date, progress=None):
+    start, end = day_range(start_date, end_date)
+    sources = _sources(start_date, end_date)
+    sales_by_source = [
+        with_shared(
+            sales.filter(sale_date__gte=start, sale_date__lt=end), database, 'customer', 'sale_person',
+        ).prefetch_related('items__product')
+        for database, sales, _, _ in sources
+    ]
+
+    # Daily breakdown, one grouped query per table; days without sales show as zero
+    daily_totals = {}
+    for sales in sales_by_source:
+        for row in sales.order_by().annotate(day=TruncDate('sale_date')).values('day').annotate(
+            total_sales=Sum('grand_total'),
+            sale_count=Count('id'),
+        ):
+            day = row.pop('day')
+            daily_totals[day] = _add_up([daily_totals.get(day, {}), row])
+    daily_summaries = []
+    current_date = start_date
+    while current_date <= end_date:
+        day = daily_totals.get(current_date, {})
+        daily_summaries.append({
+            'date': current_date,
+            'total_sales': day.get('total_sales') or Decimal('0'),
+            'sale_count': day.get('sale_count', 0),
+        })
+        current_date += timedelta(days=1)
+    _report_progress(progress, 1, 3)
+
+    # Top selling products
+    product_rows = [
+        _product_rows(items.filter(sale__sale_date__gte=start, sale__sale_date__lt=end), database)
+        for database, _, items, _ in sources
+    ]
+    if len(product_rows) == 1:
+        top_products = product_rows[0][:10]
+    else:
+        merged = {}
+        for rows in product_rows:
+            for row in rows:
+                key = (row['product__name'], row['product__category__name'])
+                seen = merged.setdefault(key, {**row, 'total_quantity': 0, 'total_revenue': 0})
+                seen['total_quantity'] += row['total_quantity']
+                seen['total_revenue'] += row['total_revenue']
+        top_products = sorted(merged.values(), key=lambda row: row['total_quantity'], reverse=True)[:10]
+    _report_progress(progress, 2, 3)
+
+    # Sales statistics
+    totals = _add_up(sales.aggregate(total=Sum('grand_total'), count=Count('id')) for sales in sales_by_source)
+    total_sales_amount = totals['total'] or Decimal('0')
+    total_transactions = totals['count']
+    avg_sale_value = total_sales_amount / total_transactions if total_transactions > 0 else Decimal('0')
+    _report_progress(progress, 3, 3)
+
+    return {
+        'sales': _all_sales(sales_by_source),
+        'daily_summaries': daily_summaries,
+        'top_products': top_products,
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_sales': total_sales_amount,
+        'total_transactions': total_transactions,
+        'avg_sale_value': avg_sale_value,
+    }
+
+
+def _item_cost(prefix=''):
+    return ExpressionWrapper(
+        F(f'{prefix}product__cost_price') * F(f'{prefix}quantity'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def _store_sales_with_profit(sales, items):
+    """A store database's sales with ``profit`` set, their items costed on default."""
+    sold = list(items.values('sale', 'product').annotate(revenue=Sum('total_price'), quantity=Sum('quantity')).order_by())
+    costs = dict(Product.objects.filter(pk__in={row['product'] for row in sold}).values_list('pk', 'cost_price'))
+    profits = {}
+    for row in sold:
+        profit = row['revenue'] - costs.get(row['product'], 0) * row['quantity']
+        profits[row['sale']] = profits.get(row['sale'], 0) + profit
+    sales = list(sales.prefetch_related('customer'))
+    for sale in sales:
+        sale.profit = profits.get(sale.pk)
+    return sales
+
+
+def build_profit_report(start_date, end_date, progress=None):
+    start, end = day_range(start_date, end_date)
+    sources = _sources(start_date, end_date)
+    # Profit per sale is worked out in SQL rather than by walking every item
+    sales_by_source = []
+    for database, sales, items, _ in sources:
+        sales = sales.filter(sale_date__gte=start, sale_date__lt=end)
+        if database != 'default':
+            items = items.filter(sale__sale_date__gte=start, sale__sale_date__lt=end)
+            sales_by_source.append(_store_sales_with_profit(sales, items))
+            continue
+        sales_by_source.append(sales.select_related('customer').annotate(
+            profit=Sum(ExpressionWrapper(
+                F('items__total_price') - _item_cost('items__'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )),
+        ))
+
+    # Calculate totals, with takings per method from the payments as DailySummary counts them
+    totals = _add_up(
+        tender_totals(
+            sales.filter(sale_date__gte=start, sale_date__lt=end),
+            payments.filter(sale__sale_date__gte=start, sale__sale_date__lt=end),
+            total_sales=Sum('grand_total'),
+            total_discount=Sum('discount_amount'),
+        )
+        for _, sales, _, payments in sources
+    )
+    total_sales = totals['total_sales'] or Decimal('0')
+    total_discount = totals['total_discount'] or Decimal('0')
+    _report_progress(progress, 1, 2)
+
+    # Calculate cost and profit
+    revenue, total_cost = Decimal('0'), Decimal('0')
+    for database, _, items, _ in sources:
+        source_revenue, source_cost = item_revenue_and_cost(
+            items.filter(sale__sale_date__gte=start, sale__sale_date__lt=end), database,
+        )
+        revenue += source_revenue
+        total_cost += source_cost
+    total_profit = revenue - total_cost
+    _report_progress(progress, 2, 2)
+
+    profit_margin = (total_profit / total_sales * 100) if total_sales > 0 else Decimal('0')
+
+    # Sales by payment method
+    payment_methods = {
+        method: totals[method] or Decimal('0')
+        for method in ('cash', 'card', 'mobile', 'due')
+    }
+
+    return {
+        'sales': _all_sales(sales_by_source),
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_sales': total_sales,
+        'total_cost': total_cost,
+        'total_profit': total_profit,
+        'profit_margin': profit_margin,
+        'total_discount': total_discount,
+        'payment_methods': payment_methods,
+    }
+
+
+def sales_csv(sales):
+    """Render the sale rows of a report as CSV text."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Sale ID', 'Date', 'Customer', 'Grand Total', 'Discount', 'Payment Method'])
+    if isinstance(sales, QuerySet):
+        sales = sales.select_related('customer').prefetch_related(None).order_by('sale_date')
+    for sale in sales:
+        writer.writerow([
+            sale.id,
+            sale.sale_date.strftime('%Y-%m-%d %H:%M'),
+            sale.customer.name if sale.customer else 'Walk-in',
+            sale.grand_total,
+            sale.discount_amount,
+            sale.get_payment_method_display(),
+        ])
+    return output.getvalue()
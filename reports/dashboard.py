@@ -0,0 +1,59 @@
+"""Cached snapshot of the counters shown on the main and inventory dashboards.
+
+The snapshot is rebuilt at most once per ``DASHBOARD_SNAPSHOT_TTL`` seconds and
+is dropped as soon as a sale, product, purchase order, customer or supplier
+changes (see ``reports.signals``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from inventory.models import Customer, Product, PurchaseOrder, Supplier
+from pos.models import DailySummary, Sale, in_sale_databases, with_shared
+
+DASHBOARD_CACHE_KEY = 'dashboard-snapshot'
+
+
+def recent_sales(count=5):
+    """The latest sales across every sale database."""
+    sales = []
+    for database, queryset in in_sale_databases(Sale):
+        sales += with_shared(queryset, database, 'customer').order_by('-sale_date')[:count]
+    return sorted(sales, key=lambda sale: sale.sale_date, reverse=True)[:count]
+
+
+def build_dashboard_snapshot():
+    low_stock = Q(track_stock=True, current_stock__lte=F('min_stock_level'))
+    product_counts = Product.objects.aggregate(
+        total=Count('id'),
+        low_stock=Count('id', filter=low_stock),
+    )
+
+    # Today's totals come from the maintained daily rollup, not from Sale
+    today = DailySummary.objects.filter(date=timezone.now().date(), store__isnull=True).values('total_sales', 'sale_count').first()
+
+    return {
+        'total_products': product_counts['total'],
+        'low_stock_count': product_counts['low_stock'],
+        'total_suppliers': Supplier.objects.count(),
+        'total_customers': Customer.objects.count(),
+        'today_total': today['total_sales'] if today else 0,
+        'today_count': today['sale_count'] if today else 0,
+        'low_stock_products': list(Product.objects.filter(low_stock).select_related('category')[:10]),
+        'recent_sales': recent_sales(),
+        'recent_purchases': list(PurchaseOrder.objects.select_related('supplier').order_by('-order_date')[:5]),
+        'generated_at': timezone.now(),
+    }
+
+
+def get_dashboard_snapshot():
+    snapshot = cache.get(DASHBOARD_CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot()
+        cache.set(DASHBOARD_CACHE_KEY, snapshot, getattr(settings, 'DASHBOARD_SNAPSHOT_TTL', 30))
+    return snapshot
+
+
+def invalidate_dashboard_snapshot():
+    cache.delete(DASHBOARD_CACHE_KEY)
@@ -0,0 +1,15 @@
+"""Entry points for report jobs run in a spawned worker process.
+
+This module must not import models at import time: the child process unpickles
+these functions before ``django.setup()`` has run.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from reports.jobs import run_report_job
+    run_report_job(job_id)
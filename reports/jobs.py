@@ -0,0 +1,129 @@
+"""Background execution of long-range reports.
+
+Jobs are rows in the ``ReportJob`` table. The web process submits new jobs to an
+in-process thread or process pool (``REPORT_JOB_EXECUTOR``); with the
+``external`` executor the jobs stay pending until the ``run_report_jobs``
+management command picks them up.
+
+A job left ``running`` for longer than ``REPORT_JOB_TIMEOUT`` seconds is taken
+to have lost its worker (a restart, a killed process) and can be claimed again:
+by the command's next poll, or by the pool when its status page is polled.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+import multiprocessing
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import job_process
+from .builders import build_profit_report, build_sales_report, sales_csv
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+REPORT_BUILDERS = {
+    'sales': (build_sales_report, 'reports/includes/sales_report_body.html'),
+    'profit': (build_profit_report, 'reports/includes/profit_calculation_body.html'),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'REPORT_JOB_WORKERS', 2)
+        if getattr(settings, 'REPORT_JOB_EXECUTOR', 'thread') == 'process':
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=job_process.init_worker,
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-job')
+    return _executor
+
+
+def submit_report_job(report_type, start_date, end_date, user):
+    """Create a pending job and hand it to the worker pool once committed."""
+    job = ReportJob.objects.create(
+        report_type=report_type,
+        params={'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()},
+        requested_by=user,
+    )
+    if _executor_type() != 'external':
+        transaction.on_commit(lambda: _submit(job.id))
+    return job
+
+
+def _executor_type():
+    return getattr(settings, 'REPORT_JOB_EXECUTOR', 'thread')
+
+
+def _submit(job_id):
+    target = job_process.run_job if _executor_type() == 'process' else run_report_job
+    get_executor().submit(target, job_id)
+
+
+def claimable():
+    """Pending jobs, and running ones whose worker seems to have died."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 1800))
+    return Q(status='pending') | Q(status='running', started_at__lt=cutoff)
+
+
+def claim_job(job_id):
+    """Move a pending (or stale running) job to running; False if another worker already has it."""
+    return ReportJob.objects.filter(claimable(), pk=job_id).update(
+        status='running', started_at=timezone.now(), progress=0
+    ) == 1
+
+
+def resubmit_stale_job(job):
+    """Hand a job whose worker died back to the pool; True if it was."""
+    if job.status != 'running' or _executor_type() == 'external':
+        # Pending jobs are already queued, and the command reclaims stale ones itself
+        return False
+    if not ReportJob.objects.filter(claimable(), pk=job.pk).exists():
+        return False
+    _submit(job.pk)
+    return True
+
+
+def run_report_job(job_id):
+    close_old_connections()
+    try:
+        if not claim_job(job_id):
+            return
+        job = ReportJob.objects.get(pk=job_id)
+        builder, template_name = REPORT_BUILDERS[job.report_type]
+        last_progress = [0]
+
+        def progress(percent):
+            # Only write when the visible percentage moves
+            if percent > last_progress[0]:
+                last_progress[0] = percent
+                ReportJob.objects.filter(pk=job_id).update(progress=min(percent, 99))
+
+        try:
+            context = builder(
+                date.fromisoformat(job.params['start_date']),
+                date.fromisoformat(job.params['end_date']),
+                progress=progress,
+            )
+            job.result_html = render_to_string(template_name, context)
+            job.result_csv = sales_csv(context['sales'])
+            job.status = 'done'
+            job.progress = 100
+        except Exception as e:
+            logger.exception('Report job #%s failed', job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['result_html', 'result_csv', 'status', 'progress', 'error', 'finished_at'])
+    finally:
+        close_old_connections()
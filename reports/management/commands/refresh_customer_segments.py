@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reports.segments import refresh_customer_segments
+
+
+class Command(BaseCommand):
+    help = 'Recompute RFM customer segments (run nightly)'
+
+    def handle(self, *args, **options):
+        count = refresh_customer_segments()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed segments for {count} customers'))
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from door_shop.snapshot import refresh_snapshot, snapshot_path
+
+
+class Command(BaseCommand):
+    help = 'Copy the live database to the reporting snapshot with the SQLite online backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, help=f'Pages per backup step (default {settings.REPORTING_BACKUP_PAGES})')
+        parser.add_argument('--sleep', type=float, help=f'Seconds between steps (default {settings.REPORTING_BACKUP_SLEEP})')
+        parser.add_argument('--every', type=float, help='Keep running, refreshing every this many seconds')
+
+    def handle(self, *args, **options):
+        if snapshot_path() is None:
+            raise CommandError('No reporting snapshot is configured (REPORTING_DATABASE, SQLite only).')
+        while True:
+            started = time.perf_counter()
+            steps = []
+            refresh_snapshot(
+                pages=options['pages'], sleep=options['sleep'],
+                progress=lambda status, remaining, total: steps.append(total),
+            )
+            self.stdout.write(
+                f'Refreshed {snapshot_path()}: {steps[-1] if steps else 0} pages in {len(steps)} steps, '
+                f'{time.perf_counter() - started:.2f}s'
+            )
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.jobs import claimable, run_report_job
+from reports.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = 'Run pending (and stale running) background report jobs from the ReportJob table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no pending jobs are left')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait between polls')
+
+    def handle(self, *args, **options):
+        while True:
+            job_ids = list(
+                ReportJob.objects.filter(claimable()).order_by('created_at').values_list('id', flat=True)
+            )
+            for job_id in job_ids:
+                run_report_job(job_id)
+                self.stdout.write(f'Processed report job #{job_id}')
+
+            if not job_ids:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
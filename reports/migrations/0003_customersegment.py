@@ -0,0 +1,61 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_purchaseorder_received_at"),
+        ("reports", "0002_reportjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_purchase", models.DateTimeField()),
+                ("recency_days", models.PositiveIntegerField()),
+                ("frequency", models.PositiveIntegerField()),
+                ("monetary", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("recency_score", models.PositiveSmallIntegerField()),
+                ("frequency_score", models.PositiveSmallIntegerField()),
+                ("monetary_score", models.PositiveSmallIntegerField()),
+                (
+                    "segment",
+                    models.CharField(
+                        choices=[
+                            ("champion", "Champions"),
+                            ("loyal", "Loyal Customers"),
+                            ("potential", "Potential Loyalists"),
+                            ("new", "New Customers"),
+                            ("at_risk", "At Risk"),
+                            ("hibernating", "Hibernating"),
+                            ("lost", "Lost"),
+                        ],
+                        db_index=True,
+                        max_length=20,
+                    ),
+                ),
+                ("refreshed_at", models.DateTimeField()),
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="segment",
+                        to="inventory.customer",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -23,4 +23,65 @@ class ProfitLossReport(models.Model):
     generated_by = models.ForeignKey('auth.User', on_delete=models.CASCADE)
 
     def __str__(self):
-        return f"P&L Report {self.start_date} to {self.end_date}"
\ No newline at end of file
+        return f"P&L Report {self.start_date} to {self.end_date}"
+
+class ReportJob(models.Model):
+    REPORT_TYPES = [
+        ('sales', 'Sales Report'),
+        ('profit', 'Profit & Loss Report'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    result_html = models.TextField(blank=True)
+    result_csv = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} job #{self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+
+class CustomerSegment(models.Model):
+    SEGMENTS = [
+        ('champion', 'Champions'),
+        ('loyal', 'Loyal Customers'),
+        ('potential', 'Potential Loyalists'),
+        ('new', 'New Customers'),
+        ('at_risk', 'At Risk'),
+        ('hibernating', 'Hibernating'),
+        ('lost', 'Lost'),
+    ]
+
+    customer = models.OneToOneField('inventory.Customer', on_delete=models.CASCADE, related_name='segment')
+    last_purchase = models.DateTimeField()
+    recency_days = models.PositiveIntegerField()
+    frequency = models.PositiveIntegerField()
+    monetary = models.DecimalField(max_digits=14, decimal_places=2)
+    recency_score = models.PositiveSmallIntegerField()
+    frequency_score = models.PositiveSmallIntegerField()
+    monetary_score = models.PositiveSmallIntegerField()
+    segment = models.CharField(max_length=20, choices=SEGMENTS, db_index=True)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.customer} - {self.get_segment_display()}"
+
+    @property
+    def rfm_code(self):
+        return f"{self.recency_score}{self.frequency_score}{self.monetary_score}"
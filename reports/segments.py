@@ -0,0 +1,95 @@
+"""RFM (recency, frequency, monetary) customer segmentation.
+
+All customers are scored from their sale totals (``customer_sale_totals``, one
+grouped query per sale database and the archive); each metric is split into quintiles (score 1-5) with one sort per metric, and the result
+is upserted into ``CustomerSegment`` so segment filters are an indexed lookup.
+"""
+from bisect import bisect_left, bisect_right
+
+from django.db import transaction
+from django.utils import timezone
+
+from pos.models import customer_sale_totals
+from .models import CustomerSegment
+
+SCORE_BUCKETS = 5
+
+
+def quantile_scores(values):
+    """Score every value 1-5 by the quintile it falls in (higher value, higher score).
+
+    The values are sorted once and each value's percentile rank is found with a
+    binary search; tied values share their average rank, and so their score.
+    """
+    if not values:
+        return []
+    ordered = sorted(values)
+    count = len(ordered)
+    scores = []
+    for value in values:
+        rank = (bisect_left(ordered, value) + bisect_right(ordered, value)) / 2
+        scores.append(min(int(rank * SCORE_BUCKETS / count) + 1, SCORE_BUCKETS))
+    return scores
+
+
+def segment_for(recency_score, frequency_score):
+    """Map recency/frequency scores onto the classic RFM segment grid."""
+    if recency_score >= 4 and frequency_score >= 4:
+        return 'champion'
+    if recency_score >= 3 and frequency_score >= 3:
+        return 'loyal'
+    if recency_score >= 4 and frequency_score <= 1:
+        return 'new'
+    if recency_score >= 3:
+        return 'potential'
+    if frequency_score >= 3:
+        return 'at_risk'
+    if recency_score == 2:
+        return 'hibernating'
+    return 'lost'
+
+
+def refresh_customer_segments(now=None):
+    """Recompute and store segments for every customer with sales."""
+    now = now or timezone.now()
+    rows = [
+        {'customer': customer_id, 'last_purchase': totals['last'], 'frequency': totals['count'], 'monetary': totals['spent']}
+        for customer_id, totals in customer_sale_totals().items()
+    ]
+
+    recency = [max((now - row['last_purchase']).days, 0) for row in rows]
+    # Fewer days since the last purchase is better, so score the negated value
+    recency_scores = quantile_scores([-days for days in recency])
+    frequency_scores = quantile_scores([row['frequency'] for row in rows])
+    monetary_scores = quantile_scores([row['monetary'] or 0 for row in rows])
+
+    segments = [
+        CustomerSegment(
+            customer_id=row['customer'],
+            last_purchase=row['last_purchase'],
+            recency_days=days,
+            frequency=row['frequency'],
+            monetary=row['monetary'] or 0,
+            recency_score=r,
+            frequency_score=f,
+            monetary_score=m,
+            segment=segment_for(r, f),
+            refreshed_at=now,
+        )
+        for row, days, r, f, m in zip(rows, recency, recency_scores, frequency_scores, monetary_scores)
+    ]
+
+    with transaction.atomic():
+        CustomerSegment.objects.bulk_create(
+            segments,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=[
+                'last_purchase', 'recency_days', 'frequency', 'monetary', 'recency_score',
+                'frequency_score', 'monetary_score', 'segment', 'refreshed_at',
+            ],
+        )
+        # Customers whose sales were all removed no longer have a segment
+        CustomerSegment.objects.exclude(refreshed_at=now).delete()
+    return len(segments)
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from door_shop.versioning import track_table_versions
+from inventory.models import Customer, Product, PurchaseOrder, Supplier
+from pos.models import DailySummary, Sale, SaleItem
+from .dashboard import invalidate_dashboard_snapshot
+
+# DailySummary is included because today's totals are read from it
+DASHBOARD_MODELS = [Sale, DailySummary, Product, PurchaseOrder, Customer, Supplier]
+
+
+def dashboard_changed(sender, **kwargs):
+    # Drop the snapshot after commit so a concurrent rebuild can't re-cache old rows
+    transaction.on_commit(invalidate_dashboard_snapshot)
+
+
+for model in DASHBOARD_MODELS:
+    post_save.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard-save-{model.__name__}')
+    post_delete.connect(dashboard_changed, sender=model, dispatch_uid=f'dashboard-delete-{model.__name__}')
+
+# Cached report bodies for open periods are keyed on the sales tables' versions
+track_table_versions(Sale, SaleItem, DailySummary)
@@ -1,3 +1,356 @@
-from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from door_shop.testing import QueryBudgetMixin, QueryPlanMixin, StoreDatabaseMixin, create_shop_data
+from inventory.models import Customer, Product, PurchaseItem, PurchaseOrder, Supplier
+from pos.models import DailySummary, Sale, SaleItem
+from reports import urls as report_urls
+from reports.builders import build_profit_report, build_sales_report
+from reports.dashboard import recent_sales
+from reports.jobs import claim_job
+from reports.models import CustomerSegment, ReportJob
+from reports.segments import quantile_scores, refresh_customer_segments, segment_for
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN QUERY PLAN')
+class ReportQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+
+    def test_sales_report_uses_sale_date_index(self):
+        url = reverse('sales_report')
+        self.assertUsesIndex(url, 'pos_sale', 'pos_sale_date_idx')
+        self.assertNoFullScan(url, 'pos_sale')
+
+    def test_profit_report_uses_sale_date_index(self):
+        url = reverse('profit_calculation_report')
+        self.assertUsesIndex(url, 'pos_sale', 'pos_sale_date_idx')
+        self.assertNoFullScan(url, 'pos_sale')
+
+    def test_supplier_report_uses_supplier_date_index(self):
+        url = reverse('supplier_report')
+        self.assertUsesIndex(url, 'inventory_purchaseorder', 'inv_po_supplier_date_idx')
+        self.assertNoFullScan(url, 'inventory_purchaseorder')
+
+
+class ReportQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlpatterns = report_urls.urlpatterns
+    query_budgets = {
+        'reports_dashboard': 2,
+        'stock_valuation_report': 4,
+        'profit_calculation_report': 8,
+        'low_stock_report': 3,
+        'sales_report': 10,
+        'customer_report': 6,
+        'supplier_report': 3,
+        'report_job_detail': 3,
+        'report_job_status': 3,
+        'report_job_csv': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        cls.job = ReportJob.objects.create(
+            report_type='sales', params={}, status='done', progress=100,
+            result_html='<p>Done</p>', result_csv='Sale ID\n', requested_by=cls.data['user'],
+        )
+
+    def setUp(self):
+        self.client.force_login(self.data['user'])
+        self.url_kwargs = {
+            'report_job_detail': {'pk': self.job.pk},
+            'report_job_status': {'pk': self.job.pk},
+            'report_job_csv': {'pk': self.job.pk},
+        }
+
+
+class ReportFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.data['user'])
+
+    def sale_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries if '"pos_saleitem"' in q['sql']]
+
+    def add_sale(self, sale_date=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = Sale.objects.create(sale_person=self.data['user'])
+            SaleItem.objects.create(sale=sale, product=self.data['product'], quantity=Decimal('1'), unit_price=Decimal('999.00'))
+            if sale_date:
+                Sale.objects.filter(pk=sale.pk).update(sale_date=sale_date)
+        return sale
+
+    def test_open_period_is_cached_until_a_sale_is_saved(self):
+        url = reverse('sales_report')
+        _, queries = self.sale_queries(url)
+        self.assertTrue(queries)
+        _, queries = self.sale_queries(url)
+        self.assertFalse(queries, 'the report body should come from the cache')
+
+        self.add_sale()
+        response, queries = self.sale_queries(url)
+        self.assertTrue(queries)
+        self.assertContains(response, '999')
+
+    def test_closed_period_survives_new_sales(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        self.add_sale(timezone.now() - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            DailySummary.close_day(yesterday)
+        url = reverse('profit_calculation_report') + f'?start_date={yesterday}&end_date={yesterday}'
+        self.sale_queries(url)
+
+        self.add_sale()
+        response, queries = self.sale_queries(url)
+        self.assertFalse(queries, 'a closed period should not be invalidated by new sales')
+        self.assertContains(response, '999')
+
+
+class CustomerSegmentTests(TestCase):
+    def test_quantile_scores(self):
+        self.assertEqual(quantile_scores([]), [])
+        self.assertEqual(quantile_scores([50, 10, 40, 20, 30]), [5, 1, 4, 2, 3])
+        # Ties share their average rank, and so their score
+        self.assertEqual(quantile_scores([7, 7, 7, 7]), [3, 3, 3, 3])
+        self.assertEqual(quantile_scores([1, 1, 2, 3, 4, 5, 6, 7, 8, 9]), [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+
+    def test_refresh_scores_customers_and_drops_ones_without_sales(self):
+        user = User.objects.create_user('cashier')
+        now = timezone.now()
+        regular, lapsed, gone = (Customer.objects.create(name=name) for name in ('Regular', 'Lapsed', 'Gone'))
+        for customer, days_ago, total in ((regular, 1, '500'), (regular, 3, '500'), (regular, 5, '500'), (lapsed, 200, '100')):
+            sale = Sale.objects.create(customer=customer, sale_person=user, total_amount=Decimal(total))
+            Sale.objects.filter(pk=sale.pk).update(sale_date=now - timedelta(days=days_ago))
+        CustomerSegment.objects.create(
+            customer=gone, last_purchase=now, recency_days=0, frequency=1, monetary=1,
+            recency_score=5, frequency_score=5, monetary_score=5, segment='champion', refreshed_at=now - timedelta(days=1),
+        )
+
+        self.assertEqual(refresh_customer_segments(now), 2)
+        segments = {s.customer_id: s for s in CustomerSegment.objects.all()}
+        self.assertEqual(set(segments), {regular.pk, lapsed.pk})
+        best, worst = segments[regular.pk], segments[lapsed.pk]
+        self.assertEqual((best.recency_days, best.frequency, best.monetary), (1, 3, Decimal('1500.00')))
+        self.assertEqual((best.recency_score, best.frequency_score, best.monetary_score, best.segment), (4, 4, 4, 'champion'))
+        self.assertEqual((worst.recency_days, worst.recency_score, worst.frequency_score), (200, 2, 2))
+        self.assertEqual(worst.segment, 'hibernating')
+
+        self.client.force_login(User.objects.create_superuser('boss', password='pw'))
+        response = self.client.get(reverse('customer_report'), {'segment': 'champion'})
+        self.assertEqual([c.pk for c in response.context['customers']], [regular.pk])
+
+    def test_segment_grid(self):
+        self.assertEqual(segment_for(5, 5), 'champion')
+        self.assertEqual(segment_for(3, 3), 'loyal')
+        self.assertEqual(segment_for(5, 1), 'new')
+        self.assertEqual(segment_for(4, 2), 'potential')
+        self.assertEqual(segment_for(1, 4), 'at_risk')
+        self.assertEqual(segment_for(2, 1), 'hibernating')
+        self.assertEqual(segment_for(1, 1), 'lost')
+
+
+@override_settings(SUPPLIER_COST_TREND_DAYS=90)
+class SupplierReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        cls.supplier = Supplier.objects.create(name='Timber Co')
+        now = timezone.now()
+        # (days ago ordered, days to expected date, days to delivery or None, status, unit cost)
+        orders = [
+            (100, 5, 4, 'received', '100.00'),   # previous window, on time
+            (10, 2, 6, 'received', '110.00'),    # recent window, four days late
+            (5, 3, None, 'pending', '130.00'),   # not delivered yet
+            (20, 1, None, 'received', '120.00'),  # marked received without a date
+        ]
+        for ago, expected, delivered, status, unit_cost in orders:
+            order = PurchaseOrder.objects.create(supplier=cls.supplier)
+            PurchaseItem.objects.create(
+                purchase_order=order, product=cls.data['product'], quantity=Decimal('2'), unit_cost=Decimal(unit_cost),
+            )
+            ordered = now - timedelta(days=ago)
+            PurchaseOrder.objects.filter(pk=order.pk).update(
+                order_date=ordered,
+                expected_date=(ordered + timedelta(days=expected)).date(),
+                received_at=ordered + timedelta(days=delivered) if delivered is not None else None,
+                status=status,
+            )
+
+    def test_lead_time_on_time_rate_and_cost_trend(self):
+        self.client.force_login(self.data['user'])
+        response = self.client.get(reverse('supplier_report'))
+        supplier = next(s for s in response.context['suppliers'] if s.pk == self.supplier.pk)
+        self.assertEqual(supplier.purchase_count, 4)
+        # Only orders with a delivery date count towards delivery performance
+        self.assertEqual(supplier.received_count, 2)
+        self.assertAlmostEqual(supplier.avg_lead_days, 5.0, places=3)
+        self.assertEqual((supplier.due_count, supplier.on_time_count), (2, 1))
+        self.assertAlmostEqual(supplier.on_time_rate, 50.0)
+        # Recent orders averaged 120 a unit (110, 130, 120) against 100 before
+        self.assertEqual(supplier.recent_unit_cost, Decimal('120.00'))
+        self.assertEqual(supplier.previous_unit_cost, Decimal('100.00'))
+        self.assertAlmostEqual(supplier.cost_trend, 20.0)
+
+
+@override_settings(REPORT_JOB_EXECUTOR='thread')
+class ReportJobTests(TransactionTestCase):
+    # Committed rows, so the pool's threads can see the jobs; the default store
+    # comes from a data migration, so it is restored after each flush
+    serialized_rollback = True
+
+    def setUp(self):
+        cache.clear()
+        self.data = create_shop_data()
+        self.client.force_login(self.data['user'])
+
+    def wait_for(self, job_id):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job = ReportJob.objects.get(pk=job_id)
+            if job.is_finished:
+                return job
+            time.sleep(0.05)
+        self.fail(f'report job #{job_id} did not finish')
+
+    def test_each_report_runs_in_the_pool_and_downloads_as_csv(self):
+        today = timezone.now().date().isoformat()
+        for name, report_type in (('sales_report', 'sales'), ('profit_calculation_report', 'profit')):
+            with self.subTest(report_type):
+                response = self.client.get(reverse(name), {
+                    'start_date': today, 'end_date': today, 'background': '1', 'format': 'json',
+                })
+                self.assertEqual(response.status_code, 202)
+                job = self.wait_for(response.json()['job_id'])
+                self.assertEqual((job.report_type, job.status, job.progress), (report_type, 'done', 100))
+
+                status = self.client.get(response.json()['status_url']).json()
+                self.assertEqual(status['status'], 'done')
+                download = self.client.get(status['csv_url'])
+                self.assertEqual(download['Content-Type'], 'text/csv')
+                self.assertIn(f'{report_type}-report-{job.pk}.csv', download['Content-Disposition'])
+                rows = download.content.decode().splitlines()
+                self.assertEqual(rows[0], 'Sale ID,Date,Customer,Grand Total,Discount,Payment Method')
+                self.assertEqual(len(rows), 1 + Sale.objects.count())
+                self.assertIn('Rahim', download.content.decode())
+
+    def test_jobs_are_private_and_only_download_when_done(self):
+        job = ReportJob.objects.create(report_type='sales', params={}, requested_by=self.data['user'])
+        self.assertEqual(self.client.get(reverse('report_job_csv', args=[job.pk])).status_code, 404)
+        self.client.force_login(User.objects.create_user('clerk', password='pw'))
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.pk])).status_code, 404)
+
+    def test_a_job_whose_worker_died_is_claimed_again(self):
+        params = {'start_date': timezone.now().date().isoformat(), 'end_date': timezone.now().date().isoformat()}
+        job = ReportJob.objects.create(report_type='sales', params=params, requested_by=self.data['user'])
+        self.assertTrue(claim_job(job.pk))
+        self.assertFalse(claim_job(job.pk))
+
+        # Still running within the timeout: nobody takes it over
+        with mock.patch('reports.jobs._submit') as submit:
+            self.client.get(reverse('report_job_status', args=[job.pk]))
+            submit.assert_not_called()
+
+        ReportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('reports.jobs._submit') as submit:
+            self.client.get(reverse('report_job_status', args=[job.pk]))
+            submit.assert_called_once_with(job.pk)
+
+        call_command('run_report_jobs', once=True, stdout=StringIO())
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, 'done')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The store database is an in-memory SQLite database')
+class ProfitReportTests(TestCase):
+    def test_payment_methods_follow_the_payments_of_split_sales(self):
+        data = create_shop_data()
+        sale = Sale.objects.create(customer=data['customer'], sale_person=data['user'], total_amount=Decimal('300.00'))
+        sale.settle([('cash', Decimal('100.00'), ''), ('card', Decimal('50.00'), '')])
+
+        today = timezone.now().date()
+        report = build_profit_report(today, today)
+        # The three sales from create_shop_data predate split payments and count under cash
+        self.assertEqual(report['payment_methods'], {
+            'cash': Decimal('550.00'), 'card': Decimal('50.00'), 'mobile': Decimal('0'), 'due': Decimal('150.00'),
+        })
+        day = DailySummary.compute_totals(today)
+        for method, total in report['payment_methods'].items():
+            self.assertEqual(total, day[f'total_{method}'], method)
+
+
+class StoreDatabaseReportTests(StoreDatabaseMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_shop_data()
+        # Saved like a checkout saves them, so the router sends them to the branch's database
+        cls.sale = Sale(store=cls.data['branch'], customer=cls.data['customer'], sale_person=cls.data['user'])
+        cls.sale.save()
+        SaleItem(sale=cls.sale, product=cls.data['product'], quantity=Decimal('2'), unit_price=Decimal('150.00')).save()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.data['user'])
+
+    def test_the_branch_sale_lives_in_its_own_database(self):
+        self.assertEqual(self.sale._state.db, 'store_branch')
+        self.assertFalse(Sale.objects.using('default').filter(store=self.data['branch']).exists())
+
+    def test_reports_add_up_every_sale_database(self):
+        today = timezone.now().date()
+        day = DailySummary.compute_totals(today)
+        sales = build_sales_report(today, today)
+        self.assertEqual(sales['total_transactions'], 4)
+        self.assertEqual(sales['total_sales'], day['total_sales'])
+        self.assertEqual(sales['daily_summaries'][0]['sale_count'], 4)
+        self.assertEqual(sales['top_products'][0]['total_quantity'], Decimal('5'))
+        self.assertIn(self.sale.pk, [sale.pk for sale in sales['sales'] if sale._state.db == 'store_branch'])
+
+        profit = build_profit_report(today, today)
+        self.assertEqual(profit['total_sales'], day['total_sales'])
+        self.assertEqual(profit['total_profit'], day['total_profit'])
+        branch_sale = next(sale for sale in profit['sales'] if sale._state.db == 'store_branch')
+        product = Product.objects.get(pk=self.data['product'].pk)
+        self.assertEqual(branch_sale.profit, Decimal('300.00') - 2 * product.cost_price)
+
+    def test_segments_dashboard_and_customer_pages_see_the_branch_sale(self):
+        refresh_customer_segments()
+        segment = CustomerSegment.objects.get(customer=self.data['customer'])
+        self.assertEqual((segment.frequency, segment.monetary), (3, Decimal('600.00')))
+        self.assertEqual(recent_sales()[0], self.sale)
+
+        customer = self.data['customer']
+        for name in ('customer_report', 'customer_list'):
+            response = self.client.get(reverse(name))
+            listed = next(c for c in response.context['customers'] if c.pk == customer.pk)
+            self.assertEqual((listed.sales_count, listed.total_spent), (3, Decimal('600.00')), name)
+        response = self.client.get(reverse('customer_sales', args=[customer.pk]))
+        self.assertEqual(response.context['total_sales'], 3)
+        self.assertEqual(response.context['sales'][0], self.sale)
+
+        response = self.client.get(reverse('daily_sales'), {'date': timezone.now().date().isoformat()})
+        self.assertEqual(len(response.context['sales']), 4)
+        self.assertEqual(response.context['daily_summary'].sale_count, 4)
@@ -9,4 +9,7 @@ urlpatterns = [
     path('sales/', views.sales_report, name='sales_report'),
     path('customers/', views.customer_report, name='customer_report'),
     path('suppliers/', views.supplier_report, name='supplier_report'),
+    path('jobs/<int:pk>/', views.report_job_detail, name='report_job_detail'),
+    path('jobs/<int:pk>/status/', views.report_job_status, name='report_job_status'),
+    path('jobs/<int:pk>/csv/', views.report_job_csv, name='report_job_csv'),
 ]
\ No newline at end of file
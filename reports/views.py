@@ -1,12 +1,58 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum, Count, Q, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
-from inventory.models import Product, PurchaseOrder, Customer, Supplier
-from pos.models import Sale, DailySummary, SaleItem
-from django.db.models import F
+from inventory.models import Product, PurchaseOrder, PurchaseItem, Customer, Supplier
+from pos.models import Sale, DailySummary, SaleItem, customer_sale_totals
+from django.db.models import F, DecimalField, DurationField, ExpressionWrapper, FloatField, Max, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from door_shop.snapshot import data_source
+from .builders import report_version
+from .jobs import REPORT_BUILDERS, resubmit_stale_job, submit_report_job
+from .models import CustomerSegment, ReportJob
+
+def _should_run_in_background(request, start_date, end_date):
+    """Long ranges (or an explicit ?background=1) are handed to a report job."""
+    if request.GET.get('background') == '1':
+        return True
+    threshold = getattr(settings, 'REPORT_BACKGROUND_THRESHOLD_DAYS', 62)
+    return (end_date - start_date).days + 1 > threshold
+
+def _start_report_job(request, report_type, start_date, end_date):
+    job = submit_report_job(report_type, start_date, end_date, request.user)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status_url': reverse('report_job_status', args=[job.id]),
+        }, status=202)
+    return redirect('report_job_detail', pk=job.pk)
+
+def _report_body(report_type, start_date, end_date, *models):
+    """The report's table HTML, cached per period and data version; only built on a miss."""
+    version = report_version(start_date, end_date, *models)
+    # A body built from the snapshot is only as new as the snapshot
+    key = make_template_fragment_key(f'{report_type}-report-body', [start_date, end_date, version, data_source()])
+    body = cache.get(key)
+    if body is None:
+        builder, template_name = REPORT_BUILDERS[report_type]
+        body = render_to_string(template_name, builder(start_date, end_date))
+        cache.set(key, body, settings.FRAGMENT_CACHE_TTL)
+    return body
+
+def _get_report_job(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk)
+    if job.requested_by_id != request.user.id and not request.user.is_staff:
+        raise Http404('Report job not found')
+    return job
 
 @login_required
 def reports_dashboard(request):
@@ -19,7 +65,7 @@ def stock_valuation_report(request):
     # Calculate totals
     total_valuation = sum(product.stock_value for product in products)
     total_products = products.count()
-    low_stock_count = products.filter(current_stock__lte=models.F('min_stock_level')).count()
+    low_stock_count = products.filter(current_stock__lte=F('min_stock_level')).count()
     
     # Filter by category if provided
     category_filter = request.GET.get('category')
@@ -46,42 +92,14 @@ def profit_calculation_report(request):
     if request.GET.get('end_date'):
         end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
     
-    sales = Sale.objects.filter(sale_date__date__range=[start_date, end_date])
-    
-    # Calculate totals
-    total_sales = sales.aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-    total_discount = sales.aggregate(total=Sum('discount_amount'))['total'] or Decimal('0')
-    
-    # Calculate cost and profit
-    total_cost = Decimal('0')
-    total_profit = Decimal('0')
-    
-    for sale in sales:
-        for item in sale.items.all():
-            cost = item.product.cost_price * item.quantity
-            total_cost += cost
-            total_profit += (item.total_price - cost)
-    
-    profit_margin = (total_profit / total_sales * 100) if total_sales > 0 else Decimal('0')
-    
-    # Sales by payment method
-    payment_methods = {
-        'cash': sales.filter(payment_method='cash').aggregate(total=Sum('grand_total'))['total'] or Decimal('0'),
-        'card': sales.filter(payment_method='card').aggregate(total=Sum('grand_total'))['total'] or Decimal('0'),
-        'mobile': sales.filter(payment_method='mobile').aggregate(total=Sum('grand_total'))['total'] or Decimal('0'),
-        'due': sales.filter(payment_method='due').aggregate(total=Sum('grand_total'))['total'] or Decimal('0'),
-    }
+    if _should_run_in_background(request, start_date, end_date):
+        return _start_report_job(request, 'profit', start_date, end_date)
     
+    # Profit uses current cost prices, so product changes invalidate open periods too
     context = {
-        'sales': sales,
         'start_date': start_date,
         'end_date': end_date,
-        'total_sales': total_sales,
-        'total_cost': total_cost,
-        'total_profit': total_profit,
-        'profit_margin': profit_margin,
-        'total_discount': total_discount,
-        'payment_methods': payment_methods,
+        'report_body': _report_body('profit', start_date, end_date, Product),
     }
     return render(request, 'reports/profit_calculation.html', context)
 
@@ -116,60 +134,34 @@ def sales_report(request):
     if request.GET.get('end_date'):
         end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
     
-    sales = Sale.objects.filter(sale_date__date__range=[start_date, end_date]).select_related('customer')
-    
-    # Daily breakdown
-    daily_summaries = []
-    current_date = start_date
-    while current_date <= end_date:
-        daily_sales = sales.filter(sale_date__date=current_date)
-        daily_total = daily_sales.aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-        daily_count = daily_sales.count()
-        
-        daily_summaries.append({
-            'date': current_date,
-            'total_sales': daily_total,
-            'sale_count': daily_count,
-        })
-        current_date += timedelta(days=1)
-    
-    # Top selling products
-    top_products = SaleItem.objects.filter(
-        sale__sale_date__date__range=[start_date, end_date]
-    ).values(
-        'product__name', 'product__category__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum('total_price')
-    ).order_by('-total_quantity')[:10]
-    
-    # Sales statistics
-    total_sales_amount = sales.aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-    total_transactions = sales.count()
-    avg_sale_value = total_sales_amount / total_transactions if total_transactions > 0 else Decimal('0')
+    if _should_run_in_background(request, start_date, end_date):
+        return _start_report_job(request, 'sales', start_date, end_date)
     
     context = {
-        'sales': sales,
-        'daily_summaries': daily_summaries,
-        'top_products': top_products,
         'start_date': start_date,
         'end_date': end_date,
-        'total_sales': total_sales_amount,
-        'total_transactions': total_transactions,
-        'avg_sale_value': avg_sale_value,
+        'report_body': _report_body('sales', start_date, end_date),
     }
     return render(request, 'reports/sales_report.html', context)
 
 @login_required
 def customer_report(request):
-    customers = Customer.objects.all()
+    customers = Customer.objects.select_related('segment').order_by('name')
     
-    # Add sales data to customers
+    # Filter by RFM segment (refreshed nightly by refresh_customer_segments)
+    segment_filter = request.GET.get('segment')
+    if segment_filter:
+        customers = customers.filter(segment__segment=segment_filter)
+    
+    # Sales totals for every customer, one grouped query per sale database and the archive
+    totals = customer_sale_totals()
+    customers = list(customers)
     for customer in customers:
-        customer_sales = Sale.objects.filter(customer=customer)
-        customer.sales_count = customer_sales.count()
-        customer.total_spent = customer_sales.aggregate(total=Sum('grand_total'))['total'] or Decimal('0')
-        customer.last_purchase = customer_sales.order_by('-sale_date').first()
+        total = totals.get(customer.pk, {'count': 0, 'spent': Decimal('0'), 'last': None})
+        customer.sales_count = total['count']
+        customer.total_spent = total['spent']
+        customer.last_purchase_date = total['last']
+        customer.avg_purchase = customer.total_spent / customer.sales_count if customer.sales_count else Decimal('0')
     
     # Top customers by spending
     top_customers = sorted(
@@ -179,11 +171,19 @@ def customer_report(request):
     )[:10]
     
     # Customer statistics
-    total_customers = customers.count()
+    total_customers = len(customers)
     active_customers = len([c for c in customers if c.sales_count > 0])
     total_revenue = sum(customer.total_spent for customer in customers)
     avg_spent = total_revenue / active_customers if active_customers > 0 else Decimal('0')
     
+    segment_counts = dict(
+        CustomerSegment.objects.values_list('segment').annotate(count=Count('id')).order_by()
+    )
+    segments = [
+        {'code': code, 'label': label, 'count': segment_counts.get(code, 0)}
+        for code, label in CustomerSegment.SEGMENTS
+    ]
+    
     context = {
         'customers': customers,
         'top_customers': top_customers,
@@ -191,29 +191,107 @@ def customer_report(request):
         'active_customers': active_customers,
         'total_revenue': total_revenue,
         'avg_spent': avg_spent,
+        'segments': segments,
+        'selected_segment': segment_filter,
     }
     return render(request, 'reports/customer_report.html', context)
 
+def _supplier_unit_cost(since, until):
+    """Average unit cost a supplier charged on orders placed in [since, until)."""
+    return Subquery(
+        PurchaseItem.objects.filter(
+            purchase_order__supplier=OuterRef('pk'),
+            purchase_order__order_date__gte=since,
+            purchase_order__order_date__lt=until,
+        ).values('purchase_order__supplier').annotate(
+            avg_cost=Avg('unit_cost')
+        ).values('avg_cost')[:1],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
 @login_required
 def supplier_report(request):
-    suppliers = Supplier.objects.all()
+    now = timezone.now()
+    trend_window = timedelta(days=getattr(settings, 'SUPPLIER_COST_TREND_DAYS', 90))
+    received = Q(purchaseorder__status='received', purchaseorder__received_at__isnull=False)
+    with_due_date = received & Q(purchaseorder__expected_date__isnull=False)
     
-    # Add purchase data to suppliers
-    for supplier in suppliers:
-        supplier_purchases = PurchaseOrder.objects.filter(supplier=supplier)
-        supplier.purchase_count = supplier_purchases.count()
-        supplier.total_purchases = supplier_purchases.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-        supplier.last_purchase = supplier_purchases.order_by('-order_date').first()
+    # Purchase and delivery performance for every supplier in one query
+    suppliers = Supplier.objects.annotate(
+        purchase_count=Count('purchaseorder'),
+        total_purchases=Coalesce(Sum('purchaseorder__total_amount'), Decimal('0'), output_field=DecimalField()),
+        spend=Coalesce(Sum('purchaseorder__total_amount', filter=received), Decimal('0'), output_field=DecimalField()),
+        last_purchase_date=Max('purchaseorder__order_date'),
+        received_count=Count('purchaseorder', filter=received),
+        avg_lead_time=Avg(
+            ExpressionWrapper(F('purchaseorder__received_at') - F('purchaseorder__order_date'), output_field=DurationField()),
+            filter=received,
+        ),
+        due_count=Count('purchaseorder', filter=with_due_date),
+        on_time_count=Count(
+            'purchaseorder',
+            filter=with_due_date & Q(purchaseorder__received_at__date__lte=F('purchaseorder__expected_date')),
+        ),
+        recent_unit_cost=_supplier_unit_cost(now - trend_window, now),
+        previous_unit_cost=_supplier_unit_cost(now - 2 * trend_window, now - trend_window),
+    ).annotate(
+        on_time_rate=ExpressionWrapper(
+            Cast('on_time_count', FloatField()) * 100 / NullIf(Cast('due_count', FloatField()), 0.0),
+            output_field=FloatField(),
+        ),
+        cost_trend=ExpressionWrapper(
+            Cast(F('recent_unit_cost') - F('previous_unit_cost'), FloatField()) * 100
+            / NullIf(Cast('previous_unit_cost', FloatField()), 0.0),
+            output_field=FloatField(),
+        ),
+    ).order_by('name')
     
     # Supplier statistics
-    total_suppliers = suppliers.count()
+    suppliers = list(suppliers)
+    for supplier in suppliers:
+        supplier.avg_lead_days = (
+            supplier.avg_lead_time.total_seconds() / 86400 if supplier.avg_lead_time is not None else None
+        )
+    total_suppliers = len(suppliers)
     active_suppliers = len([s for s in suppliers if s.purchase_count > 0])
     total_purchase_value = sum(supplier.total_purchases for supplier in suppliers)
+    total_spend = sum(supplier.spend for supplier in suppliers)
     
     context = {
         'suppliers': suppliers,
         'total_suppliers': total_suppliers,
         'active_suppliers': active_suppliers,
         'total_purchase_value': total_purchase_value,
+        'total_spend': total_spend,
+        'trend_days': trend_window.days,
     }
-    return render(request, 'reports/supplier_report.html', context)
\ No newline at end of file
+    return render(request, 'reports/supplier_report.html', context)
+
+@login_required
+def report_job_detail(request, pk):
+    job = _get_report_job(request, pk)
+    return render(request, 'reports/report_job.html', {'job': job})
+
+@login_required
+def report_job_status(request, pk):
+    job = _get_report_job(request, pk)
+    # A job whose worker died is picked up again while someone waits on it
+    resubmit_stale_job(job)
+    return JsonResponse({
+        'id': job.id,
+        'report_type': job.report_type,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'result_url': reverse('report_job_detail', args=[job.id]) if job.status == 'done' else None,
+        'csv_url': reverse('report_job_csv', args=[job.id]) if job.status == 'done' else None,
+    })
+
+@login_required
+def report_job_csv(request, pk):
+    job = _get_report_job(request, pk)
+    if job.status != 'done':
+        raise Http404('Report is not ready yet')
+    response = HttpResponse(job.result_csv, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{job.report_type}-report-{job.id}.csv"'
+    return response